@@ -0,0 +1,115 @@
+# agent_registry.py
+import hashlib
+import os
+from langchain.agents import create_openai_tools_agent, AgentExecutor
+from langchain_core.prompts import ChatPromptTemplate
+from tracing import span
+from usage import usage_tags
+
+PROMPTS_DIR = "prompts"
+PROMPT_SUFFIX = "_prompt.txt"
+REQUIRED_PROMPT_VARIABLES = {"input", "agent_scratchpad"}
+
+
+class PromptRecord:
+    """A loaded prompt file together with its parsed template and version hash."""
+
+    def __init__(self, name: str, path: str, mtime: float, text: str):
+        self.name = name
+        self.path = path
+        self.mtime = mtime
+        self.text = text
+        self.version = hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+        self.template = ChatPromptTemplate.from_template(text)
+
+        missing = REQUIRED_PROMPT_VARIABLES - set(self.template.input_variables)
+        if missing:
+            raise ValueError(f"Prompt '{name}' ({path}) is missing required variables: {sorted(missing)}")
+
+
+class TracedAgentExecutor(AgentExecutor):
+    """Agent executor that records a span for every invocation and tags its LLM calls with the agent name."""
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        with span(f"executor:{self.name}", kind="executor"), usage_tags(agent=self.name):
+            return await super().ainvoke(input, config, **kwargs)
+
+    def invoke(self, input, config=None, **kwargs):
+        with span(f"executor:{self.name}", kind="executor"), usage_tags(agent=self.name):
+            return super().invoke(input, config, **kwargs)
+
+
+class AgentRegistry:
+    """
+    Loads the prompts in `prompts/` once per process and caches the agent executors built from them.
+
+    Prompt files are re-read only when their modification time changes, and every executor is keyed
+    on the prompt version, the model and the tool set, so nodes can ask for an executor on every run
+    without rebuilding it.
+    """
+
+    def __init__(self, prompts_dir: str = PROMPTS_DIR):
+        self.prompts_dir = prompts_dir
+        self._prompts: dict[str, PromptRecord] = {}
+        self._executors: dict[tuple, AgentExecutor] = {}
+
+    def _path_for(self, name: str) -> str:
+        return os.path.join(self.prompts_dir, f"{name}{PROMPT_SUFFIX}")
+
+    def _load(self, name: str) -> PromptRecord:
+        path = self._path_for(name)
+        mtime = os.stat(path).st_mtime
+        record = self._prompts.get(name)
+        if record and record.mtime == mtime:
+            return record
+
+        with open(path, "r") as f:
+            text = f.read()
+        if not text.strip():
+            raise ValueError(f"Prompt '{name}' ({path}) is empty.")
+
+        record = PromptRecord(name, path, mtime, text)
+        self._prompts[name] = record
+        return record
+
+    def load_all(self) -> dict:
+        """Loads and validates every prompt file, returning a mapping of prompt name to version hash."""
+        versions = {}
+        for file_name in sorted(os.listdir(self.prompts_dir)):
+            if not file_name.endswith(PROMPT_SUFFIX):
+                continue
+            name = file_name[:-len(PROMPT_SUFFIX)]
+            versions[name] = self._load(name).version
+        return versions
+
+    def get_prompt(self, name: str) -> ChatPromptTemplate:
+        """Returns the prompt template for `name`, reloading it if the file has changed."""
+        return self._load(name).template
+
+    def prompt_version(self, name: str) -> str:
+        """Returns the version hash of the current contents of the prompt `name`."""
+        return self._load(name).version
+
+    def get_executor(self, name: str, model, tools: list = None) -> TracedAgentExecutor:
+        """Returns a ready-made agent executor for the prompt `name` bound to `model` and `tools`."""
+        tools = list(tools or [])
+        record = self._load(name)
+        key = (name, record.version, id(model), tuple((t.name, id(t)) for t in tools))
+        executor = self._executors.get(key)
+        if executor is None:
+            # Drop executors built from older versions of this prompt
+            self._executors = {k: v for k, v in self._executors.items() if k[0] != name or k[1] == record.version}
+            agent_runnable = create_openai_tools_agent(model, tools, record.template)
+            executor = TracedAgentExecutor(agent=agent_runnable, tools=tools, verbose=True, name=name)
+            self._executors[key] = executor
+        return executor
+
+
+_registry = None
+
+def get_registry() -> AgentRegistry:
+    """Returns the process-wide agent registry."""
+    global _registry
+    if _registry is None:
+        _registry = AgentRegistry()
+    return _registry
@@ -0,0 +1,221 @@
+# audit_engine.py
+"""
+Deterministic duplicate-entity candidates for the Auditor.
+
+Instead of asking the LLM to spot duplicates in whatever part of the graph fits in its context,
+every entity name is read from LightRAG (`graph_labels`) and matched locally:
+
+- Names are normalized: case and accents are folded, punctuation dropped ('U.S.' -> 'us'),
+  '&' read as 'and' and plurals singularized.
+- Each name is put into a few blocks: its normalized form, its acronym, its sorted words, each of
+  its words and its first letters. Only names sharing a block are compared, and blocks of more than
+  AUDIT_MAX_BLOCK_SIZE names (very common words) are skipped, so the work grows roughly linearly
+  with the number of entities rather than quadratically.
+- Pairs are scored by character trigram similarity, with exact normalized matches, reordered words
+  and acronyms scored as near-certain. Names that differ in a number ('Section 301' and 'Section
+  232') are never duplicates.
+
+Only the AUDIT_MAX_CANDIDATES best pairs, with their descriptions and shared neighbors from
+`graphs_get`, are handed to the LLM to confirm.
+"""
+import asyncio
+import contextlib
+import re
+import unicodedata
+from collections import defaultdict
+from db_utils import extract_and_clean_json
+
+DEFAULT_MAX_CANDIDATES = 50
+DEFAULT_MIN_SIMILARITY = 0.8
+DEFAULT_MAX_BLOCK_SIZE = 100
+DEFAULT_DETAIL_CONCURRENCY = 8
+DEFAULT_LABEL_PAGE_SIZE = 1000
+PREFIX_LENGTH = 4
+DESCRIPTION_CHARS = 300
+
+NAME_STOPWORDS = frozenset({"a", "an", "the", "of", "and", "for", "in", "on", "to", "at", "by"})
+
+# Scores of the rule-based matches; anything else is scored by trigram similarity
+SAME_NAME_SCORE = 1.0
+SAME_WORDS_SCORE = 0.95
+ACRONYM_SCORE = 0.9
+
+
+def _singular(token: str) -> str:
+    """Reduces a plural word to its singular form so that e.g. 'tariffs' and 'tariff' match."""
+    if len(token) <= 3 or not token.isalpha():
+        return token
+    if token.endswith("ies") and len(token) > 4:
+        return token[:-3] + "y"
+    if token.endswith(("sses", "xes", "ches", "shes")):
+        return token[:-2]
+    if token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def name_tokens(name: str) -> list:
+    """Normalizes an entity name into its words: case-, accent- and punctuation-insensitive, singular."""
+    text = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode("ascii").lower()
+    text = text.replace("&", " and ")
+    # Dots and apostrophes join their neighbors ('U.S.' -> 'us', "Member's" -> 'members'); other punctuation separates words
+    text = re.sub(r"[.'`]", "", text)
+    return [_singular(token) for token in re.findall(r"[a-z0-9]+", text)]
+
+
+def _acronym(tokens: list) -> str:
+    """Returns the initials of a multi-word name without its stopwords, e.g. 'bis' for Bureau of Industry and Security."""
+    words = [token for token in tokens if token not in NAME_STOPWORDS]
+    return "".join(token[0] for token in words) if len(words) >= 2 else ""
+
+
+def _trigrams(text: str) -> frozenset:
+    padded = f"  {text} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class EntityName:
+    """An entity name with everything needed to block and compare it, computed once."""
+
+    __slots__ = ("name", "tokens", "compact", "words", "numbers", "acronym", "trigrams")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.tokens = name_tokens(name)
+        self.compact = "".join(self.tokens)
+        self.words = " ".join(sorted(self.tokens))
+        self.numbers = frozenset(token for token in self.tokens if token.isdigit())
+        self.acronym = _acronym(self.tokens)
+        self.trigrams = _trigrams(self.compact)
+
+    def blocking_keys(self) -> set:
+        keys = {f"name:{self.compact}", f"words:{self.words}", f"prefix:{self.compact[:PREFIX_LENGTH]}"}
+        if self.acronym:
+            keys.add(f"acronym:{self.acronym}")
+        elif len(self.tokens) == 1 and 2 <= len(self.compact) <= 6 and self.compact.isalpha():
+            # A short single word may itself be an acronym
+            keys.add(f"acronym:{self.compact}")
+        keys.update(f"word:{token}" for token in self.tokens if token not in NAME_STOPWORDS and len(token) > 2)
+        return keys
+
+
+def name_similarity(a: EntityName, b: EntityName) -> tuple:
+    """Returns (score, reason) for two entity names, with a score between 0 and 1."""
+    if a.numbers != b.numbers:
+        return 0.0, "different numbers"
+    if a.compact == b.compact:
+        return SAME_NAME_SCORE, "same normalized name"
+    if a.words == b.words:
+        return SAME_WORDS_SCORE, "same words in a different order"
+    if (a.acronym and a.acronym == b.compact) or (b.acronym and b.acronym == a.compact):
+        return ACRONYM_SCORE, "acronym"
+    if not a.trigrams or not b.trigrams:
+        return 0.0, "empty name"
+    overlap = len(a.trigrams & b.trigrams)
+    return 2 * overlap / (len(a.trigrams) + len(b.trigrams)), "similar spelling"
+
+
+def find_duplicate_candidates(names, min_similarity: float = DEFAULT_MIN_SIMILARITY, max_block_size: int = DEFAULT_MAX_BLOCK_SIZE) -> tuple:
+    """
+    Finds pairs of entity names that probably refer to the same entity.
+
+    Returns (candidates, stats): the candidates as dicts with `entities`, `similarity` and `reason`,
+    best first, and counts of the names, blocks and comparisons, for the log.
+    """
+    entities = [EntityName(name) for name in dict.fromkeys(name for name in names if name and str(name).strip())]
+    entities = [entity for entity in entities if entity.compact]
+
+    blocks = defaultdict(list)
+    for index, entity in enumerate(entities):
+        for key in entity.blocking_keys():
+            blocks[key].append(index)
+
+    pairs = set()
+    skipped_blocks = 0
+    for members in blocks.values():
+        if len(members) < 2:
+            continue
+        if len(members) > max_block_size:
+            skipped_blocks += 1
+            continue
+        for i, first in enumerate(members):
+            for second in members[i + 1:]:
+                pairs.add((first, second))
+
+    candidates = []
+    for first, second in pairs:
+        score, reason = name_similarity(entities[first], entities[second])
+        if score >= min_similarity:
+            candidates.append({"entities": sorted([entities[first].name, entities[second].name]), "similarity": round(score, 3), "reason": reason})
+    candidates.sort(key=lambda candidate: (-candidate["similarity"], candidate["entities"]))
+
+    stats = {"entities": len(entities), "blocks": len(blocks), "skipped_blocks": skipped_blocks, "comparisons": len(pairs), "candidates": len(candidates)}
+    return candidates, stats
+
+
+def _parse_labels(raw_response) -> list:
+    response = extract_and_clean_json(raw_response) if isinstance(raw_response, str) else raw_response
+    if isinstance(response, dict):
+        response = response.get("labels") or response.get("data") or []
+    if not isinstance(response, list):
+        raise ValueError(f"Unexpected graph_labels response: {str(raw_response)[:200]}")
+    return [str(label) for label in response if label is not None]
+
+
+async def load_entity_names(graph_labels_tool, page_size: int = DEFAULT_LABEL_PAGE_SIZE) -> list:
+    """Reads every entity name in the graph, page by page if the tool takes an offset and limit."""
+    declared = set(getattr(graph_labels_tool, "args", {}) or {})
+    if not {"offset", "limit"} <= declared:
+        return _parse_labels(await graph_labels_tool.ainvoke({}))
+
+    names = []
+    while True:
+        page = _parse_labels(await graph_labels_tool.ainvoke({"offset": len(names), "limit": page_size}))
+        names.extend(page)
+        if len(page) < page_size:
+            return names
+
+
+async def describe_entity(graphs_get_tool, name: str, semaphore: asyncio.Semaphore = None) -> dict:
+    """Returns the properties and neighbors of an entity from its one-hop subgraph; empty if it is not in the graph."""
+    async with semaphore or contextlib.nullcontext():
+        raw_response = await graphs_get_tool.ainvoke({"label": name, "max_depth": 1, "max_nodes": 50})
+    graph = extract_and_clean_json(raw_response) if isinstance(raw_response, str) else raw_response
+    if not isinstance(graph, dict):
+        return {}
+    node = next((node for node in graph.get("nodes", []) if node.get("id") == name), None)
+    if node is None:
+        return {}
+    neighbors = set()
+    for edge in graph.get("edges", []):
+        if edge.get("source") == name:
+            neighbors.add(edge.get("target"))
+        elif edge.get("target") == name:
+            neighbors.add(edge.get("source"))
+    return {"properties": node.get("properties") or {}, "neighbors": neighbors}
+
+
+async def describe_candidates(graphs_get_tool, candidates: list, logger, concurrency: int = DEFAULT_DETAIL_CONCURRENCY) -> list:
+    """Adds the type and description of both entities and their number of shared neighbors to each candidate."""
+    names = list(dict.fromkeys(name for candidate in candidates for name in candidate["entities"]))
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    results = await asyncio.gather(*(describe_entity(graphs_get_tool, name, semaphore) for name in names), return_exceptions=True)
+    details = {}
+    for name, result in zip(names, results):
+        if isinstance(result, Exception):
+            logger.warning(f"Could not load the details of entity '{name}': {result}")
+            result = {}
+        details[name] = result
+
+    described = []
+    for candidate in candidates:
+        first, second = (details.get(name, {}) for name in candidate["entities"])
+        described.append({
+            **candidate,
+            "details": {
+                name: {"entity_type": properties.get("entity_type"), "description": (properties.get("description") or "")[:DESCRIPTION_CHARS]}
+                for name, properties in ((name, details[name].get("properties") or {}) for name in candidate["entities"])
+            },
+            "shared_neighbors": len((first.get("neighbors") or set()) & (second.get("neighbors") or set())),
+        })
+    return described
@@ -0,0 +1,264 @@
+# benchmarks/bench_e2e.py
+"""
+Offline end-to-end benchmark.
+
+Runs the real graph for `--research`, `--curate`, `--maintenance` and `--refresh` against local stand-ins:
+fake MCP servers (search returns fixture results, LightRAG records inserts), a deterministic fake
+chat model, a local HTTP server serving fixture HTML/PDF, and a throwaway Postgres database
+created on the server at BENCH_DATABASE_URL (or DATABASE_URL) and dropped afterwards.
+
+Prerequisites are seeded untimed: `research` runs after an analysis, `curate` after an analysis
+and a research run, `refresh` after all three. Reports wall-clock time, throughput and a per-stage breakdown from the run's
+trace, prints a table and writes JSON to benchmarks/results/. Stage times per span kind are self
+times summed over spans, so concurrent work (parallel fetches, server starts) can add up to more
+than the wall-clock time.
+
+Usage:
+    python benchmarks/bench_e2e.py --workflows research,curate --scales small,medium
+    python benchmarks/bench_e2e.py --llm-latency 0.5 --fetch-delay 0.2 --error-rate 0.1
+    python benchmarks/bench_e2e.py --workflows research --workers 4   # fetch and summarize through the job queue
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+sys.path[:0] = [REPO_ROOT, BENCH_DIR]
+
+from harness.database import throwaway_database
+from harness.fixture_server import FixtureServer
+
+WORKFLOWS = ("research", "curate", "maintenance", "refresh")
+
+# Untimed runs that produce the reports a workflow starts from
+PREREQUISITES = {"research": ("analyze",), "curate": ("analyze", "research"), "maintenance": (), "refresh": ("analyze", "research", "curate")}
+
+# gaps x searches per gap x results per search
+SCALES = {
+    "small": {"gaps": 2, "searches_per_gap": 2, "results_per_search": 3},
+    "medium": {"gaps": 5, "searches_per_gap": 3, "results_per_search": 5},
+    "large": {"gaps": 10, "searches_per_gap": 4, "results_per_search": 8},
+}
+
+SERVER_TOOLS = {
+    "search": ["google_search"],
+    "lightrag": ["query", "graph_labels", "graphs_get", "graph_entity_exists", "graph_update_entity", "graph_update_relation",
+                 "documents_delete_entity", "documents_delete_relation", "documents_insert_text", "documents_upload_files",
+                 "documents_pipeline_status", "documents_track_status"],
+    "fetch": ["fetch"],
+    "files": ["list_allowed_directories", "list_directory", "search_files", "read_text_file"],
+}
+
+# Server names as in mcp.json, so the nodes resolve their tools exactly as in production
+SERVER_NAMES = {"search": "google_search", "lightrag": "lightrag", "fetch": "fetch", "files": "file_tools"}
+
+
+def write_mcp_config(path: str, bench_env: dict):
+    env = {"PATH": os.environ.get("PATH", ""), "PYTHONPATH": os.pathsep.join([REPO_ROOT, BENCH_DIR]), **bench_env}
+    servers = {
+        SERVER_NAMES[role]: {
+            "command": sys.executable,
+            "args": [os.path.join(BENCH_DIR, "harness", "fake_mcp_server.py"), "--role", role],
+            "transport": "stdio",
+            "env": env,
+            "tools": tools,
+        }
+        for role, tools in SERVER_TOOLS.items()
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(servers, f, indent=2)
+
+
+def stage_breakdown(spans: list) -> dict:
+    """Returns total seconds per graph node and self seconds per span kind (llm, mcp, fetch, db, ...)."""
+    from tracing import summarize
+
+    nodes = {name.split(":", 1)[1]: round(entry["total_ms"] / 1000, 3) for name, entry in summarize(spans).items() if name.startswith("node:")}
+    child_time = defaultdict(float)
+    for s in spans:
+        if s["parent_span_id"]:
+            child_time[s["parent_span_id"]] += s["duration_ms"]
+    kinds = defaultdict(float)
+    for s in spans:
+        if s["kind"] not in ("run", "node"):
+            kinds[s["kind"]] += max(s["duration_ms"] - child_time[s["span_id"]], 0.0) / 1000
+    return {"nodes": nodes, "kinds": {kind: round(seconds, 3) for kind, seconds in sorted(kinds.items())}}
+
+
+def throughput(spans: list, wall_seconds: float, record_dir: str, started_at: float) -> dict:
+    """Counts the work done by the timed run from its spans and the fake LightRAG's insert log."""
+    fetched = sum(1 for s in spans if s["name"] == "fetch:fetch_and_generate_markdown" and s["status"] == "ok")
+    searches = sum(1 for s in spans if s["name"] == "mcp:google_search")
+    ranked = sum(1 for s in spans if s["name"] == "executor:search_ranker")
+    gaps = sum(1 for s in spans if s["name"] == "node:researcher")
+
+    ingested = 0
+    record_path = os.path.join(record_dir, "lightrag_inserts.jsonl")
+    if os.path.exists(record_path):
+        with open(record_path, encoding="utf-8") as f:
+            ingested = sum(1 for line in f if line.strip() and json.loads(line)["at"] >= started_at)
+
+    minutes = wall_seconds / 60 or 1
+    return {
+        "documents_fetched": fetched,
+        "documents_fetched_per_s": round(fetched / wall_seconds, 3) if wall_seconds else 0.0,
+        "gaps_researched": gaps,
+        "gaps_per_min": round(gaps / minutes, 3),
+        "searches": searches,
+        "searches_ranked": ranked,
+        "documents_ingested": ingested,
+        "documents_ingested_per_s": round(ingested / wall_seconds, 3) if wall_seconds else 0.0,
+    }
+
+
+async def run_case(workflow: str, scale: str, args, server_url: str, fixture_url: str) -> dict:
+    """Runs one workflow at one scale in a fresh database and returns its measurements."""
+    from run import run_workflow
+    from tracing import load_spans, trace_path
+    from harness.fake_chat_model import FakeAgentChatModel
+    from job_queue import Worker
+
+    shape = SCALES[scale]
+    with throwaway_database(server_url) as database_url, tempfile.TemporaryDirectory(prefix=f"bench_{workflow}_{scale}_") as work_dir:
+        config_path = os.path.join(work_dir, "mcp.json")
+        write_mcp_config(config_path, {
+            "BENCH_FIXTURE_URL": fixture_url,
+            "BENCH_RESULTS_PER_SEARCH": str(shape["results_per_search"]),
+            "BENCH_PDF_RATIO": str(args.pdf_ratio),
+            "BENCH_TOOL_LATENCY": str(args.tool_latency),
+            "BENCH_INDEX_SECONDS": str(args.index_seconds),
+            "BENCH_RECORD_DIR": work_dir,
+        })
+        os.environ.update({
+            "DATABASE_URL": database_url,
+            "MCP_CONFIG_PATH": config_path,
+            "TRACE_DIR": os.path.join(work_dir, "traces"),
+            "INGESTION_FILES_DIR": os.path.join(work_dir, "ingestion_batches"),
+            "COVERAGE_INDEX_DIR": os.path.join(work_dir, "coverage_index"),
+            "INGESTION_POLL_INTERVAL": str(args.poll_interval),
+            "RESEARCH_JOB_QUEUE": "true" if args.workers else "false",
+            "JOB_POLL_INTERVAL": str(args.poll_interval),
+            # Documents fetched by the prerequisite runs are seconds old; refresh them anyway
+            "REFRESH_MIN_AGE_DAYS": "0",
+            # Nobody is there to approve the fixer's plan
+            "FIX_REQUIRE_APPROVAL": "false",
+        })
+        model = FakeAgentChatModel(
+            latency=args.llm_latency,
+            seconds_per_token=args.llm_seconds_per_token,
+            gaps=shape["gaps"],
+            searches_per_gap=shape["searches_per_gap"],
+        )
+
+        # Agent executors print every step; keep that out of the report
+        with open(os.path.join(args.log_dir, f"{workflow}_{scale}.log"), "w", encoding="utf-8") as log, contextlib.redirect_stdout(log):
+            for prerequisite in PREREQUISITES[workflow]:
+                await run_workflow(prerequisite, model, started_at=time.perf_counter())
+
+            # With --workers, the researcher hands fetches and summaries to in-process queue workers
+            stop_workers = asyncio.Event()
+            workers = [asyncio.create_task(Worker(model, concurrency=1, worker_id=f"bench-{number}").run(stop_workers)) for number in range(args.workers)]
+            try:
+                started_at_wall = time.time()
+                started = time.perf_counter()
+                final_state = await run_workflow(workflow, model, started_at=started, serial=args.serial)
+                wall_seconds = time.perf_counter() - started
+            finally:
+                stop_workers.set()
+                await asyncio.gather(*workers)
+
+        spans = load_spans(trace_path(final_state["run_id"])) if final_state else []
+        return {
+            "workflow": workflow,
+            "scale": scale,
+            **shape,
+            "status": final_state["status"] if final_state else None,
+            "wall_seconds": round(wall_seconds, 3),
+            "throughput": throughput(spans, wall_seconds, work_dir, started_at_wall),
+            "stages": stage_breakdown(spans),
+        }
+
+
+def print_table(results: list):
+    print(f"{'workflow':<12} {'scale':<7} {'wall':>8} {'fetched':>8} {'docs/s':>7} {'gaps/min':>9} {'ranked':>7} {'ingested':>9}  slowest stages")
+    for r in results:
+        t = r["throughput"]
+        stages = sorted({**r["stages"]["kinds"]}.items(), key=lambda item: -item[1])[:3]
+        stages_text = ", ".join(f"{kind} {seconds:.2f}s" for kind, seconds in stages)
+        print(f"{r['workflow']:<12} {r['scale']:<7} {r['wall_seconds']:7.2f}s {t['documents_fetched']:>8} {t['documents_fetched_per_s']:>7.2f} "
+              f"{t['gaps_per_min']:>9.1f} {t['searches_ranked']:>7} {t['documents_ingested']:>9}  {stages_text}")
+    for r in results:
+        nodes = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in r["stages"]["nodes"].items())
+        print(f"  {r['workflow']}/{r['scale']} nodes: {nodes}")
+
+
+def parse_list(value: str, allowed) -> list:
+    items = [item.strip() for item in value.split(",") if item.strip()]
+    unknown = set(items) - set(allowed)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown values {sorted(unknown)}; choose from {', '.join(allowed)}")
+    return items
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Run the offline end-to-end benchmark.")
+    parser.add_argument("--workflows", type=lambda v: parse_list(v, WORKFLOWS), default=list(WORKFLOWS), help=f"Comma-separated, from: {', '.join(WORKFLOWS)}.")
+    parser.add_argument("--scales", type=lambda v: parse_list(v, SCALES), default=["small", "medium"], help=f"Comma-separated, from: {', '.join(SCALES)}.")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds every fake LLM call takes.")
+    parser.add_argument("--llm-seconds-per-token", type=float, default=0.0, help="Extra seconds per completion token.")
+    parser.add_argument("--tool-latency", type=float, default=0.0, help="Seconds every fake MCP tool call takes.")
+    parser.add_argument("--index-seconds", type=float, default=0.05, help="Seconds the fake LightRAG takes to index a document.")
+    parser.add_argument("--fetch-delay", type=float, default=0.0, help="Seconds the fixture server delays every response.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of fixture URLs that answer 500.")
+    parser.add_argument("--pdf-ratio", type=float, default=0.1, help="Share of search results that are PDFs.")
+    parser.add_argument("--poll-interval", type=float, default=0.2, help="INGESTION_POLL_INTERVAL for the curator.")
+    parser.add_argument("--serial", action="store_true", help="Run the maintenance branches one after another.")
+    parser.add_argument("--workers", type=int, default=0, help="Fetch and summarize through the job queue with this many in-process workers (0: in the researcher).")
+    parser.add_argument("--output", help="Path of the JSON results (default: benchmarks/results/e2e_<timestamp>.json).")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv(os.path.join(REPO_ROOT, ".env"))
+    server_url = os.environ.get("BENCH_DATABASE_URL") or os.environ.get("DATABASE_URL")
+    if not server_url:
+        parser.error("Set BENCH_DATABASE_URL (or DATABASE_URL) to a Postgres server the benchmark may create databases on.")
+
+    # The fixture server listens on localhost, which trafilatura refuses to fetch by default.
+    # This only changes the configuration inside the benchmark process.
+    from trafilatura.settings import DEFAULT_CONFIG
+    DEFAULT_CONFIG.set("DEFAULT", "SSRF_PROTECTION", "false")
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    args.log_dir = os.path.join(RESULTS_DIR, f"e2e_{timestamp}_logs")
+    os.makedirs(args.log_dir, exist_ok=True)
+    logging.basicConfig(level=logging.INFO, filename=os.path.join(args.log_dir, "knowledge_agent.log"),
+                        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    results = []
+    with FixtureServer(delay_seconds=args.fetch_delay, error_rate=args.error_rate) as fixtures:
+        for scale in args.scales:
+            for workflow in args.workflows:
+                print(f"Running {workflow} at scale '{scale}'...", flush=True)
+                results.append(await run_case(workflow, scale, args, server_url, fixtures.base_url))
+
+    print_table(results)
+    output = args.output or os.path.join(RESULTS_DIR, f"e2e_{timestamp}.json")
+    settings = {k: v for k, v in vars(args).items() if k not in ("output", "log_dir")}
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"settings": settings, "results": results}, f, indent=2)
+    print(f"\nResults written to {output}; logs in {args.log_dir}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,141 @@
+# benchmarks/bench_extraction.py
+"""
+Extraction micro-benchmark.
+
+Runs the extraction paths of `fetch_and_generate_markdown` on the saved pages and PDFs in
+benchmarks/extraction_corpus/: Trafilatura for HTML (also reporting whether the output is short
+enough to trigger the Playwright fallback under MIN_CONTENT_LENGTH), pdfplumber for PDF, and with
+--browser the Playwright path for HTML. For each file it records the median time, peak Python
+memory (tracemalloc, measured in a separate run) and output length, and compares them against
+extraction_baseline.json.
+
+Usage:
+    python benchmarks/bench_extraction.py               # compare against extraction_baseline.json
+    python benchmarks/bench_extraction.py --browser     # also time the Playwright path
+    python benchmarks/bench_extraction.py --update-baseline
+
+Exits with status 1 if a file takes longer or uses more memory than its baseline allows, or if
+its output length changed by more than the tolerance.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+CORPUS_DIR = os.path.join(BENCH_DIR, "extraction_corpus")
+BASELINE_PATH = os.path.join(BENCH_DIR, "extraction_baseline.json")
+sys.path.insert(0, REPO_ROOT)
+
+# Allowed slowdown and memory growth over the baseline, and allowed change in output length
+DEFAULT_THRESHOLD = 0.5
+OUTPUT_LENGTH_TOLERANCE = 0.05
+
+
+def corpus_files() -> list:
+    return sorted(name for name in os.listdir(CORPUS_DIR) if name.endswith((".html", ".pdf")))
+
+
+def extractors(name: str, browser: bool) -> dict:
+    """Returns the extraction paths to benchmark for a corpus file, as path name -> callable(data) -> str."""
+    from tools import extract_html, extract_pdf, render_with_browser
+
+    if name.endswith(".pdf"):
+        return {"pdfplumber": extract_pdf}
+    paths = {"trafilatura": lambda data: extract_html(data.decode("utf-8"))}
+    if browser:
+        paths["playwright"] = lambda data: asyncio.run(render_with_browser(html=data.decode("utf-8")))[1]
+    return paths
+
+
+def measure(extract, data: bytes, runs: int) -> dict:
+    extract(data)  # Warm up imports and caches
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = extract(data)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    extract(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"seconds": round(statistics.median(timings), 4), "peak_kb": round(peak / 1024), "output_chars": len(output or "")}
+
+
+def compare(result: dict, baseline: dict, threshold: float) -> list:
+    """Returns the regressions of one measurement against its baseline entry."""
+    problems = []
+    if result["seconds"] > baseline["seconds"] * (1 + threshold):
+        problems.append(f"time {result['seconds']:.4f}s > {baseline['seconds']:.4f}s +{threshold:.0%}")
+    if result["peak_kb"] > baseline["peak_kb"] * (1 + threshold):
+        problems.append(f"peak memory {result['peak_kb']} KB > {baseline['peak_kb']} KB +{threshold:.0%}")
+    expected = baseline["output_chars"]
+    if abs(result["output_chars"] - expected) > max(expected * OUTPUT_LENGTH_TOLERANCE, 1):
+        problems.append(f"output length {result['output_chars']} differs from {expected}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark content extraction on the saved corpus and compare it against the baseline.")
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs per file and path (the median is reported).")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed relative slowdown and memory growth.")
+    parser.add_argument("--browser", action="store_true", help="Also benchmark the Playwright path for HTML (needs installed browsers).")
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run's measurements as the baseline.")
+    args = parser.parse_args()
+
+    from tools import MIN_CONTENT_LENGTH
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+
+    results = {}
+    failed = False
+    print(f"{'file':<22} {'path':<12} {'size':>9} {'time':>9} {'peak':>10} {'output':>9}  verdict")
+    for name in corpus_files():
+        with open(os.path.join(CORPUS_DIR, name), "rb") as f:
+            data = f.read()
+        for path, extract in extractors(name, args.browser).items():
+            key = f"{name}:{path}"
+            try:
+                result = measure(extract, data, args.runs)
+            except Exception as e:
+                if path != "playwright":
+                    raise
+                print(f"{name:<22} {path:<12} skipped: {type(e).__name__}: {str(e).splitlines()[0]}")
+                continue
+            results[key] = result
+
+            notes = []
+            if path == "trafilatura" and result["output_chars"] < MIN_CONTENT_LENGTH:
+                notes.append("falls back to Playwright")
+            if key in baseline.get("files", {}) and not args.update_baseline:
+                problems = compare(result, baseline["files"][key], args.threshold)
+                failed |= bool(problems)
+                verdict = "REGRESSION: " + "; ".join(problems) if problems else "ok"
+            else:
+                verdict = "no baseline" if not args.update_baseline else "recorded"
+            print(f"{name:<22} {path:<12} {len(data) / 1024:8.0f}K {result['seconds']:8.4f}s {result['peak_kb']:>7} KB {result['output_chars']:>9}  "
+                  + ", ".join([verdict] + notes))
+
+    if args.update_baseline:
+        # Keep entries of paths not run this time (e.g. playwright without --browser)
+        files = {**baseline.get("files", {}), **results}
+        with open(BASELINE_PATH, "w") as f:
+            json.dump({"min_content_length": MIN_CONTENT_LENGTH, "files": dict(sorted(files.items()))}, f, indent=4)
+            f.write("\n")
+        print(f"Baseline written to {BASELINE_PATH}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
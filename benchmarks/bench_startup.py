@@ -0,0 +1,142 @@
+# benchmarks/bench_startup.py
+"""
+Startup regression benchmark.
+
+Measures, in fresh interpreter processes, how long `run.py --help` takes, how long importing
+`run.py` takes, and the time from process start until the first graph node starts
+(time-to-first-node). The graph run is stopped as soon as the first node starts, so no database,
+model or MCP server is needed. Also checks that heavy optional modules are not imported before
+the first node runs.
+
+Usage:
+    python benchmarks/bench_startup.py               # compare against startup_baseline.json
+    python benchmarks/bench_startup.py --update-baseline
+
+Exits with status 1 if a measurement exceeds its threshold or a forbidden module was imported.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_baseline.json")
+
+# Headroom applied to the measured medians when the baseline is updated
+BASELINE_HEADROOM = 1.5
+
+IMPORT_RUN_SCRIPT = """
+import time
+start = time.perf_counter()
+import run
+print(time.perf_counter() - start)
+"""
+
+# Builds the graph exactly as run.py does and stops it when the first node starts
+FIRST_NODE_SCRIPT = """
+import asyncio, json, sys, time
+import run
+
+async def first_node():
+    from langchain_core.messages import HumanMessage
+    from knowledge_agent import get_workflow_mcp_provider, create_knowledge_agent_graph
+    from agent_registry import get_registry
+    from callbacks import FirstNodeTimer
+    from checkpointing import get_run_config
+    from runtime import AgentRuntime
+
+    class FirstNodeReached(Exception):
+        pass
+
+    class StopAtFirstNode(FirstNodeTimer):
+        raise_error = True
+
+        def on_chain_start(self, *args, **kwargs):
+            super().on_chain_start(*args, **kwargs)
+            if self.time_to_first_node is not None:
+                raise FirstNodeReached()
+
+    task = sys.argv[1]
+    timer = StopAtFirstNode(run.PROCESS_STARTED_AT)
+    get_registry().load_all()
+    app = create_knowledge_agent_graph(task)
+    state = {
+        "messages": [HumanMessage(content="benchmark")],
+        "task": task,
+        "status": "benchmark",
+    }
+    runtime = AgentRuntime(None, get_workflow_mcp_provider(task))
+    try:
+        await app.ainvoke(state, {**get_run_config("benchmark", runtime), "callbacks": [timer]})
+    except FirstNodeReached:
+        pass
+    return timer.time_to_first_node
+
+time_to_first_node = asyncio.run(first_node())
+print(json.dumps({"time_to_first_node": time_to_first_node, "modules": sorted(sys.modules)}))
+"""
+
+
+def run_python(args: list) -> str:
+    env = {**os.environ, "DATABASE_URL": os.environ.get("DATABASE_URL", "postgresql://localhost/benchmark")}
+    result = subprocess.run([sys.executable, "-W", "ignore", *args], cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True)
+    return result.stdout.strip().splitlines()[-1] if result.stdout.strip() else ""
+
+
+def measure_help() -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "run.py", "--help"], cwd=REPO_ROOT, capture_output=True, check=True)
+    return time.perf_counter() - start
+
+
+def measure(runs: int, task: str) -> tuple:
+    """Returns the median of each measurement over `runs` fresh processes, and the modules loaded at the first node."""
+    samples = {"help": [], "import_run": [], "time_to_first_node": []}
+    modules = set()
+    for _ in range(runs):
+        samples["help"].append(measure_help())
+        samples["import_run"].append(float(run_python(["-c", IMPORT_RUN_SCRIPT])))
+        first_node = json.loads(run_python(["-c", FIRST_NODE_SCRIPT, task]))
+        samples["time_to_first_node"].append(first_node["time_to_first_node"])
+        modules.update(first_node["modules"])
+    return {name: statistics.median(values) for name, values in samples.items()}, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure CLI startup time and compare it against the baseline.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per measurement (the median is reported).")
+    parser.add_argument("--task", default="maintenance", help="Workflow whose first node is timed.")
+    parser.add_argument("--update-baseline", action="store_true", help="Write new thresholds from this run's measurements.")
+    args = parser.parse_args()
+
+    with open(BASELINE_PATH) as f:
+        baseline = json.load(f)
+
+    results, modules = measure(args.runs, args.task)
+    loaded_forbidden = sorted(name for name in baseline["forbidden_modules"] if name in modules)
+
+    if args.update_baseline:
+        baseline["thresholds_seconds"] = {name: round(value * BASELINE_HEADROOM, 3) for name, value in results.items()}
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(baseline, f, indent=4)
+            f.write("\n")
+
+    failed = False
+    for name, value in results.items():
+        threshold = baseline["thresholds_seconds"][name]
+        verdict = "ok" if value <= threshold else "REGRESSION"
+        failed |= value > threshold
+        print(f"{name:<20} {value:8.3f}s  (threshold {threshold:.3f}s)  {verdict}")
+
+    if loaded_forbidden:
+        failed = True
+        print(f"Heavy modules imported before the first node: {loaded_forbidden}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
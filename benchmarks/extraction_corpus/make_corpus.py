@@ -0,0 +1,174 @@
+# benchmarks/extraction_corpus/make_corpus.py
+"""
+Regenerates the extraction benchmark corpus in this directory.
+
+The files are checked in, so this only needs to run when the corpus itself should change (after
+which the baseline must be updated with `bench_extraction.py --update-baseline`). The output is
+deterministic.
+
+    python benchmarks/extraction_corpus/make_corpus.py
+"""
+import os
+import random
+import zlib
+
+CORPUS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+WORDS = (
+    "tariff trade policy exports imports quota ministry agreement customs duty shipment port "
+    "freight market price index inflation currency reserve bank supply chain manufacturer "
+    "semiconductor steel grain fertilizer energy pipeline contract regulation committee report "
+    "analysis forecast quarter annual growth decline volume capacity investment subsidy sanction "
+    "negotiation partner region province federal council industry labor wage productivity "
+    "consumer demand inventory logistics container vessel route corridor border inspection"
+).split()
+
+
+def sentence(rng: random.Random, words: int = None) -> str:
+    chosen = [rng.choice(WORDS) for _ in range(words or rng.randint(8, 22))]
+    return " ".join(chosen).capitalize() + "."
+
+
+def paragraph(rng: random.Random, sentences: int = None) -> str:
+    return " ".join(sentence(rng) for _ in range(sentences or rng.randint(3, 7)))
+
+
+def page(title: str, body: str, head_extra: str = "") -> str:
+    return (
+        f"<!DOCTYPE html>\n<html lang=\"en\"><head><meta charset=\"utf-8\"><title>{title}</title>{head_extra}</head>\n<body>\n"
+        "<header><nav><a href=\"/\">Home</a> | <a href=\"/news\">News</a> | <a href=\"/data\">Data</a> | <a href=\"/about\">About</a></nav></header>\n"
+        f"{body}\n"
+        "<footer><p>Copyright Example Trade Monitor. All rights reserved.</p><p><a href=\"/privacy\">Privacy</a> | <a href=\"/terms\">Terms</a></p></footer>\n"
+        "</body></html>\n"
+    )
+
+
+def small_article(rng: random.Random) -> str:
+    paragraphs = "\n".join(f"<p>{paragraph(rng)}</p>" for _ in range(5))
+    return page("Port volumes rise", f"<main><article><h1>Port volumes rise in the third quarter</h1>\n{paragraphs}\n</article></main>")
+
+
+def huge_article(rng: random.Random) -> str:
+    sections = []
+    for number in range(1, 61):
+        paragraphs = "\n".join(f"<p>{paragraph(rng, 8)}</p>" for _ in range(12))
+        sections.append(f"<section><h2>Section {number}: {sentence(rng, 5)[:-1]}</h2>\n{paragraphs}\n</section>")
+    sidebar = "\n".join(f"<li><a href=\"/news/{i}\">{sentence(rng, 6)}</a></li>" for i in range(200))
+    comments = "\n".join(f"<div class=\"comment\"><b>reader{i}</b><p>{sentence(rng)}</p></div>" for i in range(300))
+    body = (
+        f"<main><article><h1>Annual review of global trade flows</h1>\n{''.join(sections)}\n</article></main>\n"
+        f"<aside><h3>Related</h3><ul>{sidebar}</ul></aside>\n<section id=\"comments\">{comments}</section>"
+    )
+    return page("Annual review of global trade flows", body)
+
+
+def js_heavy(rng: random.Random) -> str:
+    # A single-page-app shell: the article only exists in a JSON payload that a script renders,
+    # so static extraction finds almost nothing and the browser fallback is needed
+    bundle = "\n".join(
+        f"function m{i}(a,b){{var c=a*{i}+b;for(var j=0;j<{i % 17 + 3};j++){{c=(c<<1)^j;}}return c;}}" for i in range(3000)
+    )
+    payload = "[" + ",".join(f"\"{paragraph(rng)}\"" for _ in range(25)) + "]"
+    body = (
+        "<div id=\"app\"><noscript>Enable JavaScript to read this article.</noscript><div class=\"spinner\">Loading</div></div>\n"
+        f"<script>{bundle}</script>\n"
+        f"<script>var paragraphs={payload};"
+        "var main=document.createElement('main');var h=document.createElement('h1');h.textContent='Shipping routes shift';main.appendChild(h);"
+        "paragraphs.forEach(function(t){var p=document.createElement('p');p.textContent=t;main.appendChild(p);});"
+        "var app=document.getElementById('app');app.innerHTML='';app.appendChild(main);</script>"
+    )
+    return page("Shipping routes shift", body)
+
+
+def table_heavy(rng: random.Random) -> str:
+    tables = []
+    for number in range(1, 41):
+        header = "".join(f"<th>{year}</th>" for year in range(2010, 2025))
+        rows = "\n".join(
+            f"<tr><td>{rng.choice(WORDS).capitalize()} {row}</td>" + "".join(f"<td>{rng.uniform(0, 10000):.1f}</td>" for _ in range(15)) + "</tr>"
+            for row in range(30)
+        )
+        tables.append(f"<h2>Table {number}: {sentence(rng, 5)[:-1]}</h2>\n<p>{paragraph(rng, 2)}</p>\n<table><thead><tr><th>Series</th>{header}</tr></thead><tbody>\n{rows}\n</tbody></table>")
+    return page("Trade statistics tables", f"<main><h1>Trade statistics</h1>\n{''.join(tables)}\n</main>")
+
+
+def _pdf(objects: list) -> bytes:
+    """Serializes PDF objects (bodies as bytes, numbered from 1) with a cross-reference table."""
+    output = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n".encode("latin-1") + body + b"\nendobj\n"
+    xref_offset = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    output += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode("latin-1")
+    return output
+
+
+def _stream(data: bytes, extra: str = "") -> bytes:
+    return f"<< /Length {len(data)} {extra}>>\nstream\n".encode("latin-1") + data + b"\nendstream"
+
+
+def text_pdf(pages: list) -> bytes:
+    """Builds a PDF with one page per entry in `pages`, each a list of lines of Helvetica text."""
+    page_count = len(pages)
+    # 1 catalog, 2 pages, 3 font, then a page object and a content stream per page
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(page_count))
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {page_count} >>".encode("latin-1"),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, lines in enumerate(pages):
+        text = "BT /F1 10 Tf 50 800 Td 13 TL " + " ".join(f"({line}) Tj T*" for line in lines) + " ET"
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Contents {5 + 2 * i} 0 R /Resources << /Font << /F1 3 0 R >> >> >>".encode("latin-1"))
+        objects.append(_stream(text.encode("latin-1")))
+    return _pdf(objects)
+
+
+def scanned_pdf(rng: random.Random, page_count: int = 2, width: int = 1240, height: int = 1754) -> bytes:
+    """Builds a PDF whose pages are only grayscale images of text-like lines, without a text layer."""
+    kids = " ".join(f"{3 + 3 * i} 0 R" for i in range(page_count))
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {page_count} >>".encode("latin-1"),
+    ]
+    for i in range(page_count):
+        rows = []
+        for y in range(height):
+            line = bytearray(b"\xff" * width)
+            if 100 < y < height - 100 and (y // 12) % 2 == 0:
+                x = 100
+                while x < width - 100:
+                    word = rng.randint(20, 90)
+                    line[x:min(x + word, width - 100)] = bytes([rng.randint(0, 90)]) * min(word, width - 100 - x)
+                    x += word + rng.randint(8, 16)
+            rows.append(bytes(line))
+        image = zlib.compress(b"".join(rows), 9)
+        content = f"q 612 0 0 842 0 0 cm /Im{i} Do Q".encode("latin-1")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Contents {4 + 3 * i} 0 R /Resources << /XObject << /Im{i} {5 + 3 * i} 0 R >> >> >>".encode("latin-1"))
+        objects.append(_stream(content))
+        objects.append(_stream(image, f"/Type /XObject /Subtype /Image /Width {width} /Height {height} /ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /FlateDecode "))
+    return _pdf(objects)
+
+
+def main():
+    rng = random.Random(20250827)
+    files = {
+        "small_article.html": small_article(rng).encode("utf-8"),
+        "huge_article.html": huge_article(rng).encode("utf-8"),
+        "js_heavy.html": js_heavy(rng).encode("utf-8"),
+        "table_heavy.html": table_heavy(rng).encode("utf-8"),
+        "short_report.pdf": text_pdf([[sentence(rng)[:90] for _ in range(55)]]),
+        "long_report.pdf": text_pdf([[sentence(rng)[:90] for _ in range(55)] for _ in range(20)]),
+        "scanned.pdf": scanned_pdf(rng),
+    }
+    for name, data in files.items():
+        with open(os.path.join(CORPUS_DIR, name), "wb") as f:
+            f.write(data)
+        print(f"{name:<20} {len(data) / 1024:9.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
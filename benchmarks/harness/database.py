@@ -0,0 +1,25 @@
+# benchmarks/harness/database.py
+import contextlib
+import uuid
+import psycopg2
+from psycopg2.extensions import make_dsn, parse_dsn
+
+
+@contextlib.contextmanager
+def throwaway_database(server_url: str):
+    """Creates an empty database on the server at `server_url`, yields its URL, and drops it afterwards."""
+    name = f"bench_{uuid.uuid4().hex[:12]}"
+    admin = psycopg2.connect(server_url)
+    admin.autocommit = True
+    try:
+        with admin.cursor() as cur:
+            cur.execute(f'CREATE DATABASE "{name}";')
+        yield make_dsn(server_url, dbname=name)
+    finally:
+        with admin.cursor() as cur:
+            cur.execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE);')
+        admin.close()
+
+
+def database_name(url: str) -> str:
+    return parse_dsn(url).get("dbname", "")
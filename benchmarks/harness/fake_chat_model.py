@@ -0,0 +1,118 @@
+# benchmarks/harness/fake_chat_model.py
+import asyncio
+import json
+import re
+import time
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from usage import current_usage_tags
+
+URL_PATTERN = re.compile(r"https?://[^\s'\"\\,}\]]+")
+
+# Distinct subjects per gap, so search results of different gaps are lexically distinguishable
+SUBJECTS = (
+    "steel tariffs", "semiconductor exports", "grain shipping", "lithium mining", "port congestion",
+    "currency swaps", "fertilizer prices", "rare earths", "container rates", "dairy quotas",
+    "solar panels", "copper smelting",
+)
+
+
+def _count_tokens(text: str) -> int:
+    # Close enough to a BPE tokenizer for benchmarking, without loading one
+    return max(1, len(text) // 4)
+
+
+class FakeAgentChatModel(BaseChatModel):
+    """
+    Deterministic chat model that answers each agent with well-formed JSON.
+
+    The agent is read from the usage tags set by the agent executor, so every prompt in
+    `prompts/` gets an answer in the shape its node parses. Each call sleeps for `latency`
+    seconds plus `seconds_per_token` per completion token, to stand in for a real model.
+    """
+
+    latency: float = 0.0
+    seconds_per_token: float = 0.0
+    gaps: int = 2
+    searches_per_gap: int = 2
+    approve_every: int = 2
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-agent"
+
+    @staticmethod
+    def _gap(number: int) -> dict:
+        subject = SUBJECTS[(number - 1) % len(SUBJECTS)]
+        if number > len(SUBJECTS):
+            subject = f"{subject} {number}"
+        return {
+            "gap_id": f"G{number}",
+            "description": f"Missing coverage of {subject}.",
+            "research_topic": {
+                "title": f"{subject} developments",
+                "summary": f"Recent developments in {subject} are not covered.",
+                "key_questions": [f"What changed in {subject}?", f"Who drives {subject}?"],
+                "keywords": subject.split() + ["trade", "policy"],
+            },
+        }
+
+    def _respond(self, agent: str, prompt: str) -> str:
+        user_input = prompt.rsplit("User:", 1)[-1]
+        if agent == "analyst":
+            return json.dumps({
+                "knowledge_base_summary": {"summary": "Fixture knowledge base.", "themes": [{"theme_id": "T1", "description": "Trade policy"}]},
+                "identified_gaps": [self._gap(i) for i in range(1, self.gaps + 1)],
+            })
+        if agent == "planner":
+            title = re.search(r"'title': '([^']*)'", user_input)
+            topic = title.group(1) if title else "fixture topic"
+            return json.dumps({"searches": [
+                {"search_id": f"S_P{i}", "query": f"{topic} angle {i}", "rationale": f"Search {i} for {topic}.", "parameters": {"sort": "date"}}
+                for i in range(1, self.searches_per_gap + 1)
+            ]})
+        if agent == "refiner":
+            return json.dumps({"status": "sufficient", "rationale": "The fixture results cover the key questions."})
+        if agent == "summarizer":
+            words = user_input.split()
+            return json.dumps({"summary": " ".join(words[:60])})
+        if agent == "search_ranker":
+            urls = list(dict.fromkeys(URL_PATTERN.findall(user_input)))
+            return json.dumps({"ranked_urls": [
+                {"url": url, "status": "approved" if i % self.approve_every == 0 else "denied", "rationale": "Fixture ranking."}
+                for i, url in enumerate(urls)
+            ]})
+        if agent == "auditor":
+            return json.dumps({"issues": [{"issue_id": "A1", "type": "duplicate_entity", "entities": ["Entity 1", "Entity 2"]}]})
+        if agent == "fixer":
+            return json.dumps({"operations": [
+                {"op_id": "F1", "issue_id": "A1", "action": "merge", "source_entities": ["WTO", "World Trade Organisation"], "target_entity": "World Trade Organization"},
+                {"op_id": "F2", "issue_id": "A1", "action": "update_entity", "entity_name": "Entity 1", "updated_data": {"description": "Fixture entity 1, cleaned up"}},
+                {"op_id": "F3", "issue_id": "A1", "action": "delete_relation", "source_entity": "Entity 1", "target_entity": "Entity 2"},
+                {"op_id": "F4", "issue_id": "A1", "action": "update_entity", "entity_name": "WTO", "updated_data": {"description": "Merged away"}},
+            ]})
+        if agent == "advisor":
+            return json.dumps({"recommendations": [{"setting": "entity_extract_max_gleaning", "value": 2, "rationale": "Fixture recommendation."}]})
+        return json.dumps({"output": "ok"})
+
+    def _result(self, messages) -> tuple:
+        prompt = "\n".join(str(message.content) for message in messages)
+        content = self._respond(current_usage_tags().get("agent"), prompt)
+        prompt_tokens, completion_tokens = _count_tokens(prompt), _count_tokens(content)
+        message = AIMessage(
+            content=content,
+            usage_metadata={"input_tokens": prompt_tokens, "output_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+        )
+        delay = self.latency + self.seconds_per_token * completion_tokens
+        return ChatResult(generations=[ChatGeneration(message=message)]), delay
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        result, delay = self._result(messages)
+        time.sleep(delay)
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        result, delay = self._result(messages)
+        await asyncio.sleep(delay)
+        return result
@@ -0,0 +1,249 @@
+# benchmarks/harness/fake_mcp_server.py
+"""
+Stand-in MCP servers for the offline benchmarks, run over stdio:
+
+    python fake_mcp_server.py --role search|lightrag|fetch|files
+
+Configured through environment variables (the benchmark writes them into the MCP config):
+    BENCH_FIXTURE_URL         base URL of the fixture HTTP server that search results point to
+    BENCH_RESULTS_PER_SEARCH  results returned by google_search
+    BENCH_URL_POOL            number of distinct fixture pages; a smaller pool means more duplicate URLs
+    BENCH_PDF_RATIO           share of results that are PDFs
+    BENCH_TOOL_LATENCY        seconds every tool call takes
+    BENCH_INDEX_SECONDS       seconds the fake LightRAG pipeline takes to index one document
+    BENCH_RECORD_DIR          directory the fake LightRAG records submitted documents in
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import time
+import urllib.request
+from mcp.server.fastmcp import FastMCP
+
+FIXTURE_URL = os.environ.get("BENCH_FIXTURE_URL", "http://127.0.0.1:8765")
+RESULTS_PER_SEARCH = int(os.environ.get("BENCH_RESULTS_PER_SEARCH", 5))
+URL_POOL = int(os.environ.get("BENCH_URL_POOL", 1000))
+PDF_RATIO = float(os.environ.get("BENCH_PDF_RATIO", 0.1))
+TOOL_LATENCY = float(os.environ.get("BENCH_TOOL_LATENCY", 0.0))
+INDEX_SECONDS = float(os.environ.get("BENCH_INDEX_SECONDS", 0.05))
+RECORD_DIR = os.environ.get("BENCH_RECORD_DIR", ".")
+
+
+def _number(key: str) -> int:
+    return int(hashlib.sha256(key.encode("utf-8")).hexdigest()[:8], 16)
+
+
+async def _latency():
+    if TOOL_LATENCY:
+        await asyncio.sleep(TOOL_LATENCY)
+
+
+def search_server() -> FastMCP:
+    mcp = FastMCP("fake_google_search", log_level="WARNING")
+
+    @mcp.tool()
+    async def google_search(query: str, num: int = None, sort: str = None, dateRestrict: str = None) -> str:
+        """Searches the web and returns a JSON list of results with title, url and snippet."""
+        await _latency()
+        results = []
+        for rank in range(num or RESULTS_PER_SEARCH):
+            page = _number(f"{query}:{rank}") % URL_POOL
+            is_pdf = (page % 100) < PDF_RATIO * 100
+            url = f"{FIXTURE_URL}/doc/p{page}.pdf" if is_pdf else f"{FIXTURE_URL}/page/p{page}.html"
+            results.append({
+                "title": f"Fixture page p{page} about {query}",
+                "url": url,
+                "snippet": f"Result {rank + 1} for {query}: fixture page p{page} covers {query} in detail.",
+            })
+        return json.dumps(results)
+
+    return mcp
+
+
+# Entity names the audit engine should pair up
+DUPLICATE_LABELS = ["World Trade Organization", "World Trade Organisation", "WTO", "U.S. Tariffs", "US tariff", "Section 301", "Section 232"]
+
+
+class FakePipeline:
+    """Indexes submitted documents one at a time, taking INDEX_SECONDS each, like LightRAG's extraction queue."""
+
+    def __init__(self):
+        self.queue = 0
+        self.busy_until = time.monotonic()
+        self.sources = set()
+        self.tracks = {}  # track_id -> [(file_path, time it is indexed)]
+
+    def submit(self, file_paths: list) -> str:
+        now = time.monotonic()
+        start = max(self.busy_until, now)
+        self.busy_until = start + len(file_paths) * INDEX_SECONDS
+        self.queue += len(file_paths)
+        track_id = f"insert_{len(self.tracks) + 1}"
+        self.tracks[track_id] = [(path, start + (i + 1) * INDEX_SECONDS) for i, path in enumerate(file_paths)]
+        return track_id
+
+    def track_status(self, track_id: str) -> dict:
+        now = time.monotonic()
+        documents = [{"file_path": path, "status": "processed" if now >= done_at else "pending"} for path, done_at in self.tracks.get(track_id, [])]
+        return {"track_id": track_id, "documents": documents, "total_count": len(documents)}
+
+    def status(self) -> dict:
+        remaining = max(self.busy_until - time.monotonic(), 0.0)
+        queued = min(self.queue, int(remaining / INDEX_SECONDS + 0.999)) if INDEX_SECONDS else 0
+        self.queue = queued
+        return {"busy": queued > 0, "request_pending": False, "docs": queued, "batchs": 1 if queued else 0, "cur_batch": 1 if queued else 0}
+
+
+def lightrag_server() -> FastMCP:
+    mcp = FastMCP("fake_lightrag", log_level="WARNING")
+    pipeline = FakePipeline()
+    record_path = os.path.join(RECORD_DIR, "lightrag_inserts.jsonl")
+
+    def record(kind: str, source: str, size: int):
+        with open(record_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"kind": kind, "source": source, "bytes": size, "at": time.time()}) + "\n")
+
+    @mcp.tool()
+    async def query(query: str, mode: str = "mix") -> str:
+        """Queries the knowledge graph."""
+        await _latency()
+        return f"The knowledge base has limited coverage of {query}. Coverage of recent trade policy and tariff data is sparse."
+
+    @mcp.tool()
+    async def graph_labels() -> str:
+        """Lists the entity labels in the knowledge graph."""
+        await _latency()
+        return json.dumps([f"Entity {i}" for i in range(50)] + DUPLICATE_LABELS)
+
+    @mcp.tool()
+    async def graphs_get(label: str = "*", max_depth: int = 2, max_nodes: int = 100) -> str:
+        """Returns a subgraph around a label."""
+        await _latency()
+        names = [f"Entity {i}" for i in range(min(max_nodes, 20))]
+        if label not in ("*", *names):
+            names = [label] + names[:max_nodes - 1]
+        nodes = [{"id": name, "labels": [name], "properties": {"entity_type": "organization", "description": f"Fixture entity {name}"}} for name in names]
+        edges = [{"source": names[i], "target": names[i + 1], "type": "RELATED"} for i in range(len(names) - 1)]
+        return json.dumps({"nodes": nodes, "edges": edges})
+
+    @mcp.tool()
+    async def graph_entity_exists(name: str) -> str:
+        """Checks whether an entity exists."""
+        await _latency()
+        return json.dumps({"exists": name.startswith("Entity") or name in DUPLICATE_LABELS})
+
+    @mcp.tool()
+    async def graph_update_entity(entity_name: str, updated_data: dict) -> str:
+        """Updates an entity."""
+        await _latency()
+        return json.dumps({"status": "success"})
+
+    @mcp.tool()
+    async def graph_update_relation(source_id: str, target_id: str, updated_data: dict) -> str:
+        """Updates a relation."""
+        await _latency()
+        return json.dumps({"status": "success"})
+
+    @mcp.tool()
+    async def documents_delete_entity(entity_name: str) -> str:
+        """Deletes an entity."""
+        await _latency()
+        return json.dumps({"status": "success"})
+
+    @mcp.tool()
+    async def documents_delete_relation(source_entity: str, target_entity: str) -> str:
+        """Deletes a relation."""
+        await _latency()
+        return json.dumps({"status": "success"})
+
+    @mcp.tool()
+    async def documents_insert_text(text: str, file_source: str = None) -> str:
+        """Inserts a text document into the pipeline."""
+        await _latency()
+        if file_source in pipeline.sources:
+            return json.dumps({"status": "duplicated", "message": f"{file_source} already exists"})
+        pipeline.sources.add(file_source)
+        track_id = pipeline.submit([file_source])
+        record("text", file_source, len(text))
+        return json.dumps({"status": "success", "message": "Document accepted", "track_id": track_id})
+
+    @mcp.tool()
+    async def documents_upload_files(file_paths: list) -> str:
+        """Uploads files into the pipeline."""
+        await _latency()
+        for path in file_paths:
+            record("file", path, os.path.getsize(path) if os.path.exists(path) else 0)
+        track_id = pipeline.submit([os.path.basename(path) for path in file_paths])
+        return json.dumps({"status": "success", "message": f"{len(file_paths)} files accepted", "track_id": track_id})
+
+    @mcp.tool()
+    async def documents_pipeline_status() -> str:
+        """Reports the state of the document pipeline."""
+        return json.dumps(pipeline.status())
+
+    @mcp.tool()
+    async def documents_track_status(track_id: str) -> str:
+        """Reports the processing status of the documents of one submission."""
+        return json.dumps(pipeline.track_status(track_id))
+
+    return mcp
+
+
+def fetch_server() -> FastMCP:
+    mcp = FastMCP("fake_fetch", log_level="WARNING")
+
+    @mcp.tool()
+    async def fetch(url: str, max_length: int = 5000) -> str:
+        """Fetches a URL and returns its content."""
+        await _latency()
+
+        def get():
+            with urllib.request.urlopen(url, timeout=10) as response:
+                return response.read()[:max_length].decode("utf-8", errors="replace")
+        try:
+            return await asyncio.to_thread(get)
+        except Exception as e:
+            return f"Failed to fetch {url}: {e}"
+
+    return mcp
+
+
+def files_server() -> FastMCP:
+    mcp = FastMCP("fake_file_tools", log_level="WARNING")
+
+    @mcp.tool()
+    async def list_allowed_directories() -> str:
+        """Lists the directories the server may read."""
+        return "/workspace/knowledge_agent\n/workspace/LightRAG"
+
+    @mcp.tool()
+    async def list_directory(path: str) -> str:
+        """Lists a directory."""
+        await _latency()
+        return "[FILE] config.ini\n[FILE] README.md\n[DIR] lightrag"
+
+    @mcp.tool()
+    async def search_files(path: str, pattern: str) -> str:
+        """Searches for files by pattern."""
+        await _latency()
+        return f"{path}/config.ini"
+
+    @mcp.tool()
+    async def read_text_file(path: str) -> str:
+        """Reads a text file."""
+        await _latency()
+        return "[lightrag]\nchunk_token_size = 1200\nentity_extract_max_gleaning = 1\n"
+
+    return mcp
+
+
+ROLES = {"search": search_server, "lightrag": lightrag_server, "fetch": fetch_server, "files": files_server}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a fake MCP server for the benchmarks.")
+    parser.add_argument("--role", choices=sorted(ROLES), required=True)
+    args = parser.parse_args()
+    ROLES[args.role]().run()
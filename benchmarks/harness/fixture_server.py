@@ -0,0 +1,124 @@
+# benchmarks/harness/fixture_server.py
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PARAGRAPH = (
+    "The knowledge base benchmark fixture describes {topic} in detail. Analysts track how {topic} "
+    "changes over time, which sources report on it, and how its indicators relate to policy, trade "
+    "and markets. This paragraph exists to give the extractor realistic prose to work with. "
+)
+
+
+def _fraction(key: str) -> float:
+    """Deterministic pseudo-random number in [0, 1) for a key."""
+    return int(hashlib.sha256(key.encode("utf-8")).hexdigest()[:8], 16) / 0xFFFFFFFF
+
+
+def make_html(page_id: str, paragraphs: int) -> bytes:
+    body = "\n".join(f"<p>{PARAGRAPH.format(topic=f'topic {page_id}')} ({i})</p>" for i in range(paragraphs))
+    return (
+        f"<!DOCTYPE html><html><head><title>Fixture page {page_id}</title></head><body>"
+        f"<nav><a href='/'>Home</a></nav><main><article><h1>Fixture page {page_id}</h1>{body}"
+        f"<table><tr><th>Year</th><th>Value</th></tr><tr><td>2024</td><td>{len(page_id)}</td></tr></table>"
+        f"</article></main><footer>Fixture footer</footer></body></html>"
+    ).encode("utf-8")
+
+
+def make_pdf(lines: list) -> bytes:
+    """Builds a minimal single-page PDF with one line of Helvetica text per entry in `lines`."""
+    text_ops = "BT /F1 11 Tf 50 780 Td 14 TL " + " ".join(
+        f"({line.replace('(', '').replace(')', '')}) Tj T*" for line in lines[:50]
+    ) + " ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Contents 4 0 R /Resources << /Font << /F1 5 0 R >> >> >>",
+        f"<< /Length {len(text_ops)} >>\nstream\n{text_ops}\nendstream",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    output = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref_offset = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    output += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode("latin-1")
+    return output
+
+
+class FixtureServer:
+    """
+    Local HTTP server for fetch benchmarks.
+
+    Serves `/page/<id>.html` (an article whose length varies with the ID) and `/doc/<id>.pdf`
+    (a one-page PDF). Every response is delayed by `delay_seconds`, and a deterministic
+    `error_rate` share of IDs answer 500 instead.
+    """
+
+    def __init__(self, delay_seconds: float = 0.0, error_rate: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        self.delay_seconds = delay_seconds
+        self.error_rate = error_rate
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_HEAD(self):
+                self._respond(include_body=False)
+
+            def do_GET(self):
+                self._respond(include_body=True)
+
+            def _respond(self, include_body: bool):
+                server.requests += 1
+                if server.delay_seconds:
+                    time.sleep(server.delay_seconds)
+                status, content_type, body = server.render(self.path)
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if include_body:
+                    self.wfile.write(body)
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def render(self, path: str) -> tuple:
+        """Returns (status, content_type, body) for a request path."""
+        page_id = path.rsplit("/", 1)[-1].split(".")[0]
+        if not page_id or _fraction(f"error:{page_id}") < self.error_rate:
+            return 500, "text/plain", b"fixture error"
+        if path.startswith("/page/"):
+            return 200, "text/html; charset=utf-8", make_html(page_id, paragraphs=5 + int(_fraction(page_id) * 40))
+        if path.startswith("/doc/"):
+            lines = [f"Fixture report {page_id}, line {i}: {PARAGRAPH.format(topic=page_id)[:80]}" for i in range(40)]
+            return 200, "application/pdf", make_pdf(lines)
+        return 404, "text/plain", b"not found"
+
+    def start(self) -> "FixtureServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,48 @@
+# callbacks.py
+import logging
+import time
+from langchain_core.callbacks import BaseCallbackHandler
+from tracing import start_span, end_span
+
+logger = logging.getLogger('KnowledgeAgent')
+
+
+class FirstNodeTimer(BaseCallbackHandler):
+    """Records the time from process start to the first graph node starting (time-to-first-node)."""
+
+    def __init__(self, started_at: float):
+        self.started_at = started_at
+        self.time_to_first_node = None
+        self.first_node = None
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        if node and self.time_to_first_node is None:
+            self.time_to_first_node = time.perf_counter() - self.started_at
+            self.first_node = node
+            logger.info(f"Time to first node ('{node}'): {self.time_to_first_node:.2f}s")
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Records a span for every LLM call, as a child of the span that made the call."""
+
+    run_inline = True
+
+    def __init__(self):
+        self._spans = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        model = (kwargs.get("invocation_params") or {}).get("model_name") or (serialized or {}).get("name", "chat_model")
+        self._spans[run_id] = start_span(f"llm:{model}", kind="llm", node=(metadata or {}).get("langgraph_node"))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        active = self._spans.pop(run_id, None)
+        if active is not None:
+            usage = (response.llm_output or {}).get("token_usage") or {}
+            for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+                if key in usage:
+                    active.set_attribute(key, usage[key])
+        end_span(active)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        end_span(self._spans.pop(run_id, None), error)
@@ -0,0 +1,40 @@
+# checkpointing.py
+import os
+from contextlib import asynccontextmanager
+from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+from runtime import RUNTIME_KEY
+
+# The researcher takes one graph step per gap, so a run takes roughly as many steps as its analyst report has
+# gaps plus a dozen; the limit only guards against a node looping forever and is far above any realistic report
+RECURSION_LIMIT = 10000
+
+@asynccontextmanager
+async def open_checkpointer():
+    """Opens a Postgres checkpointer on DATABASE_URL, creating its tables if needed."""
+    async with AsyncPostgresSaver.from_conn_string(os.environ["DATABASE_URL"]) as checkpointer:
+        await checkpointer.setup()
+        yield checkpointer
+
+
+def make_run_id(timestamp: str, task: str) -> str:
+    """
+    Builds a run ID from the run timestamp, in the same format as the report IDs, and the task,
+    since runs of different workflows may start in the same second (e.g. in the daemon).
+    """
+    return f"run_{timestamp.replace('-', '').replace(':', '').replace('T', '_').split('.')[0]}_{task}"
+
+
+def get_run_config(run_id: str, runtime=None) -> dict:
+    """Returns the graph config that checkpoints a run under its run ID and hands the nodes their runtime objects."""
+    configurable = {"thread_id": run_id}
+    if runtime is not None:
+        configurable[RUNTIME_KEY] = runtime
+    return {"configurable": configurable, "recursion_limit": RECURSION_LIMIT}
+
+
+async def load_run_state(checkpointer, run_id: str) -> dict | None:
+    """Returns the state values from the last checkpoint of a run, or None if the run is unknown."""
+    checkpoint_tuple = await checkpointer.aget_tuple(get_run_config(run_id))
+    if not checkpoint_tuple:
+        return None
+    return checkpoint_tuple.checkpoint.get("channel_values", {})
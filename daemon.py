@@ -0,0 +1,231 @@
+# daemon.py
+"""
+Resident service mode (`python run.py --daemon`).
+
+Instead of cold-starting for every run, the daemon keeps its resources warm between runs: the
+chat model client, one MCP tool provider per workflow (whose server sessions stay open), a
+database connection pool, the HTTP session used for fetches and a headless browser. Workflows run
+on the intervals in DAEMON_SCHEDULE or on demand through a small HTTP API on DAEMON_HOST:DAEMON_PORT:
+
+    GET  /status             workflows in progress, the last result and next scheduled run of each
+    POST /run/<workflow>     starts a workflow; 409 if a run of it is already in progress
+
+A workflow never runs twice at the same time: a scheduled run that comes due while the previous
+one is still going is skipped, and a request for it is refused. Different workflows may overlap.
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import signal
+import time
+from datetime import datetime, timezone
+
+logger = logging.getLogger('KnowledgeAgent')
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8790
+DEFAULT_DB_POOL_SIZE = 10
+
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_duration(text: str) -> float:
+    """Parses a duration such as '90s', '15m', '6h' or '1d' (a bare number is seconds) into seconds."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([smhd]?)\s*", text)
+    if not match:
+        raise ValueError(f"Invalid duration '{text}'; expected a number with an optional s, m, h or d suffix")
+    return float(match.group(1)) * DURATION_UNITS[match.group(2) or "s"]
+
+
+def parse_schedule(text: str) -> dict:
+    """Parses DAEMON_SCHEDULE, e.g. 'maintenance=1d,research=6h', into {workflow: interval in seconds}."""
+    from knowledge_agent import WORKFLOW_TOOLS
+
+    schedule = {}
+    for entry in filter(None, (part.strip() for part in (text or "").split(","))):
+        workflow, _, interval = entry.partition("=")
+        workflow = workflow.strip()
+        if workflow not in WORKFLOW_TOOLS:
+            raise ValueError(f"Unknown workflow '{workflow}' in DAEMON_SCHEDULE; expected one of {sorted(WORKFLOW_TOOLS)}")
+        seconds = parse_duration(interval)
+        if seconds <= 0:
+            raise ValueError(f"The interval of '{workflow}' in DAEMON_SCHEDULE must be positive")
+        schedule[workflow] = seconds
+    return schedule
+
+
+def _timestamp(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat(timespec="seconds")
+
+
+class Daemon:
+    """Runs workflows with warm resources, at most one run per workflow at a time."""
+
+    def __init__(self, model, schedule: dict, serial: bool = False):
+        self.model = model
+        self.schedule = schedule
+        self.serial = serial
+        self.providers = {}
+        self.running = {}
+        self.last_runs = {}
+        self.next_runs = {}
+        self._tasks = set()
+
+    def start_run(self, workflow: str, trigger: str) -> bool:
+        """Starts a run of the workflow in the background. Returns False if one is already in progress."""
+        if workflow in self.running:
+            return False
+        self.running[workflow] = {"trigger": trigger, "started_at": _timestamp(time.time())}
+        task = asyncio.create_task(self._run(workflow, trigger))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _run(self, workflow: str, trigger: str):
+        from knowledge_agent import get_workflow_mcp_provider
+        from run import run_workflow
+
+        started = time.perf_counter()
+        result = {"trigger": trigger, "started_at": self.running[workflow]["started_at"]}
+        logger.info(f"Daemon starting '{workflow}' workflow ({trigger}).")
+        try:
+            if workflow not in self.providers:
+                self.providers[workflow] = get_workflow_mcp_provider(workflow)
+            final_state = await run_workflow(workflow, self.model, started_at=started, serial=self.serial, mcp_provider=self.providers[workflow])
+            result.update({"run_id": (final_state or {}).get("run_id"), "status": (final_state or {}).get("status"), "error": None})
+        except asyncio.CancelledError:
+            result.update({"status": "cancelled", "error": None})
+            raise
+        except Exception as e:
+            logger.error(f"Daemon run of '{workflow}' failed: {e}", exc_info=True)
+            result.update({"status": "failed", "error": f"{type(e).__name__}: {e}"})
+        finally:
+            result.update({"finished_at": _timestamp(time.time()), "seconds": round(time.perf_counter() - started, 1)})
+            self.last_runs[workflow] = result
+            self.running.pop(workflow, None)
+            logger.info(f"Daemon finished '{workflow}' workflow in {result['seconds']}s: {result['status']}")
+
+    async def run_schedule(self, workflow: str, interval: float):
+        """Starts the workflow every `interval` seconds, skipping a turn while the previous run is still going."""
+        next_run = time.time() + interval
+        while True:
+            self.next_runs[workflow] = next_run
+            await asyncio.sleep(max(next_run - time.time(), 0))
+            if not self.start_run(workflow, "schedule"):
+                logger.warning(f"Skipping scheduled '{workflow}' run: the previous run is still in progress.")
+            # Missed turns (e.g. after a suspend) are not made up
+            next_run = max(next_run + interval, time.time())
+
+    def status(self) -> dict:
+        return {
+            "running": self.running,
+            "last_runs": self.last_runs,
+            "schedule": {workflow: {"interval_seconds": interval, "next_run": _timestamp(self.next_runs[workflow]) if workflow in self.next_runs else None}
+                         for workflow, interval in self.schedule.items()},
+            "warm_mcp_servers": {workflow: provider.started_servers for workflow, provider in self.providers.items()},
+        }
+
+    async def handle_request(self, method: str, path: str) -> tuple:
+        """Returns the (status code, JSON body) of an API request."""
+        from knowledge_agent import WORKFLOW_TOOLS
+
+        if method == "GET" and path == "/status":
+            return 200, self.status()
+        if path.startswith("/run/"):
+            if method != "POST":
+                return 405, {"error": "Use POST to start a workflow"}
+            workflow = path[len("/run/"):]
+            if workflow not in WORKFLOW_TOOLS:
+                return 404, {"error": f"Unknown workflow '{workflow}'", "workflows": sorted(WORKFLOW_TOOLS)}
+            if not self.start_run(workflow, "api"):
+                return 409, {"error": f"A '{workflow}' run is already in progress", "running": self.running[workflow]}
+            return 202, {"workflow": workflow, "started": True}
+        return 404, {"error": f"Unknown endpoint {method} {path}"}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serves one HTTP/1.1 request; the API has no request bodies, so only the request line is used."""
+        try:
+            request_line = (await asyncio.wait_for(reader.readline(), 10)).decode("latin-1").split()
+            # Read and ignore the headers
+            while (await asyncio.wait_for(reader.readline(), 10)) not in (b"\r\n", b"\n", b""):
+                pass
+            if len(request_line) < 2:
+                code, body = 400, {"error": "Malformed request"}
+            else:
+                code, body = await self.handle_request(request_line[0].upper(), request_line[1].split("?")[0].rstrip("/") or "/")
+        except asyncio.TimeoutError:
+            code, body = 408, {"error": "Request timed out"}
+
+        payload = json.dumps(body, indent=2, default=str).encode("utf-8")
+        reasons = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 408: "Request Timeout", 409: "Conflict"}
+        writer.write(
+            f"HTTP/1.1 {code} {reasons[code]}\r\nContent-Type: application/json\r\nContent-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode("latin-1")
+            + payload
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def shutdown(self):
+        """Cancels the runs in progress (they can be resumed from their checkpoints) and closes the warm resources."""
+        from db_utils import close_db_pool
+        from tools import close_browser
+
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for workflow, result in self.last_runs.items():
+            if result["status"] == "cancelled":
+                logger.info(f"Cancelled the '{workflow}' run in progress; resume it with the --resume run ID logged when it started.")
+        await asyncio.gather(*(provider.aclose() for provider in self.providers.values()), return_exceptions=True)
+        try:
+            await close_browser()
+        except Exception as e:
+            logger.warning(f"Failed to close the browser: {e}")
+        close_db_pool()
+
+
+async def serve(model, serial: bool = False):
+    """Runs the daemon until SIGINT or SIGTERM."""
+    from db_utils import migrate_database, open_db_pool
+    from agent_registry import get_registry
+    from tools import open_browser
+
+    schedule = parse_schedule(os.environ.get("DAEMON_SCHEDULE", ""))
+    host = os.environ.get("DAEMON_HOST", DEFAULT_HOST)
+    port = int(os.environ.get("DAEMON_PORT", DEFAULT_PORT))
+
+    # Warm up everything that does not depend on the workflow; MCP servers start with a workflow's first run
+    applied_migrations = migrate_database()
+    if applied_migrations:
+        logger.info(f"Applied database migrations: {applied_migrations}")
+    get_registry().load_all()
+    open_db_pool(int(os.environ.get("DAEMON_DB_POOL_SIZE", DEFAULT_DB_POOL_SIZE)))
+    try:
+        await open_browser()
+    except Exception as e:
+        logger.warning(f"Could not launch a shared browser, Playwright fallbacks will launch their own: {e}")
+
+    daemon = Daemon(model, schedule, serial=serial)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signal_number, stop.set)
+
+    server = await asyncio.start_server(daemon.handle_connection, host, port)
+    schedulers = [asyncio.create_task(daemon.run_schedule(workflow, interval)) for workflow, interval in schedule.items()]
+    status = f"Knowledge Agent daemon listening on http://{host}:{port} with schedule {schedule or 'none (API only)'}"
+    logger.info(status)
+    try:
+        await stop.wait()
+    finally:
+        logger.info("Shutting down the Knowledge Agent daemon...")
+        server.close()
+        await server.wait_closed()
+        for scheduler in schedulers:
+            scheduler.cancel()
+        await asyncio.gather(*schedulers, return_exceptions=True)
+        await daemon.shutdown()
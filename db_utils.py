@@ -1,39 +1,165 @@
 # db_utils.py
 import os
 import psycopg2
+import psycopg2.pool
+import hashlib
 import json
 from contextlib import contextmanager
 import json_repair
+from tracing import traced
 
 # --- Database Connection ---
+# Connection pool of a long-running process (the daemon); without one every call opens its own connection
+_pool = None
+
+def open_db_pool(max_connections: int = 10):
+    """Keeps up to `max_connections` connections to DATABASE_URL open for reuse by get_db_connection()."""
+    global _pool
+    if _pool is None:
+        _pool = psycopg2.pool.ThreadedConnectionPool(1, max_connections, os.environ["DATABASE_URL"])
+
+def close_db_pool():
+    global _pool
+    if _pool is not None:
+        _pool.closeall()
+        _pool = None
+
 @contextmanager
 def get_db_connection():
-    """Provides a database connection using a context manager."""
-    conn = psycopg2.connect(os.environ["DATABASE_URL"])
+    """Provides a database connection using a context manager, from the pool if one is open."""
+    pool = _pool
+    conn = None
+    if pool is not None:
+        try:
+            conn = pool.getconn()
+        except psycopg2.pool.PoolError:
+            pass  # Every pooled connection is in use; fall back to a connection of our own
+    if conn is None:
+        conn = psycopg2.connect(os.environ["DATABASE_URL"])
+        try:
+            yield conn
+        finally:
+            conn.close()
+        return
+
     try:
         yield conn
     finally:
-        conn.close()
+        # Hand the connection back without a half-finished transaction; drop it if it broke
+        broken = bool(conn.closed)
+        if not broken:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+        pool.putconn(conn, close=broken)
 
-# --- Table Creation ---
-def create_tables():
-    """Creates all necessary tables in the database if they don't exist."""
-    commands = (
+# --- Schema Migrations ---
+# Each migration is (version, description, statements). Versions are applied in order and recorded in
+# schema_migrations; add new schema changes as a new migration instead of editing an applied one.
+MIGRATIONS = (
+    (1, "Create report and document tables", (
         """CREATE TABLE IF NOT EXISTS analyst_reports (id SERIAL PRIMARY KEY, report_id VARCHAR(255) UNIQUE NOT NULL, report JSONB, created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP);""",
         """CREATE TABLE IF NOT EXISTS researcher_reports (id SERIAL PRIMARY KEY, report_id VARCHAR(255) UNIQUE NOT NULL, report JSONB, created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP);""",
         """CREATE TABLE IF NOT EXISTS curator_reports (id SERIAL PRIMARY KEY, report_id VARCHAR(255) UNIQUE NOT NULL, report JSONB, created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP);""",
         """CREATE TABLE IF NOT EXISTS auditor_reports (id SERIAL PRIMARY KEY, report_id VARCHAR(255) UNIQUE NOT NULL, report JSONB, created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP);""",
         """CREATE TABLE IF NOT EXISTS fixer_reports (id SERIAL PRIMARY KEY, report_id VARCHAR(255) UNIQUE NOT NULL, report JSONB, created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP);""",
         """CREATE TABLE IF NOT EXISTS advisor_reports (id SERIAL PRIMARY KEY, report_id VARCHAR(255) UNIQUE NOT NULL, report JSONB, created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP);""",
-        """CREATE TABLE IF NOT EXISTS documents (id SERIAL PRIMARY KEY, url TEXT UNIQUE NOT NULL, raw_document BYTEA, markdown_content TEXT, summary TEXT, created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP);"""
-    )
+        """CREATE TABLE IF NOT EXISTS documents (id SERIAL PRIMARY KEY, url TEXT UNIQUE NOT NULL, raw_document BYTEA, markdown_content TEXT, summary TEXT, created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP);""",
+    )),
+    (2, "Track document ingestion status", (
+        """ALTER TABLE documents ADD COLUMN IF NOT EXISTS ingestion_status VARCHAR(32) NOT NULL DEFAULT 'not_ingested';""",
+        """ALTER TABLE documents ADD COLUMN IF NOT EXISTS ingested_at TIMESTAMP WITH TIME ZONE;""",
+    )),
+    (3, "Record curator search rankings", (
+        """CREATE TABLE IF NOT EXISTS search_rankings (id SERIAL PRIMARY KEY, researcher_report_id VARCHAR(255) NOT NULL, gap_id VARCHAR(255) NOT NULL, search_id VARCHAR(255) NOT NULL, curator_report_id VARCHAR(255), ranked_urls JSONB, created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP, UNIQUE (researcher_report_id, gap_id, search_id));""",
+    )),
+    (4, "Record LLM token usage per run", (
+        """CREATE TABLE IF NOT EXISTS run_usage (id SERIAL PRIMARY KEY, run_id VARCHAR(255) NOT NULL, node VARCHAR(255) NOT NULL DEFAULT '', agent VARCHAR(255) NOT NULL DEFAULT '', gap_id VARCHAR(255) NOT NULL DEFAULT '', search_id VARCHAR(255) NOT NULL DEFAULT '', url_id INTEGER, calls INTEGER NOT NULL DEFAULT 0, prompt_tokens BIGINT NOT NULL DEFAULT 0, completion_tokens BIGINT NOT NULL DEFAULT 0, llm_seconds DOUBLE PRECISION NOT NULL DEFAULT 0, estimated_cost NUMERIC(14, 6) NOT NULL DEFAULT 0, created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP, updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP);""",
+        """CREATE UNIQUE INDEX IF NOT EXISTS run_usage_key ON run_usage (run_id, node, agent, gap_id, search_id, (COALESCE(url_id, 0)));""",
+    )),
+    (5, "Record fetch telemetry", (
+        """CREATE TABLE IF NOT EXISTS fetch_telemetry (id SERIAL PRIMARY KEY, run_id VARCHAR(255), url_id INTEGER, url TEXT NOT NULL, host VARCHAR(255) NOT NULL, status_code INTEGER, content_type VARCHAR(255), bytes BIGINT NOT NULL DEFAULT 0, wasted_bytes BIGINT NOT NULL DEFAULT 0, extractor VARCHAR(32), browser_fallback BOOLEAN NOT NULL DEFAULT FALSE, output_chars INTEGER NOT NULL DEFAULT 0, head_ms DOUBLE PRECISION, download_ms DOUBLE PRECISION, extract_ms DOUBLE PRECISION, browser_ms DOUBLE PRECISION, total_ms DOUBLE PRECISION NOT NULL, error_class VARCHAR(255), created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP);""",
+        """CREATE INDEX IF NOT EXISTS fetch_telemetry_host_created_at ON fetch_telemetry (host, created_at);""",
+        """CREATE INDEX IF NOT EXISTS fetch_telemetry_created_at ON fetch_telemetry (created_at);""",
+    )),
+    (6, "Create the job queue", (
+        """CREATE TABLE IF NOT EXISTS jobs (id BIGSERIAL PRIMARY KEY, kind VARCHAR(32) NOT NULL, payload JSONB NOT NULL, run_id VARCHAR(255), status VARCHAR(16) NOT NULL DEFAULT 'queued', attempts INTEGER NOT NULL DEFAULT 0, max_attempts INTEGER NOT NULL DEFAULT 3, available_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP, leased_until TIMESTAMP WITH TIME ZONE, worker VARCHAR(255), result JSONB, last_error TEXT, created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP, updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP);""",
+        """CREATE INDEX IF NOT EXISTS jobs_queued ON jobs (kind, available_at) WHERE status = 'queued';""",
+        """CREATE INDEX IF NOT EXISTS jobs_leased ON jobs (leased_until) WHERE status = 'running';""",
+    )),
+    (7, "Track document freshness", (
+        """ALTER TABLE documents ADD COLUMN IF NOT EXISTS fetched_at TIMESTAMP WITH TIME ZONE;""",
+        """ALTER TABLE documents ADD COLUMN IF NOT EXISTS content_hash VARCHAR(32);""",
+        """ALTER TABLE documents ADD COLUMN IF NOT EXISTS fetch_count INTEGER NOT NULL DEFAULT 0;""",
+        """ALTER TABLE documents ADD COLUMN IF NOT EXISTS change_count INTEGER NOT NULL DEFAULT 0;""",
+        """ALTER TABLE documents ADD COLUMN IF NOT EXISTS changed_at TIMESTAMP WITH TIME ZONE;""",
+        """ALTER TABLE documents ADD COLUMN IF NOT EXISTS summary_hash VARCHAR(32);""",
+        """UPDATE documents SET fetched_at = created_at, content_hash = md5(markdown_content), fetch_count = 1 WHERE markdown_content IS NOT NULL AND fetched_at IS NULL;""",
+        """UPDATE documents SET summary_hash = content_hash WHERE summary IS NOT NULL AND summary_hash IS NULL;""",
+    )),
+    (8, "Create the knowledge graph snapshot", (
+        """CREATE TABLE IF NOT EXISTS graph_entities (name TEXT PRIMARY KEY, properties JSONB NOT NULL DEFAULT '{}', fetched_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP, dirty BOOLEAN NOT NULL DEFAULT FALSE);""",
+        """CREATE TABLE IF NOT EXISTS graph_relations (source TEXT NOT NULL, target TEXT NOT NULL, properties JSONB NOT NULL DEFAULT '{}', fetched_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP, PRIMARY KEY (source, target));""",
+        """CREATE INDEX IF NOT EXISTS graph_relations_target ON graph_relations (target);""",
+        """CREATE INDEX IF NOT EXISTS graph_entities_revalidate ON graph_entities (dirty DESC, fetched_at);""",
+        """CREATE TABLE IF NOT EXISTS graph_snapshot (id INTEGER PRIMARY KEY CHECK (id = 1), watermark TIMESTAMP WITH TIME ZONE NOT NULL, labels_hash VARCHAR(32), entity_count INTEGER NOT NULL DEFAULT 0, relation_count INTEGER NOT NULL DEFAULT 0);""",
+    )),
+    (9, "Index documents for full-text search", (
+        # Summaries weigh more than the markdown, of which the first 100,000 characters are indexed (a tsvector is at most 1 MB)
+        """ALTER TABLE documents ADD COLUMN IF NOT EXISTS search_vector TSVECTOR GENERATED ALWAYS AS (setweight(to_tsvector('english', COALESCE(summary, '')), 'A') || setweight(to_tsvector('english', left(COALESCE(markdown_content, ''), 100000)), 'B')) STORED;""",
+        """CREATE INDEX IF NOT EXISTS documents_search_vector ON documents USING GIN (search_vector);""",
+    )),
+    (10, "Record job queue worker heartbeats", (
+        """CREATE TABLE IF NOT EXISTS job_workers (worker VARCHAR(255) PRIMARY KEY, kinds JSONB NOT NULL, started_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP, heartbeat_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP);""",
+    )),
+    (11, "Keep the full-text index free of pending entries", (
+        # Entries in the GIN pending list are costly to scan, so until a vacuum merges them the planner
+        # rightly avoids the index; documents are written one at a time, so they go straight into it
+        """ALTER INDEX documents_search_vector SET (fastupdate = off);""",
+        """SELECT gin_clean_pending_list('documents_search_vector'::regclass);""",
+        """ANALYZE documents;""",
+    )),
+)
+
+def get_schema_version(cur) -> int:
+    """Returns the latest applied migration version, or 0 if no migration has been applied yet."""
+    cur.execute("SELECT to_regclass('schema_migrations') IS NOT NULL;")
+    if not cur.fetchone()[0]:
+        return 0
+    cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations;")
+    return cur.fetchone()[0]
+
+@traced(kind="db")
+def migrate_database() -> list:
+    """
+    Brings the database schema up to date and returns the versions that were applied.
+
+    When the schema is current this is a single version check. Pending migrations are applied in
+    one transaction under an advisory lock, so concurrent processes don't apply them twice.
+    """
+    latest = MIGRATIONS[-1][0]
     with get_db_connection() as conn:
         with conn.cursor() as cur:
-            for command in commands:
-                cur.execute(command)
+            if get_schema_version(cur) >= latest:
+                return []
+
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext('knowledge_agent_schema_migrations'));")
+            cur.execute("""CREATE TABLE IF NOT EXISTS schema_migrations (version INTEGER PRIMARY KEY, description TEXT, applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP);""")
+            current = get_schema_version(cur)
+            applied = []
+            for version, description, statements in MIGRATIONS:
+                if version <= current:
+                    continue
+                for statement in statements:
+                    cur.execute(statement)
+                cur.execute("INSERT INTO schema_migrations (version, description) VALUES (%s, %s);", (version, description))
+                applied.append(version)
         conn.commit()
+    return applied
 
 # --- Document Handling Functions ---
+@traced(kind="db")
 def add_url_or_get_id(url: str) -> list:
     """Adds a URL to the documents table if it doesn't exist, or returns the existing id."""
     with get_db_connection() as conn:
@@ -48,19 +174,44 @@ def add_url_or_get_id(url: str) -> list:
                 conn.commit()
                 return new_id, "new"
 
-def update_document_content(url_id: int, raw_document: bytes, markdown_content: str):
-    """Updates the raw_document and markdown_content for a given url_id."""
+def content_hash(markdown_content: str) -> str:
+    """Hash of a document's markdown, as Postgres' md5() computes it, for detecting changed content."""
+    return hashlib.md5(markdown_content.encode("utf-8")).hexdigest()
+
+@traced(kind="db")
+def update_document_content(url_id: int, raw_document: bytes, markdown_content: str) -> bool:
+    """
+    Updates the raw_document and markdown_content for a given url_id and stamps the fetch.
+    Returns True if the markdown changed since the previous fetch.
+    """
     # Clean the markdown_content to remove any null characters
     cleaned_markdown_content = markdown_content.replace('\x00', '')
+    new_hash = content_hash(cleaned_markdown_content)
 
     with get_db_connection() as conn:
         with conn.cursor() as cur:
             cur.execute(
-                "UPDATE documents SET raw_document = %s, markdown_content = %s WHERE id = %s;",
-                (raw_document, cleaned_markdown_content, url_id)
+                """UPDATE documents d SET raw_document = %s, markdown_content = %s, content_hash = %s, fetched_at = NOW(), fetch_count = d.fetch_count + 1,
+                          change_count = d.change_count + CASE WHEN old.content_hash <> %s THEN 1 ELSE 0 END,
+                          changed_at = CASE WHEN old.content_hash <> %s THEN NOW() ELSE d.changed_at END
+                   FROM (SELECT id, content_hash FROM documents WHERE id = %s FOR UPDATE) old
+                   WHERE d.id = old.id
+                   RETURNING COALESCE(old.content_hash <> %s, FALSE);""",
+                (raw_document, cleaned_markdown_content, new_hash, new_hash, new_hash, url_id, new_hash)
             )
+            row = cur.fetchone()
             conn.commit()
+    return bool(row and row[0])
 
+@traced(kind="db")
+def mark_document_checked(url_id: int):
+    """Stamps a fetch attempt that left the stored content as it was (e.g. a failed refresh), so it is not retried at once."""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("UPDATE documents SET fetched_at = NOW() WHERE id = %s;", (url_id,))
+        conn.commit()
+
+@traced(kind="db")
 def get_document_object(url_id: int, type: str):
     """Gets the object for a given url_id in the documents table."""
     allowed_types = ["raw_document", "markdown_content", "summary"]
@@ -77,6 +228,7 @@ def get_document_object(url_id: int, type: str):
             else:
                 return None
 
+@traced(kind="db")
 def update_document_object(url_id: int, type: str, object: str | bytes):
     """Updates the object for a given url_id in the documents table."""
     allowed_types = ["raw_document", "markdown_content", "summary"]
@@ -85,10 +237,137 @@ def update_document_object(url_id: int, type: str, object: str | bytes):
 
     with get_db_connection() as conn:
         with conn.cursor() as cur:
-            query = f"UPDATE documents SET {type} = %s WHERE id = %s;"
+            # A summary is marked as made from the current content, so it can be found once the content changes
+            extra = ", summary_hash = content_hash" if type == "summary" else ""
+            query = f"UPDATE documents SET {type} = %s{extra} WHERE id = %s;"
             cur.execute(query, (object, url_id))
             conn.commit()
 
+@traced(kind="db")
+def get_refresh_candidates(limit: int, min_age_days: float) -> list:
+    """
+    Returns up to `limit` fetched documents last fetched at least `min_age_days` ago, in refresh order.
+
+    The priority score is the document's age since its last fetch, times its observed change rate
+    (changes per re-fetch, smoothed so a document never re-fetched counts as changing half the time),
+    times 1 + ln(1 + the number of times the curator approved its URL).
+    """
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """SELECT d.id, d.url, d.age_days, d.fetch_count, d.change_count, COALESCE(a.approvals, 0),
+                          d.age_days * (d.change_count + 1.0) / (d.fetch_count + 1.0) * (1 + ln(1 + COALESCE(a.approvals, 0))) AS score
+                   FROM (SELECT id, url, fetch_count, change_count, EXTRACT(EPOCH FROM NOW() - COALESCE(fetched_at, created_at)) / 86400 AS age_days
+                         FROM documents
+                         WHERE markdown_content IS NOT NULL AND markdown_content NOT LIKE '[MARKDOWN_GENERATION_FAILED%%') d
+                   LEFT JOIN (SELECT ranked->>'url' AS url, COUNT(*) AS approvals
+                              FROM search_rankings,
+                                   jsonb_array_elements(CASE WHEN jsonb_typeof(ranked_urls) = 'array' THEN ranked_urls ELSE '[]'::jsonb END) ranked
+                              WHERE ranked->>'status' = 'approved'
+                              GROUP BY 1) a ON a.url = d.url
+                   WHERE d.age_days >= %s
+                   ORDER BY score DESC, d.id
+                   LIMIT %s;""",
+                (min_age_days, limit)
+            )
+            names = ("url_id", "url", "age_days", "fetch_count", "change_count", "approvals", "score")
+            return [{**dict(zip(names, row)), "age_days": float(row[2]), "score": float(row[6])} for row in cur.fetchall()]
+
+@traced(kind="db")
+def get_stale_summary_ids(limit: int) -> list:
+    """Returns the url_ids of documents whose summary was made from content that has changed since, most recently changed first."""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """SELECT id FROM documents
+                   WHERE summary IS NOT NULL AND summary_hash IS DISTINCT FROM content_hash
+                         AND markdown_content IS NOT NULL AND markdown_content NOT LIKE '[MARKDOWN_GENERATION_FAILED%%'
+                   ORDER BY changed_at DESC NULLS LAST, id
+                   LIMIT %s;""",
+                (limit,)
+            )
+            return [row[0] for row in cur.fetchall()]
+
+@traced(kind="db")
+def get_document_signatures() -> list:
+    """Returns (url_id, signature) for every document with usable content; the signature changes when its content or summary does."""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """SELECT id, md5(COALESCE(content_hash, md5(markdown_content)) || COALESCE(md5(summary), ''))
+                   FROM documents
+                   WHERE markdown_content IS NOT NULL AND markdown_content NOT LIKE '[MARKDOWN_GENERATION_FAILED%%';"""
+            )
+            return cur.fetchall()
+
+@traced(kind="db")
+def get_coverage_texts(url_ids: list, max_chars: int) -> dict:
+    """Returns {url_id: text} with each document's summary followed by the first `max_chars` characters of its markdown."""
+    if not url_ids:
+        return {}
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT id, COALESCE(summary, '') || E'\n' || left(markdown_content, %s) FROM documents WHERE id = ANY(%s);",
+                (max_chars, list(url_ids))
+            )
+            return dict(cur.fetchall())
+
+@traced(kind="db")
+def get_document_summaries(url_ids: list) -> dict:
+    """Returns a mapping of url_id to summary for the given url_ids that have a summary."""
+    if not url_ids:
+        return {}
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id, summary FROM documents WHERE id = ANY(%s) AND summary IS NOT NULL;", (list(url_ids),))
+            return {row[0]: row[1] for row in cur.fetchall()}
+
+@traced(kind="db")
+def get_ingestion_status(url_ids: list) -> dict:
+    """Returns a mapping of url_id to ingestion status for the given url_ids."""
+    if not url_ids:
+        return {}
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id, ingestion_status FROM documents WHERE id = ANY(%s);", (list(url_ids),))
+            return {row[0]: row[1] for row in cur.fetchall()}
+
+@traced(kind="db")
+def set_ingestion_statuses(updates: list):
+    """Sets the ingestion status of several documents from (url_id, status) pairs, stamping ingested_at for ingested ones."""
+    allowed_statuses = ["not_ingested", "submitted", "ingested", "failed"]
+    updates = [(url_id, status) for url_id, status in updates if url_id is not None and status in allowed_statuses]
+    if not updates:
+        return
+
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.executemany(
+                "UPDATE documents SET ingestion_status = %s, ingested_at = CASE WHEN %s = 'ingested' THEN CURRENT_TIMESTAMP ELSE ingested_at END WHERE id = %s;",
+                [(status, status, url_id) for url_id, status in updates]
+            )
+        conn.commit()
+
+@traced(kind="db")
+def get_submitted_documents() -> list:
+    """Returns the url and url_id of the documents LightRAG accepted but has not been seen to index."""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT url, id FROM documents WHERE ingestion_status = 'submitted' ORDER BY id;")
+            return [{"url": row[0], "url_id": row[1]} for row in cur.fetchall()]
+
+@traced(kind="db")
+def get_documents_for_ingestion(urls: list) -> dict:
+    """Returns the url_id and markdown content of the given URLs, keyed by URL."""
+    if not urls:
+        return {}
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id, url, markdown_content FROM documents WHERE url = ANY(%s);", (list(urls),))
+            return {row[1]: {"url_id": row[0], "url": row[1], "markdown_content": row[2]} for row in cur.fetchall()}
+
+@traced(kind="db")
 def get_document(url_id: int) -> dict:
     """Retrieves a document from the documents table."""
     with get_db_connection() as conn:
@@ -105,6 +384,50 @@ def get_document(url_id: int) -> dict:
             else:
                 return None
 
+@traced(kind="db")
+def search_local_documents(query: str, k: int = 10, candidates: int = 200) -> list:
+    """
+    Full-text search of the stored documents that have content. Any query term may match; the best
+    `candidates` matches by ts_rank are scored by the share of the query's terms they contain and the
+    top `k` are returned as search results (title, url, snippet), with url_id, match and rank.
+    """
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            # The OR query joins the query's own lexemes, each quoted (backslashes and quotes escaped) and
+            # read with the 'simple' configuration, so they are neither stemmed nor split into phrases again
+            cur.execute(
+                """
+                WITH t AS (
+                    SELECT tsvector_to_array(to_tsvector('english', %(query)s)) AS terms
+                ), q AS (
+                    SELECT to_tsquery('simple', COALESCE((
+                               SELECT string_agg('''' || replace(replace(term, '\\', '\\\\'), '''', '''''') || '''', ' | ')
+                               FROM unnest(t.terms) AS term
+                           ), '')) AS query,
+                           t.terms
+                    FROM t
+                ), matches AS (
+                    SELECT d.id, d.url, d.search_vector, ts_rank(d.search_vector, q.query) AS rank
+                    FROM documents d, q
+                    WHERE d.search_vector @@ q.query AND d.markdown_content IS NOT NULL
+                    ORDER BY rank DESC
+                    LIMIT %(candidates)s
+                )
+                SELECT m.id, m.url, d.summary, left(d.markdown_content, 1000), m.rank,
+                       (length(m.search_vector) - length(ts_delete(m.search_vector, q.terms)))::float / GREATEST(cardinality(q.terms), 1) AS match
+                FROM matches m JOIN documents d ON d.id = m.id, q
+                ORDER BY match DESC, m.rank DESC
+                LIMIT %(k)s;
+                """,
+                {"query": query, "k": k, "candidates": candidates}
+            )
+            results = []
+            for url_id, url, summary, markdown_head, rank, match in cur.fetchall():
+                # The first heading or line of the markdown stands in for a title
+                title = next((line.lstrip("#").strip() for line in markdown_head.splitlines() if line.strip()), url)
+                results.append({"title": title[:200], "url": url, "snippet": (summary or markdown_head)[:300], "url_id": url_id, "match": round(match, 3), "rank": round(rank, 4)})
+            return results
+
 # --- Utility Functions ---
 
 def extract_and_clean_json(llm_output: str) -> dict:
@@ -132,18 +455,23 @@ def _save_report(table_name: str, report_data: dict):
             )
         conn.commit()
 
+@traced(kind="db")
 def save_analyst_report(report_data: dict):
     _save_report("analyst_reports", report_data)
 
+@traced(kind="db")
 def save_auditor_report(report_data: dict):
     _save_report("auditor_reports", report_data)
 
+@traced(kind="db")
 def save_fixer_report(report_data: dict):
     _save_report("fixer_reports", report_data)
 
+@traced(kind="db")
 def save_advisor_report(report_data: dict):
     _save_report("advisor_reports", report_data)
 
+@traced(kind="db")
 def initialize_researcher(timestamp: str) -> dict:
     """Initializes the researcher's report in the database."""
     analyst_report_str = load_latest_report('analyst')
@@ -169,6 +497,7 @@ def initialize_researcher(timestamp: str) -> dict:
         
     return {"researcher_report_id": report_id, "researcher_gaps_todo": gaps_to_do}
 
+@traced(kind="db")
 def update_researcher_report(report_id: str, gap_id: str, searches: list):
     """Updates a researcher report in the database with search results."""
     with get_db_connection() as conn:
@@ -202,6 +531,26 @@ def update_researcher_report(report_id: str, gap_id: str, searches: list):
             )
         conn.commit()
 
+@traced(kind="db")
+def update_researcher_coverage(report_id: str, coverage: dict):
+    """Stores each gap's coverage triage ({gap_id: coverage}) in a researcher report."""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT report FROM researcher_reports WHERE report_id = %s FOR UPDATE;", (report_id,))
+            result = cur.fetchone()
+            if not result:
+                raise ValueError(f"No researcher report found with id {report_id}")
+            report_data = result[0]
+            for gap in report_data.get("gaps", []):
+                if gap.get("gap_id") in coverage:
+                    gap["coverage"] = coverage[gap["gap_id"]]
+            cur.execute(
+                "UPDATE researcher_reports SET report = %s WHERE report_id = %s;",
+                (json.dumps(report_data), report_id)
+            )
+        conn.commit()
+
+@traced(kind="db")
 def initialize_curator(timestamp: str) -> dict:
     """Initializes the curator's report in the database."""
     researcher_report_str = load_latest_report('researcher')
@@ -209,11 +558,28 @@ def initialize_curator(timestamp: str) -> dict:
     
     report_id = f"cur_{timestamp.replace('-', '').replace(':', '').replace('T', '_').split('.')[0]}"
     
+    researcher_report_id = researcher_report.get("report_id")
+    ranked_searches = get_ranked_searches(researcher_report_id)
+
+    # Only queue the searches that no earlier curator run has ranked, but carry forward
+    # the URLs those runs approved so they can still be ingested
     searches_todo = []
+    previously_approved = []
     for gap in researcher_report.get("gaps", []):
+        gap_id = gap.get("gap_id", "unknown_gap")
         research_topic = gap.get("research_topic", {})
         for search in gap.get("searches", []):
+            if not isinstance(search, dict):
+                continue
+            search_key = (gap_id, search.get("search_id", "unknown_search"))
+            if search_key in ranked_searches:
+                url_ids = {r.get("url"): r.get("url_id") for r in search.get("results", []) if isinstance(r, dict)}
+                for ranked_url in ranked_searches[search_key]:
+                    if ranked_url.get("status") == "approved":
+                        previously_approved.append({"url": ranked_url.get("url"), "url_id": url_ids.get(ranked_url.get("url"))})
+                continue
             searches_todo.append({
+                "gap_id": gap_id,
                 "search": search,
                 "research_topic": research_topic
             })
@@ -233,8 +599,469 @@ def initialize_curator(timestamp: str) -> dict:
             )
         conn.commit()
         
-    return {"curator_report_id": report_id, "curator_searches_todo": searches_todo}
+    return {
+        "curator_report_id": report_id,
+        "researcher_report_id": researcher_report_id,
+        "curator_searches_todo": searches_todo,
+        "curator_searches_skipped": len(ranked_searches),
+        "curator_previously_approved": previously_approved
+    }
+
+@traced(kind="db")
+def get_ranked_searches(researcher_report_id: str) -> dict:
+    """Returns the ranked URLs of every already-ranked search in a researcher report, keyed by (gap_id, search_id)."""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT gap_id, search_id, ranked_urls FROM search_rankings WHERE researcher_report_id = %s;",
+                (researcher_report_id,)
+            )
+            return {(row[0], row[1]): row[2] or [] for row in cur.fetchall()}
+
+@traced(kind="db")
+def record_search_ranking(researcher_report_id: str, gap_id: str, search_id: str, curator_report_id: str, ranked_urls: list):
+    """Records the ranking of a search so later curator runs can skip it."""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """INSERT INTO search_rankings (researcher_report_id, gap_id, search_id, curator_report_id, ranked_urls)
+                   VALUES (%s, %s, %s, %s, %s)
+                   ON CONFLICT (researcher_report_id, gap_id, search_id)
+                   DO UPDATE SET curator_report_id = EXCLUDED.curator_report_id, ranked_urls = EXCLUDED.ranked_urls;""",
+                (researcher_report_id, gap_id, search_id, curator_report_id, json.dumps(ranked_urls))
+            )
+        conn.commit()
+
+@traced(kind="db")
+def record_run_usage(run_id: str, rows: list, prompt_cost_per_1k: float = 0.0, completion_cost_per_1k: float = 0.0):
+    """Adds LLM usage totals (dicts with node, agent, gap_id, search_id, url_id and token counts) to a run's usage rows."""
+    values = [
+        (
+            run_id, row.get("node") or "", row.get("agent") or "", str(row.get("gap_id") or ""), str(row.get("search_id") or ""), row.get("url_id"),
+            row["calls"], row["prompt_tokens"], row["completion_tokens"], row["llm_seconds"],
+            (row["prompt_tokens"] * prompt_cost_per_1k + row["completion_tokens"] * completion_cost_per_1k) / 1000,
+        )
+        for row in rows
+    ]
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.executemany(
+                """INSERT INTO run_usage (run_id, node, agent, gap_id, search_id, url_id, calls, prompt_tokens, completion_tokens, llm_seconds, estimated_cost)
+                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                   ON CONFLICT (run_id, node, agent, gap_id, search_id, (COALESCE(url_id, 0)))
+                   DO UPDATE SET calls = run_usage.calls + EXCLUDED.calls,
+                                 prompt_tokens = run_usage.prompt_tokens + EXCLUDED.prompt_tokens,
+                                 completion_tokens = run_usage.completion_tokens + EXCLUDED.completion_tokens,
+                                 llm_seconds = run_usage.llm_seconds + EXCLUDED.llm_seconds,
+                                 estimated_cost = run_usage.estimated_cost + EXCLUDED.estimated_cost,
+                                 updated_at = CURRENT_TIMESTAMP;""",
+                values
+            )
+        conn.commit()
+
+@traced(kind="db")
+def get_run_usage(run_id: str, group_by: list) -> list:
+    """Returns a run's LLM usage totals grouped by the given run_usage columns, largest token users first."""
+    allowed = ("node", "agent", "gap_id", "search_id", "url_id")
+    columns = [column for column in group_by if column in allowed]
+    select_columns = "".join(f"{column}, " for column in columns)
+    group_clause = f"GROUP BY {', '.join(columns)}" if columns else ""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                f"""SELECT {select_columns}SUM(calls), SUM(prompt_tokens), SUM(completion_tokens), SUM(prompt_tokens + completion_tokens), SUM(llm_seconds), SUM(estimated_cost)
+                    FROM run_usage WHERE run_id = %s {group_clause}
+                    ORDER BY {len(columns) + 4} DESC;""",
+                (run_id,)
+            )
+            names = columns + ["calls", "prompt_tokens", "completion_tokens", "total_tokens", "llm_seconds", "estimated_cost"]
+            return [
+                {**dict(zip(names, row)), "estimated_cost": float(row[-1] or 0), "llm_seconds": float(row[-2] or 0)}
+                for row in cur.fetchall()
+                if row[len(columns)] is not None
+            ]
+
+@traced(kind="db")
+def record_fetch_telemetry(row: dict):
+    """Records one fetch attempt (host, status, content type, bytes, extractor, phase durations, error class)."""
+    columns = ("run_id", "url_id", "url", "host", "status_code", "content_type", "bytes", "wasted_bytes", "extractor", "browser_fallback",
+               "output_chars", "head_ms", "download_ms", "extract_ms", "browser_ms", "total_ms", "error_class")
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                f"INSERT INTO fetch_telemetry ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))});",
+                tuple(row.get(column) for column in columns)
+            )
+        conn.commit()
+
+@traced(kind="db")
+def get_fetch_stats_by_host(days: float, host: str = None) -> list:
+    """
+    Returns fetch statistics per host over the last `days` days: attempts, failures, latency percentiles,
+    Playwright fallbacks and bytes downloaded for nothing. Hosts with the most time spent come first.
+    """
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """SELECT host,
+                          COUNT(*),
+                          COUNT(*) FILTER (WHERE error_class IS NOT NULL),
+                          COUNT(*) FILTER (WHERE browser_fallback),
+                          percentile_cont(0.5) WITHIN GROUP (ORDER BY total_ms),
+                          percentile_cont(0.95) WITHIN GROUP (ORDER BY total_ms),
+                          percentile_cont(0.95) WITHIN GROUP (ORDER BY download_ms),
+                          SUM(total_ms),
+                          SUM(bytes),
+                          SUM(wasted_bytes),
+                          mode() WITHIN GROUP (ORDER BY error_class)
+                   FROM fetch_telemetry
+                   WHERE created_at >= NOW() - make_interval(secs => %s) AND (%s::text IS NULL OR host = %s)
+                   GROUP BY host
+                   ORDER BY SUM(total_ms) DESC;""",
+                (days * 86400, host, host)
+            )
+            names = ("host", "attempts", "failures", "browser_fallbacks", "p50_ms", "p95_ms", "p95_download_ms", "total_ms", "bytes", "wasted_bytes", "top_error")
+            return [dict(zip(names, row)) for row in cur.fetchall()]
+
+@traced(kind="db")
+def get_fetch_errors(days: float, host: str = None) -> list:
+    """Returns (host, error_class, count) for failed fetches over the last `days` days, most frequent first."""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """SELECT host, error_class, COUNT(*) FROM fetch_telemetry
+                   WHERE error_class IS NOT NULL AND created_at >= NOW() - make_interval(secs => %s) AND (%s::text IS NULL OR host = %s)
+                   GROUP BY host, error_class ORDER BY 3 DESC;""",
+                (days * 86400, host, host)
+            )
+            return cur.fetchall()
+
+# --- Job Queue ---
+# Job statuses: 'queued' (waiting, or waiting for a retry after available_at), 'running' (leased to a
+# worker until leased_until), 'done', and 'dead' (out of attempts; kept for inspection and --retry-dead)
+JOB_COLUMNS = ("id", "kind", "payload", "run_id", "status", "attempts", "max_attempts", "worker", "result", "last_error")
+
+@traced(kind="db")
+def enqueue_jobs(kind: str, payloads: list, run_id: str = None, max_attempts: int = 3) -> list:
+    """Adds one job of the given kind per payload and returns their IDs."""
+    if not payloads:
+        return []
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            ids = []
+            for payload in payloads:
+                cur.execute(
+                    "INSERT INTO jobs (kind, payload, run_id, max_attempts) VALUES (%s, %s, %s, %s) RETURNING id;",
+                    (kind, json.dumps(payload), run_id, max_attempts)
+                )
+                ids.append(cur.fetchone()[0])
+        conn.commit()
+    return ids
+
+@traced(kind="db")
+def claim_job(worker: str, kinds: list, lease_seconds: float) -> dict | None:
+    """
+    Leases the oldest available job of the given kinds to `worker`, or returns None if there is none.
+
+    Queued jobs whose retry time has come and running jobs whose lease expired (their worker died)
+    are available. Rows locked by other claimers are skipped, so any number of workers can claim
+    concurrently without handing out the same job twice. Expired jobs that were on their last
+    attempt are dead-lettered instead.
+    """
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """UPDATE jobs SET status = 'dead', leased_until = NULL, updated_at = NOW(),
+                          last_error = COALESCE(last_error || E'\n', '') || 'Lease of worker ' || COALESCE(worker, '?') || ' expired on the last attempt'
+                   WHERE id IN (SELECT id FROM jobs WHERE status = 'running' AND leased_until < NOW() AND attempts >= max_attempts
+                                FOR UPDATE SKIP LOCKED);"""
+            )
+            cur.execute(
+                f"""UPDATE jobs SET status = 'running', attempts = attempts + 1, worker = %s,
+                           leased_until = NOW() + make_interval(secs => %s), updated_at = NOW()
+                    WHERE id = (SELECT id FROM jobs
+                                WHERE kind = ANY(%s) AND ((status = 'queued' AND available_at <= NOW()) OR (status = 'running' AND leased_until < NOW()))
+                                ORDER BY available_at, id
+                                FOR UPDATE SKIP LOCKED LIMIT 1)
+                    RETURNING {', '.join(JOB_COLUMNS)};""",
+                (worker, lease_seconds, list(kinds))
+            )
+            row = cur.fetchone()
+        conn.commit()
+    return dict(zip(JOB_COLUMNS, row)) if row else None
+
+@traced(kind="db")
+def extend_job_lease(job_id: int, worker: str, lease_seconds: float) -> bool:
+    """Extends a running job's lease. Returns False if the worker no longer holds it."""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """UPDATE jobs SET leased_until = NOW() + make_interval(secs => %s), updated_at = NOW()
+                   WHERE id = %s AND worker = %s AND status = 'running';""",
+                (lease_seconds, job_id, worker)
+            )
+            extended = cur.rowcount == 1
+        conn.commit()
+    return extended
+
+@traced(kind="db")
+def complete_job(job_id: int, worker: str, result: dict = None) -> bool:
+    """Marks a job done with its result. Returns False if the worker no longer holds it."""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """UPDATE jobs SET status = 'done', result = %s, leased_until = NULL, updated_at = NOW()
+                   WHERE id = %s AND worker = %s AND status = 'running';""",
+                (json.dumps(result), job_id, worker)
+            )
+            completed = cur.rowcount == 1
+        conn.commit()
+    return completed
+
+@traced(kind="db")
+def fail_job(job_id: int, worker: str, error: str, retry_delay: float) -> str | None:
+    """
+    Records a failed attempt: the job is queued again after `retry_delay` seconds, or dead-lettered
+    if it has no attempts left. Returns the new status, or None if the worker no longer holds it.
+    """
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """UPDATE jobs SET status = CASE WHEN attempts >= max_attempts THEN 'dead' ELSE 'queued' END,
+                          available_at = NOW() + make_interval(secs => %s), leased_until = NULL, last_error = %s, updated_at = NOW()
+                   WHERE id = %s AND worker = %s AND status = 'running'
+                   RETURNING status;""",
+                (retry_delay, error, job_id, worker)
+            )
+            row = cur.fetchone()
+        conn.commit()
+    return row[0] if row else None
+
+@traced(kind="db")
+def get_job_statuses(job_ids: list) -> dict:
+    """Returns {job_id: status} for the given jobs."""
+    if not job_ids:
+        return {}
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id, status FROM jobs WHERE id = ANY(%s);", (list(job_ids),))
+            return dict(cur.fetchall())
+
+@traced(kind="db")
+def record_worker_heartbeat(worker: str, kinds: list):
+    """Records that `worker` is alive and runs jobs of the given kinds."""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """INSERT INTO job_workers (worker, kinds) VALUES (%s, %s)
+                   ON CONFLICT (worker) DO UPDATE SET kinds = EXCLUDED.kinds, heartbeat_at = NOW();""",
+                (worker, json.dumps(list(kinds)))
+            )
+        conn.commit()
+
+@traced(kind="db")
+def remove_worker(worker: str):
+    """Removes a stopped worker from the live workers."""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM job_workers WHERE worker = %s;", (worker,))
+        conn.commit()
+
+@traced(kind="db")
+def count_live_workers(kind: str, max_age_seconds: float) -> int:
+    """Returns the number of workers running jobs of `kind` whose last heartbeat is at most `max_age_seconds` old."""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT COUNT(*) FROM job_workers WHERE kinds ? %s AND heartbeat_at > NOW() - make_interval(secs => %s);",
+                (kind, max_age_seconds)
+            )
+            return cur.fetchone()[0]
+
+@traced(kind="db")
+def get_job_queue_stats() -> list:
+    """Returns (kind, status, count, oldest created_at) for every kind and status in the queue."""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT kind, status, COUNT(*), MIN(created_at) FROM jobs GROUP BY kind, status ORDER BY kind, status;")
+            return cur.fetchall()
+
+@traced(kind="db")
+def get_dead_jobs(limit: int = 20) -> list:
+    """Returns the most recently dead-lettered jobs."""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE status = 'dead' ORDER BY updated_at DESC LIMIT %s;", (limit,))
+            return [dict(zip(JOB_COLUMNS, row)) for row in cur.fetchall()]
+
+@traced(kind="db")
+def retry_dead_jobs(kind: str = None) -> int:
+    """Queues dead-lettered jobs (of one kind, if given) again with a fresh set of attempts. Returns how many."""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """UPDATE jobs SET status = 'queued', attempts = 0, available_at = NOW(), updated_at = NOW()
+                   WHERE status = 'dead' AND (%s::text IS NULL OR kind = %s);""",
+                (kind, kind)
+            )
+            count = cur.rowcount
+        conn.commit()
+    return count
+
+# --- Knowledge Graph Snapshot ---
+# A local copy of the LightRAG graph: entities with their properties, relations stored once per
+# unordered pair (source < target), and a single graph_snapshot row with the watermark (start time)
+# of the last refresh. Entities are re-fetched when new, dirty (changed by the fixer) or old.
+
+def _relation_key(source: str, target: str) -> tuple:
+    return (source, target) if source <= target else (target, source)
+
+@traced(kind="db")
+def get_graph_snapshot_state() -> dict:
+    """Returns the watermark, labels hash and size of the snapshot, the number of dirty entities and the time of the latest ingestion."""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """SELECT s.watermark, s.labels_hash, s.entity_count, s.relation_count,
+                          (SELECT COUNT(*) FROM graph_entities WHERE dirty),
+                          (SELECT MAX(ingested_at) FROM documents)
+                   FROM (SELECT 1) one LEFT JOIN graph_snapshot s ON s.id = 1;"""
+            )
+            row = cur.fetchone()
+    names = ("watermark", "labels_hash", "entity_count", "relation_count", "dirty", "last_ingestion")
+    return dict(zip(names, row))
+
+@traced(kind="db")
+def set_graph_snapshot_state(watermark, labels_hash: str):
+    """Records a finished refresh, counting the entities and relations now in the snapshot."""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """INSERT INTO graph_snapshot (id, watermark, labels_hash, entity_count, relation_count)
+                   VALUES (1, %s, %s, (SELECT COUNT(*) FROM graph_entities), (SELECT COUNT(*) FROM graph_relations))
+                   ON CONFLICT (id) DO UPDATE SET watermark = EXCLUDED.watermark, labels_hash = EXCLUDED.labels_hash,
+                       entity_count = EXCLUDED.entity_count, relation_count = EXCLUDED.relation_count;""",
+                (watermark, labels_hash)
+            )
+        conn.commit()
+
+@traced(kind="db")
+def get_snapshot_labels() -> list:
+    """Returns the names of all entities in the snapshot."""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT name FROM graph_entities ORDER BY name;")
+            return [row[0] for row in cur.fetchall()]
+
+@traced(kind="db")
+def get_snapshot_entities_to_revalidate(limit: int, fetched_before) -> list:
+    """Returns up to `limit` entities to re-fetch: dirty ones first, then those last fetched before `fetched_before`, oldest first."""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """SELECT name FROM graph_entities
+                   WHERE dirty OR fetched_at < %s
+                   ORDER BY dirty DESC, fetched_at, name
+                   LIMIT %s;""",
+                (fetched_before, limit)
+            )
+            return [row[0] for row in cur.fetchall()]
+
+@traced(kind="db")
+def store_snapshot_subgraph(nodes: list, edges: list, complete: list, truncated: list = ()):
+    """
+    Stores a subgraph read from LightRAG. Entities in `complete` were fetched with all their
+    relations: they are marked fresh and their stored relations are replaced by the ones in `edges`.
+    Entities in `truncated` were fetched with only some of their relations: they are marked fresh too,
+    so they are not re-fetched on every refresh, but their relations in `edges` are only added.
+    Other nodes only get their properties updated, and other edges are added; a node new to the
+    snapshot is stored as never fetched, so the next refresh fetches its own relations.
+    """
+    complete = list(complete)
+    fetched = complete + list(truncated)
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            if complete:
+                cur.execute("DELETE FROM graph_relations WHERE source = ANY(%s) OR target = ANY(%s);", (complete, complete))
+            for node in nodes:
+                cur.execute(
+                    """INSERT INTO graph_entities (name, properties, fetched_at) VALUES (%s, %s, '-infinity')
+                       ON CONFLICT (name) DO UPDATE SET properties = EXCLUDED.properties;""",
+                    (node["id"], json.dumps(node.get("properties") or {}))
+                )
+            if fetched:
+                cur.execute("UPDATE graph_entities SET fetched_at = NOW(), dirty = FALSE WHERE name = ANY(%s);", (fetched,))
+            for edge in edges:
+                cur.execute(
+                    """INSERT INTO graph_relations (source, target, properties) VALUES (%s, %s, %s)
+                       ON CONFLICT (source, target) DO UPDATE SET properties = EXCLUDED.properties, fetched_at = NOW();""",
+                    (*_relation_key(edge["source"], edge["target"]), json.dumps(edge.get("properties") or {}))
+                )
+        conn.commit()
+
+@traced(kind="db")
+def delete_snapshot_entities(names: list):
+    """Removes entities that are no longer in the graph, and their relations, from the snapshot."""
+    if not names:
+        return
+    names = list(names)
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM graph_relations WHERE source = ANY(%s) OR target = ANY(%s);", (names, names))
+            cur.execute("DELETE FROM graph_entities WHERE name = ANY(%s);", (names,))
+        conn.commit()
+
+@traced(kind="db")
+def mark_snapshot_entities_dirty(names: list):
+    """Marks entities changed outside a refresh (e.g. by the fixer) to be re-fetched on the next refresh."""
+    if not names:
+        return
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("UPDATE graph_entities SET dirty = TRUE WHERE name = ANY(%s);", (list(names),))
+        conn.commit()
+
+@traced(kind="db")
+def get_snapshot_entities(names: list) -> dict:
+    """Returns {name: properties} for the given entities that are in the snapshot."""
+    if not names:
+        return {}
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT name, properties FROM graph_entities WHERE name = ANY(%s);", (list(names),))
+            return dict(cur.fetchall())
+
+@traced(kind="db")
+def get_snapshot_relations(names: list) -> list:
+    """Returns the relations of the given entities as dicts with source, target and properties."""
+    if not names:
+        return []
+    names = list(names)
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT source, target, properties FROM graph_relations WHERE source = ANY(%s) OR target = ANY(%s) ORDER BY source, target;",
+                (names, names)
+            )
+            return [{"source": source, "target": target, "properties": properties} for source, target, properties in cur.fetchall()]
+
+@traced(kind="db")
+def get_snapshot_top_entities(limit: int) -> list:
+    """Returns the names of the `limit` entities with the most relations."""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """SELECT e.name FROM graph_entities e
+                   LEFT JOIN (SELECT name, COUNT(*) AS degree
+                              FROM (SELECT source AS name FROM graph_relations UNION ALL SELECT target FROM graph_relations) ends
+                              GROUP BY name) d ON d.name = e.name
+                   ORDER BY COALESCE(d.degree, 0) DESC, e.name
+                   LIMIT %s;""",
+                (limit,)
+            )
+            return [row[0] for row in cur.fetchall()]
 
+@traced(kind="db")
 def update_curator_report(report_id: str, job: str, results: list):
     """Appends results to a job list in a curator report."""
     with get_db_connection() as conn:
@@ -261,12 +1088,16 @@ def update_curator_report(report_id: str, job: str, results: list):
             )
         conn.commit()
 
+@traced(kind="db")
 def load_latest_report(report_type: str) -> str:
-    """Loads the most recent report from the database."""
+    """Loads the most recent report of the given type ('analyst', 'researcher', 'curator', 'auditor', 'fixer' or 'advisor') from the database."""
     table_map = {
         "analyst": "analyst_reports",
         "researcher": "researcher_reports",
-        "curator": "curator_reports"
+        "curator": "curator_reports",
+        "auditor": "auditor_reports",
+        "fixer": "fixer_reports",
+        "advisor": "advisor_reports"
     }
     table_name = table_map.get(report_type)
     if not table_name:
@@ -0,0 +1,61 @@
+# fetch_telemetry.py
+import argparse
+
+
+def _format_bytes(count) -> str:
+    from utils import format_bytes
+    return format_bytes(int(count or 0))
+
+
+def print_report(days: float, host: str = None, top: int = 25, sort: str = "time"):
+    from db_utils import get_fetch_stats_by_host, get_fetch_errors
+
+    rows = get_fetch_stats_by_host(days, host)
+    if not rows:
+        print(f"No fetches recorded in the last {days:g} days")
+        return
+
+    sort_keys = {
+        "time": lambda r: r["total_ms"] or 0,
+        "p95": lambda r: r["p95_ms"] or 0,
+        "failures": lambda r: r["failures"] / r["attempts"],
+        "wasted": lambda r: r["wasted_bytes"] or 0,
+    }
+    rows.sort(key=sort_keys[sort], reverse=True)
+
+    attempts = sum(r["attempts"] for r in rows)
+    failures = sum(r["failures"] for r in rows)
+    fallbacks = sum(r["browser_fallbacks"] for r in rows)
+    print(f"Fetches in the last {days:g} days: {attempts} attempts, {failures} failed ({100 * failures / attempts:.1f}%), "
+          f"{fallbacks} Playwright fallbacks ({100 * fallbacks / attempts:.1f}%), "
+          f"{_format_bytes(sum(r['bytes'] or 0 for r in rows))} kept, {_format_bytes(sum(r['wasted_bytes'] or 0 for r in rows))} wasted\n")
+
+    print(f"{'host':<36} {'fetches':>7} {'failed':>7} {'fallback':>8} {'p50':>8} {'p95':>8} {'p95 dl':>8} {'total':>8} {'wasted':>10}  top error")
+    for r in rows[:top]:
+        print(f"{r['host'][:36]:<36} {r['attempts']:>7} {100 * r['failures'] / r['attempts']:6.1f}% {100 * r['browser_fallbacks'] / r['attempts']:7.1f}% "
+              f"{(r['p50_ms'] or 0) / 1000:7.2f}s {(r['p95_ms'] or 0) / 1000:7.2f}s {(r['p95_download_ms'] or 0) / 1000:7.2f}s "
+              f"{(r['total_ms'] or 0) / 1000:7.1f}s {_format_bytes(r['wasted_bytes']):>10}  {r['top_error'] or '-'}")
+
+    errors = get_fetch_errors(days, host)
+    if errors:
+        print("\nFailures by host and error class:")
+        for error_host, error_class, count in errors[:top]:
+            print(f"{error_host[:36]:<36} {error_class:<32} {count:>6}")
+
+
+def main():
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description="Print per-domain fetch latency, failure, fallback and wasted-bytes statistics.")
+    parser.add_argument("--days", type=float, default=30, help="Only include fetches from the last N days.")
+    parser.add_argument("--host", help="Only report on this host.")
+    parser.add_argument("--top", type=int, default=25, help="Number of hosts to list.")
+    parser.add_argument("--sort", choices=["time", "p95", "failures", "wasted"], default="time", help="Order hosts by total fetch time, p95 latency, failure rate or wasted bytes.")
+    args = parser.parse_args()
+
+    load_dotenv()
+    print_report(args.days, args.host.lower() if args.host else None, args.top, args.sort)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+# fix_plan.py
+"""
+Executes the Fixer's plan of knowledge graph changes without an LLM round trip per change.
+
+A plan is a list of operations, each a dict with an `action` and its arguments:
+
+    {"op_id": "F1", "issue_id": "A1", "action": "merge", "source_entities": ["WTO"], "target_entity": "World Trade Organization"}
+    {"op_id": "F2", "action": "update_entity", "entity_name": "Tariff", "updated_data": {"description": "..."}}
+    {"op_id": "F3", "action": "update_relation", "source_entity": "A", "target_entity": "B", "updated_data": {"keywords": "..."}}
+    {"op_id": "F4", "action": "delete_entity", "entity_name": "Entity 7"}
+    {"op_id": "F5", "action": "delete_relation", "source_entity": "A", "target_entity": "B"}
+
+Every operation is validated first: its fields must be present and every entity it references must
+exist according to `graph_entity_exists` and must not be deleted or merged away by an earlier
+operation. Valid operations are applied in batches of up to FIX_BATCH_SIZE operations that touch no
+common entity, concurrently within a batch and in plan order across batches, and each gets its own
+result. In a dry run nothing is changed; each valid operation gets the diff it would make instead.
+"""
+import asyncio
+import os
+from audit_engine import describe_entity
+from mcp_utils import build_tool_args, parse_json_response
+
+DEFAULT_BATCH_SIZE = 10
+
+# Tool each action calls, and the argument names it may declare for each value, in order of preference
+ACTION_TOOLS = {
+    "update_entity": "graph_update_entity",
+    "merge": "graph_update_entity",
+    "update_relation": "graph_update_relation",
+    "delete_entity": "documents_delete_entity",
+    "delete_relation": "documents_delete_relation",
+}
+ENTITY_ARGUMENTS = {"entity": ("entity_name", "name", "entity"), "data": ("updated_data", "data")}
+MERGE_ARGUMENTS = {"entity": ("entity_name", "name", "entity"), "data": ("updated_data", "data"), "allow_merge": ("allow_merge",)}
+RELATION_ARGUMENTS = {"source": ("source_id", "source_entity", "source"), "target": ("target_id", "target_entity", "target"), "data": ("updated_data", "data")}
+EXISTS_ARGUMENTS = {"entity": ("name", "entity_name", "entity")}
+
+# Nodes requested with an entity's one-hop subgraph when looking up one of its relations
+RELATION_MAX_NODES = 1000
+
+REQUIRED_FIELDS = {
+    "update_entity": ("entity_name", "updated_data"),
+    "merge": ("source_entities", "target_entity"),
+    "update_relation": ("source_entity", "target_entity", "updated_data"),
+    "delete_entity": ("entity_name",),
+    "delete_relation": ("source_entity", "target_entity"),
+}
+DESTRUCTIVE_ACTIONS = {"merge", "delete_entity", "delete_relation"}
+
+
+def operation_entities(operation: dict) -> list:
+    """Returns the names of the entities an operation reads or changes."""
+    action = operation.get("action")
+    if action == "merge":
+        return list(operation.get("source_entities") or []) + [operation.get("target_entity")]
+    if action in ("update_relation", "delete_relation"):
+        return [operation.get("source_entity"), operation.get("target_entity")]
+    return [operation.get("entity_name")]
+
+
+def _removed_entities(operation: dict) -> list:
+    """Returns the entities an operation removes from the graph."""
+    if operation["action"] == "delete_entity":
+        return [operation["entity_name"]]
+    if operation["action"] == "merge":
+        return list(operation["source_entities"])
+    return []
+
+
+def _check_fields(operation: dict) -> str:
+    """Returns why an operation is malformed, or None."""
+    action = operation.get("action")
+    if action not in REQUIRED_FIELDS:
+        return f"Unknown action '{action}'; expected one of {sorted(REQUIRED_FIELDS)}"
+    missing = [field for field in REQUIRED_FIELDS[action] if not operation.get(field)]
+    if missing:
+        return f"Missing {', '.join(missing)}"
+    if action == "merge":
+        if not isinstance(operation["source_entities"], list):
+            return "source_entities must be a list"
+        if operation["target_entity"] in operation["source_entities"]:
+            return "An entity cannot be merged into itself"
+    if "updated_data" in REQUIRED_FIELDS[action] and not isinstance(operation["updated_data"], dict):
+        return "updated_data must be an object"
+    if not all(isinstance(name, str) for name in operation_entities(operation)):
+        return "Entity names must be strings"
+    return None
+
+
+async def _entity_exists(tool, name: str, semaphore: asyncio.Semaphore) -> bool:
+    async with semaphore:
+        raw_response = await tool.ainvoke(build_tool_args(tool, EXISTS_ARGUMENTS, {"entity": name}))
+    response = parse_json_response(raw_response)
+    if isinstance(response, dict):
+        return bool(response.get("exists"))
+    return str(raw_response).strip().lower() in ("true", "yes", "1")
+
+
+async def validate_plan(operations: list, tools: dict, logger, batch_size: int = DEFAULT_BATCH_SIZE) -> list:
+    """
+    Returns one result per operation: {'op_id', 'action', 'status', 'detail'} with status 'valid' or 'invalid'.
+    Operation IDs are assigned (F1, F2, ...) where the plan has none or repeats one.
+    """
+    results = []
+    seen_ids = set()
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            operations[index] = operation = {"action": None, "value": operation}
+        if not operation.get("op_id") or operation["op_id"] in seen_ids:
+            operation["op_id"] = f"F{index + 1}"
+        seen_ids.add(operation["op_id"])
+        problem = _check_fields(operation)
+        if problem is None and ACTION_TOOLS[operation["action"]] not in tools:
+            problem = f"Tool {ACTION_TOOLS[operation['action']]} is not available"
+        results.append({"op_id": operation["op_id"], "action": operation.get("action"), "status": "invalid" if problem else "valid", "detail": problem})
+
+    names = list(dict.fromkeys(name for operation, result in zip(operations, results) if result["status"] == "valid" for name in operation_entities(operation)))
+    exists = {}
+    if names and "graph_entity_exists" in tools:
+        semaphore = asyncio.Semaphore(max(1, batch_size))
+        checks = await asyncio.gather(*(_entity_exists(tools["graph_entity_exists"], name, semaphore) for name in names), return_exceptions=True)
+        for name, check in zip(names, checks):
+            if isinstance(check, Exception):
+                logger.warning(f"Could not check whether entity '{name}' exists: {check}")
+                check = False
+            exists[name] = check
+    elif names:
+        logger.warning("graph_entity_exists tool not found; entities are not checked before the plan is applied.")
+        exists = {name: True for name in names}
+
+    removed = {}
+    for operation, result in zip(operations, results):
+        if result["status"] != "valid":
+            continue
+        entities = operation_entities(operation)
+        missing = [name for name in entities if not exists.get(name)]
+        gone = [name for name in entities if name in removed]
+        if missing:
+            result.update({"status": "invalid", "detail": f"Entities not in the graph: {missing}"})
+        elif gone:
+            result.update({"status": "invalid", "detail": f"Entities removed by an earlier operation: {', '.join(f'{name} ({removed[name]})' for name in gone)}"})
+        else:
+            removed.update({name: operation["op_id"] for name in _removed_entities(operation)})
+    return results
+
+
+def schedule_batches(operations: list, batch_size: int = DEFAULT_BATCH_SIZE) -> list:
+    """
+    Groups operations into batches of at most `batch_size` that share no entity, so a batch can run
+    concurrently, while operations on the same entity keep their plan order.
+    """
+    batches = []
+    last_batch = {}
+    for operation in operations:
+        entities = operation_entities(operation)
+        index = max((last_batch[name] + 1 for name in entities if name in last_batch), default=0)
+        while index < len(batches) and len(batches[index]) >= batch_size:
+            index += 1
+        if index == len(batches):
+            batches.append([])
+        batches[index].append(operation)
+        for name in entities:
+            last_batch[name] = index
+    return batches
+
+
+async def _apply(operation: dict, tools: dict) -> tuple:
+    """Applies one operation and returns (status, detail)."""
+    action = operation["action"]
+    tool = tools[ACTION_TOOLS[action]]
+    if action == "merge":
+        # Renaming an entity to an existing name merges it into that entity, relations included
+        for source in operation["source_entities"]:
+            values = {"entity": source, "data": {"entity_name": operation["target_entity"]}, "allow_merge": True}
+            status, detail = _tool_status(await tool.ainvoke(build_tool_args(tool, MERGE_ARGUMENTS, values)))
+            if status != "applied":
+                return status, f"Merging {source}: {detail}"
+        return "applied", f"Merged {len(operation['source_entities'])} entities into {operation['target_entity']}"
+    if action == "update_entity":
+        tool_args = build_tool_args(tool, ENTITY_ARGUMENTS, {"entity": operation["entity_name"], "data": operation["updated_data"]})
+    elif action == "delete_entity":
+        tool_args = build_tool_args(tool, ENTITY_ARGUMENTS, {"entity": operation["entity_name"]})
+    elif action == "update_relation":
+        tool_args = build_tool_args(tool, RELATION_ARGUMENTS, {"source": operation["source_entity"], "target": operation["target_entity"], "data": operation["updated_data"]})
+    else:
+        tool_args = build_tool_args(tool, RELATION_ARGUMENTS, {"source": operation["source_entity"], "target": operation["target_entity"]})
+    return _tool_status(await tool.ainvoke(tool_args))
+
+
+def _tool_status(raw_response) -> tuple:
+    """
+    Returns ('applied' or 'failed', detail) for a LightRAG graph tool response. Only a JSON object
+    counts as an answer; anything else (e.g. a plain-text error) is taken as a failure.
+    """
+    response = parse_json_response(raw_response)
+    if not isinstance(response, dict):
+        return "failed", f"Unexpected response: {str(raw_response)[:200]}"
+    response_status = str(response.get("status", "success")).lower()
+    detail = response.get("message") or response_status
+    return ("applied" if response_status == "success" else "failed"), detail
+
+
+async def _relation_properties(graphs_get_tool, source: str, target: str) -> dict:
+    """Returns the properties of the relation between two entities, in either direction; empty if there is none."""
+    raw_response = await graphs_get_tool.ainvoke({"label": source, "max_depth": 1, "max_nodes": RELATION_MAX_NODES})
+    graph = parse_json_response(raw_response)
+    if not isinstance(graph, dict):
+        return {}
+    for edge in graph.get("edges") or []:
+        if isinstance(edge, dict) and {edge.get("source"), edge.get("target")} == {source, target}:
+            return edge.get("properties") or {}
+    return {}
+
+
+async def _diff(operation: dict, tools: dict) -> dict:
+    """Returns the change an operation would make, from the current state of the entities it touches."""
+    action = operation["action"]
+    graphs_get = tools.get("graphs_get")
+
+    async def describe(name: str) -> dict:
+        return await describe_entity(graphs_get, name) if graphs_get else {}
+
+    if action == "update_entity":
+        properties = (await describe(operation["entity_name"])).get("properties", {})
+        return {field: {"before": properties.get(field), "after": value} for field, value in operation["updated_data"].items() if properties.get(field) != value}
+    if action == "delete_entity":
+        return {"deleted_entity": operation["entity_name"], "relations_removed": len((await describe(operation["entity_name"])).get("neighbors", ()))}
+    if action == "merge":
+        sources = await asyncio.gather(*(describe(name) for name in operation["source_entities"]))
+        return {
+            "merged_into": operation["target_entity"],
+            "entities_removed": operation["source_entities"],
+            "relations_moved": sum(len(source.get("neighbors", ())) for source in sources),
+        }
+    if action == "update_relation":
+        properties = await _relation_properties(graphs_get, operation["source_entity"], operation["target_entity"]) if graphs_get else {}
+        return {
+            "relation": [operation["source_entity"], operation["target_entity"]],
+            **{field: {"before": properties.get(field), "after": value} for field, value in operation["updated_data"].items() if properties.get(field) != value},
+        }
+    return {"deleted_relation": [operation["source_entity"], operation["target_entity"]]}
+
+
+async def _run_operation(operation: dict, result: dict, tools: dict, dry_run: bool, logger):
+    try:
+        if dry_run:
+            result.update({"status": "planned", "detail": None, "diff": await _diff(operation, tools)})
+        else:
+            status, detail = await _apply(operation, tools)
+            result.update({"status": status, "detail": detail})
+    except Exception as e:
+        result.update({"status": "failed", "detail": f"{type(e).__name__}: {e}"})
+    if result["status"] == "failed":
+        logger.warning(f"Fix operation {operation['op_id']} ({operation['action']}) failed: {result['detail']}")
+
+
+async def execute_plan(operations: list, results: list, tools: dict, logger, dry_run: bool = False, batch_size: int = DEFAULT_BATCH_SIZE) -> list:
+    """
+    Applies (or, with `dry_run`, diffs) the operations validated by `validate_plan`, updating their
+    results in place: 'applied', 'failed' or, in a dry run, 'planned' with a `diff`.
+    """
+    results_by_id = {result["op_id"]: result for result in results}
+    valid = [operation for operation in operations if results_by_id[operation["op_id"]]["status"] == "valid"]
+    batches = schedule_batches(valid, batch_size)
+    logger.info(f"{'Diffing' if dry_run else 'Applying'} {len(valid)} valid fix operations in {len(batches)} batches of up to {batch_size}.")
+    for batch in batches:
+        await asyncio.gather(*(_run_operation(operation, results_by_id[operation["op_id"]], tools, dry_run, logger) for operation in batch))
+    return results
+
+
+def summarize_results(results: list) -> dict:
+    """Counts the results in each status."""
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    return counts
+
+
+def fix_dry_run() -> bool:
+    """Returns True if the Fixer should only report the changes its plan would make (FIX_DRY_RUN or run.py --dry-run)."""
+    return os.environ.get("FIX_DRY_RUN", "false").strip().lower() in ("1", "true", "yes")
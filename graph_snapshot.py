@@ -0,0 +1,194 @@
+# graph_snapshot.py
+"""
+Local snapshot of the LightRAG knowledge graph in the `graph_entities` and `graph_relations` tables.
+
+The Analyst and the Auditor read the graph with `graph_labels` and `graphs_get`. With GRAPH_SNAPSHOT
+enabled (the default), their nodes first bring the snapshot up to date and then get local tools of
+the same names and response shapes, so repeated graph reads are database lookups rather than MCP
+transfers of the same entities on every run.
+
+A refresh reads the entity names (one `graph_labels` call), drops entities that are gone and
+fetches with `graphs_get` only:
+
+- entities that are new since the last refresh;
+- entities marked dirty because the Fixer changed them;
+- up to GRAPH_SNAPSHOT_REVALIDATE entities fetched more than GRAPH_SNAPSHOT_MAX_AGE_HOURS ago,
+  oldest first, or regardless of age when documents were ingested since the watermark (ingestion
+  can change the descriptions and relations of existing entities).
+
+An empty snapshot of at most GRAPH_SNAPSHOT_BULK_NODES entities is filled with one `graphs_get('*')`
+call. The watermark is the start time of the last refresh; a refresh less than
+GRAPH_SNAPSHOT_MIN_INTERVAL seconds after it is skipped unless something was ingested or changed.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import weakref
+from datetime import datetime, timedelta, timezone
+from langchain_core.tools import StructuredTool
+from audit_engine import load_entity_names
+from db_utils import (
+    extract_and_clean_json, get_graph_snapshot_state, set_graph_snapshot_state, get_snapshot_labels,
+    get_snapshot_entities_to_revalidate, store_snapshot_subgraph, delete_snapshot_entities,
+    get_snapshot_entities, get_snapshot_relations, get_snapshot_top_entities,
+)
+from tracing import span
+
+DEFAULT_MIN_INTERVAL = 300.0
+DEFAULT_MAX_AGE_HOURS = 24.0
+DEFAULT_REVALIDATE = 200
+DEFAULT_BULK_NODES = 5000
+DEFAULT_MAX_NEIGHBORS = 1000
+DEFAULT_CONCURRENCY = 8
+
+SNAPSHOT_TOOLS = ("graph_labels", "graphs_get")
+
+# One refresh at a time per event loop; a caller that waited finds the snapshot fresh and skips
+_refresh_locks = weakref.WeakKeyDictionary()
+
+
+def graph_snapshot_enabled() -> bool:
+    return os.environ.get("GRAPH_SNAPSHOT", "true").strip().lower() in ("1", "true", "yes")
+
+
+def _parse_graph(raw_response) -> dict:
+    graph = extract_and_clean_json(raw_response) if isinstance(raw_response, str) else raw_response
+    if not isinstance(graph, dict):
+        raise ValueError(f"Unexpected graphs_get response: {str(raw_response)[:200]}")
+    nodes = [node for node in graph.get("nodes") or [] if isinstance(node, dict) and node.get("id")]
+    edges = [edge for edge in graph.get("edges") or [] if isinstance(edge, dict) and edge.get("source") and edge.get("target")]
+    return {"nodes": nodes, "edges": edges}
+
+
+async def _fetch_entity(graphs_get_tool, name: str, max_neighbors: int, semaphore: asyncio.Semaphore):
+    """
+    Fetches an entity with its relations and stores them. Its relations are replaced only if the
+    subgraph was not truncated; a truncated one is merged in, and the entity is marked fresh either way.
+    """
+    async with semaphore:
+        graph = _parse_graph(await graphs_get_tool.ainvoke({"label": name, "max_depth": 1, "max_nodes": max_neighbors}))
+    if not any(node["id"] == name for node in graph["nodes"]):
+        store_snapshot_subgraph(graph["nodes"], graph["edges"], [])
+    elif len(graph["nodes"]) < max_neighbors:
+        store_snapshot_subgraph(graph["nodes"], graph["edges"], [name])
+    else:
+        store_snapshot_subgraph(graph["nodes"], graph["edges"], [], truncated=[name])
+
+
+async def refresh_graph_snapshot(tools: dict, logger, force: bool = False) -> dict:
+    """Brings the snapshot up to date with the graph and returns what the refresh did."""
+    loop = asyncio.get_running_loop()
+    lock = _refresh_locks.setdefault(loop, asyncio.Lock())
+    async with lock:
+        state = get_graph_snapshot_state()
+        started = datetime.now(timezone.utc)
+        watermark = state["watermark"]
+        ingested = state["last_ingestion"] is not None and (watermark is None or state["last_ingestion"] > watermark)
+        min_interval = float(os.environ.get("GRAPH_SNAPSHOT_MIN_INTERVAL", DEFAULT_MIN_INTERVAL))
+        if not force and watermark and not ingested and not state["dirty"] and (started - watermark).total_seconds() < min_interval:
+            return {"skipped": True, "entities": state["entity_count"], "relations": state["relation_count"]}
+
+        max_age_hours = float(os.environ.get("GRAPH_SNAPSHOT_MAX_AGE_HOURS", DEFAULT_MAX_AGE_HOURS))
+        revalidate_limit = int(os.environ.get("GRAPH_SNAPSHOT_REVALIDATE", DEFAULT_REVALIDATE))
+        bulk_nodes = int(os.environ.get("GRAPH_SNAPSHOT_BULK_NODES", DEFAULT_BULK_NODES))
+        max_neighbors = int(os.environ.get("GRAPH_SNAPSHOT_MAX_NEIGHBORS", DEFAULT_MAX_NEIGHBORS))
+        concurrency = int(os.environ.get("GRAPH_SNAPSHOT_CONCURRENCY", DEFAULT_CONCURRENCY))
+
+        with span("graph_snapshot:refresh", kind="graph_snapshot") as active:
+            labels = list(dict.fromkeys(await load_entity_names(tools["graph_labels"])))
+            labels_hash = hashlib.md5("\n".join(sorted(labels)).encode("utf-8")).hexdigest()
+            known = set(get_snapshot_labels())
+            removed = known - set(labels)
+            delete_snapshot_entities(removed)
+            new = [label for label in labels if label not in known]
+            new_count = len(new)
+            bulk_fetched = 0
+
+            if not known and labels and len(labels) < bulk_nodes:
+                # Empty snapshot of a graph small enough to read in one call
+                graph = _parse_graph(await tools["graphs_get"].ainvoke({"label": "*", "max_depth": 1, "max_nodes": bulk_nodes}))
+                fetched = {node["id"] for node in graph["nodes"]}
+                store_snapshot_subgraph(graph["nodes"], graph["edges"], fetched)
+                new = [label for label in new if label not in fetched]
+                bulk_fetched = len(fetched)
+
+            revalidate = get_snapshot_entities_to_revalidate(revalidate_limit, started if ingested else started - timedelta(hours=max_age_hours))
+            to_fetch = list(dict.fromkeys(new + [name for name in revalidate if name not in removed]))
+            semaphore = asyncio.Semaphore(max(1, concurrency))
+            results = await asyncio.gather(*(_fetch_entity(tools["graphs_get"], name, max_neighbors, semaphore) for name in to_fetch), return_exceptions=True)
+            failed = [name for name, result in zip(to_fetch, results) if isinstance(result, Exception)]
+            if failed:
+                logger.warning(f"Failed to fetch {len(failed)} entities for the graph snapshot, e.g. '{failed[0]}': {results[to_fetch.index(failed[0])]}")
+
+            set_graph_snapshot_state(started, labels_hash)
+            stats = {"skipped": False, "labels": len(labels), "new": new_count, "removed": len(removed), "fetched": bulk_fetched + len(to_fetch) - len(failed), "failed": len(failed)}
+            if active:
+                active.set_attribute("stats", stats)
+        status = f"Refreshed the graph snapshot: {stats['labels']} entities, {stats['new']} new, {stats['removed']} removed, {stats['fetched']} fetched, {stats['failed']} failed."
+        logger.info(status)
+        return stats
+
+
+def _node(name: str, properties: dict) -> dict:
+    return {"id": name, "labels": [name], "properties": properties}
+
+
+async def snapshot_graph_labels() -> str:
+    """Lists the entity labels in the knowledge graph."""
+    return json.dumps(get_snapshot_labels())
+
+
+async def snapshot_graphs_get(label: str = "*", max_depth: int = 2, max_nodes: int = 100) -> str:
+    """Returns the subgraph within `max_depth` relations of the entity `label` (or of the most connected entities for '*'), with at most `max_nodes` nodes."""
+    if label == "*":
+        names = get_snapshot_top_entities(max_nodes)
+    else:
+        names = [label] if get_snapshot_entities([label]) else []
+        frontier = list(names)
+        for _ in range(max_depth):
+            if not frontier or len(names) >= max_nodes:
+                break
+            neighbors = []
+            for relation in get_snapshot_relations(frontier):
+                for name in (relation["source"], relation["target"]):
+                    if name not in names and name not in neighbors:
+                        neighbors.append(name)
+            neighbors = neighbors[:max_nodes - len(names)]
+            names.extend(neighbors)
+            frontier = neighbors
+
+    included = set(names)
+    properties = get_snapshot_entities(names)
+    nodes = [_node(name, properties.get(name, {})) for name in names]
+    edges = [
+        {"id": f"{relation['source']}-{relation['target']}", "type": "DIRECTED", **relation}
+        for relation in get_snapshot_relations(names)
+        if relation["source"] in included and relation["target"] in included
+    ]
+    return json.dumps({"nodes": nodes, "edges": edges, "is_truncated": len(names) >= max_nodes})
+
+
+def snapshot_tools(mcp_tools: list) -> list:
+    """Returns `mcp_tools` with `graph_labels` and `graphs_get` answered from the snapshot instead of MCP."""
+    local = {
+        "graph_labels": StructuredTool.from_function(coroutine=snapshot_graph_labels, name="graph_labels", description=snapshot_graph_labels.__doc__),
+        "graphs_get": StructuredTool.from_function(coroutine=snapshot_graphs_get, name="graphs_get", description=snapshot_graphs_get.__doc__),
+    }
+    return [local.get(tool.name, tool) for tool in mcp_tools]
+
+
+async def use_graph_snapshot(mcp_tools: list, logger) -> list:
+    """
+    Refreshes the snapshot and returns the tools with the graph reads served from it. If the
+    snapshot is disabled, the graph tools are missing or the refresh fails, the MCP tools are returned as they are.
+    """
+    tools = {tool.name: tool for tool in mcp_tools}
+    if not graph_snapshot_enabled() or not all(name in tools for name in SNAPSHOT_TOOLS):
+        return mcp_tools
+    try:
+        await refresh_graph_snapshot(tools, logger)
+    except Exception as e:
+        logger.error(f"Failed to refresh the graph snapshot, reading the graph over MCP: {e}", exc_info=True)
+        return mcp_tools
+    return snapshot_tools(mcp_tools)
@@ -0,0 +1,362 @@
+# ingestion.py
+import asyncio
+import os
+import re
+import time
+from collections import deque
+from db_utils import get_documents_for_ingestion, set_ingestion_statuses
+from mcp_utils import build_tool_args, parse_json_response
+
+DEFAULT_INGESTION_BATCH_SIZE = 10
+DEFAULT_INGESTION_MODE = "text"
+DEFAULT_INGESTION_FILES_DIR = "ingestion_batches"
+DEFAULT_TARGET_IN_FLIGHT = 20
+DEFAULT_POLL_INTERVAL = 5.0
+DEFAULT_STALL_TIMEOUT = 900.0
+DEFAULT_TRACK_CONCURRENCY = 8
+
+# Accepted argument names for the LightRAG MCP tools, in order of preference
+INSERT_TEXT_ARGUMENTS = {"text": ("text", "content"), "source": ("file_source", "source", "description")}
+UPLOAD_FILES_ARGUMENTS = {"paths": ("file_paths", "paths", "files")}
+TRACK_STATUS_ARGUMENTS = {"track_id": ("track_id", "id")}
+
+# LightRAG responses that mean the document was accepted into its pipeline, or was already indexed
+ACCEPTED_RESPONSES = ("success", "partial_success")
+DUPLICATED_RESPONSES = ("duplicated",)
+
+# Document statuses in a LightRAG track status response that end a document's processing
+INDEXED_DOCUMENT_STATUSES = ("processed",)
+FAILED_DOCUMENT_STATUSES = ("failed",)
+
+
+def _parse_tool_response(raw_response) -> tuple:
+    """
+    Returns (status, detail, track_id) for a LightRAG insert or upload response.
+
+    The status is 'submitted' when LightRAG accepted the document into its pipeline, 'ingested' when
+    it was already indexed, and 'failed' otherwise. The track ID, if LightRAG returned one, identifies
+    the submission in `documents_track_status`.
+    """
+    response = parse_json_response(raw_response)
+    if not isinstance(response, dict):
+        # Not a LightRAG answer (e.g. a plain-text error); a document that was accepted after all is
+        # answered as a duplicate when it is submitted again
+        return "failed", f"Unexpected response: {str(raw_response)[:200]}", None
+
+    response_status = str(response.get("status", "")).lower()
+    detail = response.get("message") or response_status
+    track_id = response.get("track_id") or None
+    if response_status in ACCEPTED_RESPONSES:
+        return "submitted", detail, track_id
+    if response_status in DUPLICATED_RESPONSES:
+        return "ingested", detail, None
+    return "failed", detail, None
+
+
+def _parse_track_status(raw_response) -> list:
+    """Returns (file_path, status, error) for each document of a `documents_track_status` response."""
+    response = parse_json_response(raw_response)
+    if not isinstance(response, dict):
+        raise ValueError(f"Unexpected track status response: {raw_response}")
+    return [
+        (str(document.get("file_path") or ""), str(document.get("status") or "").lower(), document.get("error_msg"))
+        for document in response.get("documents") or [] if isinstance(document, dict)
+    ]
+
+
+def _parse_pipeline_status(raw_response) -> tuple:
+    """
+    Returns (busy, queued_documents) from a `documents_pipeline_status` response.
+
+    LightRAG reports the number of documents in the current job (`docs`) and its progress through
+    the job's batches (`cur_batch` of `batchs`), from which the number still queued is estimated.
+    """
+    response = parse_json_response(raw_response)
+    if not isinstance(response, dict):
+        raise ValueError(f"Unexpected pipeline status response: {raw_response}")
+
+    busy = bool(response.get("busy")) or bool(response.get("request_pending"))
+    if not busy:
+        return False, 0
+    docs = int(response.get("docs") or 0)
+    batches = int(response.get("batchs") or 0)
+    current_batch = int(response.get("cur_batch") or 0)
+    if batches > 0:
+        # cur_batch is the batch being processed, so count it as still queued
+        remaining_fraction = max(0.0, (batches - max(current_batch - 1, 0)) / batches)
+        return True, max(1, round(docs * remaining_fraction))
+    return True, max(docs, 1)
+
+
+def _batch_file_name(document: dict) -> str:
+    """Builds a stable markdown file name for a document from its url_id and URL."""
+    slug = re.sub(r"[^a-zA-Z0-9]+", "_", document["url"].split("://", 1)[-1]).strip("_")[:80]
+    return f"{document['url_id']}_{slug}.md"
+
+
+async def _insert_text(tool, document: dict) -> dict:
+    """Submits one document to LightRAG with `documents_insert_text`."""
+    tool_args = build_tool_args(tool, INSERT_TEXT_ARGUMENTS, {"text": document["markdown_content"], "source": document["url"]})
+    try:
+        raw_response = await tool.ainvoke(tool_args)
+        status, detail, track_id = _parse_tool_response(raw_response)
+    except Exception as e:
+        status, detail, track_id = "failed", f"{type(e).__name__}: {e}", None
+    return {"url": document["url"], "url_id": document["url_id"], "status": status, "detail": detail, "track_id": track_id}
+
+
+async def _upload_files(tool, batch: list, files_dir: str) -> list:
+    """Writes a batch of documents to markdown files and submits them with `documents_upload_files`."""
+    os.makedirs(files_dir, exist_ok=True)
+    paths = []
+    for document in batch:
+        path = os.path.abspath(os.path.join(files_dir, _batch_file_name(document)))
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(document["markdown_content"])
+        paths.append(path)
+
+    tool_args = build_tool_args(tool, UPLOAD_FILES_ARGUMENTS, {"paths": paths})
+    try:
+        raw_response = await tool.ainvoke(tool_args)
+        status, detail, track_id = _parse_tool_response(raw_response)
+    except Exception as e:
+        status, detail, track_id = "failed", f"{type(e).__name__}: {e}", None
+    return [{"url": d["url"], "url_id": d["url_id"], "status": status, "detail": detail, "track_id": track_id} for d in batch]
+
+
+async def _submit_batch(tool, mode: str, batch: list, files_dir: str) -> list:
+    """Submits a batch of documents with the tool for the ingestion mode, returning one status per document."""
+    if mode == "files":
+        return await _upload_files(tool, batch, files_dir)
+    return list(await asyncio.gather(*(_insert_text(tool, document) for document in batch)))
+
+
+class IngestionScheduler:
+    """
+    Feeds documents to LightRAG as fast as its extraction pipeline can absorb them.
+
+    The scheduler polls `documents_pipeline_status` and keeps about `target_in_flight` documents
+    submitted but not yet indexed. Each in-flight document that LightRAG gave a track ID is looked up
+    with `documents_track_status` and marked as indexed (or failed) when LightRAG reports it so, with
+    its time-to-indexed. Only documents without a track ID, or all of them when the track status tool
+    is missing, fall back to an estimate from the pipeline's queue length: when the queue shrinks the
+    oldest of them are taken as indexed, which assumes LightRAG indexes in submission order and
+    nothing else submits to it. The batch size follows the observed processing rate, so each poll
+    submits roughly what the pipeline finished since the previous one.
+    """
+
+    def __init__(self, submit_tool, status_tool, mode: str, files_dir: str, logger, target_in_flight: int = None,
+                 min_batch_size: int = 1, max_batch_size: int = None, poll_interval: float = None, stall_timeout: float = None,
+                 track_tool=None):
+        self.submit_tool = submit_tool
+        self.status_tool = status_tool
+        self.track_tool = track_tool
+        self.mode = mode
+        self.files_dir = files_dir
+        self.logger = logger
+        self.target_in_flight = max(1, int(target_in_flight or os.environ.get("INGESTION_TARGET_IN_FLIGHT", DEFAULT_TARGET_IN_FLIGHT)))
+        self.min_batch_size = max(1, min_batch_size)
+        self.max_batch_size = max(self.min_batch_size, int(max_batch_size or os.environ.get("INGESTION_BATCH_SIZE", DEFAULT_INGESTION_BATCH_SIZE)))
+        self.poll_interval = float(poll_interval or os.environ.get("INGESTION_POLL_INTERVAL", DEFAULT_POLL_INTERVAL))
+        self.stall_timeout = float(stall_timeout or os.environ.get("INGESTION_STALL_TIMEOUT", DEFAULT_STALL_TIMEOUT))
+        self.batch_size = self.max_batch_size
+        self.rate = None  # Documents indexed per second, smoothed
+        self.in_flight = []  # (status entry, submit time) in submission order
+        self.estimate_logged = False
+
+    async def _poll(self) -> int:
+        """Returns the number of documents still queued in the LightRAG pipeline."""
+        _, queued = _parse_pipeline_status(await self.status_tool.ainvoke({}))
+        return queued
+
+    def _source(self, entry: dict) -> str:
+        """The file path LightRAG records for a document: its URL, or the name of its batch file."""
+        return _batch_file_name(entry) if self.mode == "files" else entry["url"]
+
+    async def _track(self, track_id: str, entries: list, semaphore: asyncio.Semaphore) -> list:
+        """Returns (entry, status, error) for the entries of one submission whose processing has ended."""
+        async with semaphore:
+            documents = _parse_track_status(await self.track_tool.ainvoke(build_tool_args(self.track_tool, TRACK_STATUS_ARGUMENTS, {"track_id": track_id})))
+        by_path = {}
+        for file_path, status, error in documents:
+            by_path[file_path] = by_path[os.path.basename(file_path)] = (status, error)
+        finished = []
+        for entry in entries:
+            source = self._source(entry)
+            result = by_path.get(source) or by_path.get(os.path.basename(source))
+            if result is None and len(entries) == 1 and len(documents) == 1:
+                result = documents[0][1:]
+            if result and result[0] in INDEXED_DOCUMENT_STATUSES + FAILED_DOCUMENT_STATUSES:
+                finished.append((entry, "ingested" if result[0] in INDEXED_DOCUMENT_STATUSES else "failed", result[1]))
+        return finished
+
+    async def _check_tracked(self) -> list:
+        """Looks up the in-flight documents that have a track ID and returns (entry, status, error) for those that finished."""
+        submissions = {}
+        for entry, _ in self.in_flight:
+            if entry.get("track_id"):
+                submissions.setdefault(entry["track_id"], []).append(entry)
+        if self.track_tool is None or not submissions:
+            return []
+        semaphore = asyncio.Semaphore(DEFAULT_TRACK_CONCURRENCY)
+        results = await asyncio.gather(*(self._track(track_id, entries, semaphore) for track_id, entries in submissions.items()), return_exceptions=True)
+        finished = []
+        for track_id, result in zip(submissions, results):
+            if isinstance(result, Exception):
+                self.logger.warning(f"Failed to read the status of LightRAG submission {track_id}: {result}")
+                continue
+            finished.extend(result)
+        return finished
+
+    def _estimate_untracked(self, queued: int) -> list:
+        """
+        Returns (entry, 'ingested', None) for the oldest in-flight documents that cannot be tracked, as many as
+        the pipeline's queue is shorter than the number of documents in flight.
+        """
+        untracked = [entry for entry, _ in self.in_flight if self.track_tool is None or not entry.get("track_id")]
+        if not untracked:
+            return []
+        if not self.estimate_logged:
+            reason = "LightRAG returned no track IDs" if self.track_tool is not None else "the documents_track_status tool is not available"
+            status = (f"Inferring indexed documents from the pipeline's queue length because {reason}; this assumes LightRAG "
+                      f"indexes in submission order and that nothing else submits to it.")
+            self.logger.warning(status)
+            self.estimate_logged = True
+        return [(entry, "ingested", None) for entry in untracked[:max(0, len(self.in_flight) - queued)]]
+
+    def _finish(self, finished: list, now: float):
+        """Records the end of processing for finished (entry, status, error) and removes them from the in-flight documents."""
+        done = {id(entry) for entry, _, _ in finished}
+        submitted_at = {id(entry): at for entry, at in self.in_flight}
+        for entry, status, error in finished:
+            entry["status"] = status
+            if status == "ingested":
+                entry["time_to_indexed"] = round(now - submitted_at[id(entry)], 2)
+            elif error:
+                entry["detail"] = error
+        self.in_flight = [(entry, at) for entry, at in self.in_flight if id(entry) not in done]
+        set_ingestion_statuses([(entry["url_id"], status) for entry, status, _ in finished])
+
+    def _update_rate(self, completed: int, elapsed: float):
+        """Updates the smoothed processing rate and derives the next batch size from it."""
+        if elapsed <= 0 or (self.rate is None and not completed):
+            # Nothing has been indexed yet, so there is no rate to size batches by
+            return
+        observed = completed / elapsed
+        self.rate = observed if self.rate is None else 0.7 * self.rate + 0.3 * observed
+        self.batch_size = min(self.max_batch_size, max(self.min_batch_size, round(self.rate * self.poll_interval)))
+
+    async def run(self, documents: list) -> list:
+        """Submits `documents` under backpressure and waits for them to be indexed."""
+        pending = deque(documents)
+        statuses = []
+        last_poll = time.monotonic()
+        last_progress = last_poll
+
+        while pending or self.in_flight:
+            # Submit while there is room in the pipeline
+            room = self.target_in_flight - len(self.in_flight)
+            if pending and room > 0:
+                batch = [pending.popleft() for _ in range(min(room, self.batch_size, len(pending)))]
+                batch_statuses = await _submit_batch(self.submit_tool, self.mode, batch, self.files_dir)
+                submitted_at = time.monotonic()
+                statuses.extend(batch_statuses)
+                self.in_flight.extend((entry, submitted_at) for entry in batch_statuses if entry["status"] == "submitted")
+                set_ingestion_statuses([(e["url_id"], e["status"]) for e in batch_statuses])
+                status = f"Submitted {len(batch)} documents for ingestion; {len(self.in_flight)} in flight, {len(pending)} pending."
+                self.logger.info(status)
+
+            if not self.in_flight:
+                continue
+
+            await asyncio.sleep(self.poll_interval)
+            try:
+                queued = await self._poll()
+            except Exception as e:
+                status = f"Failed to read the LightRAG pipeline status: {e}"
+                self.logger.error(status)
+                queued = len(self.in_flight)
+
+            now = time.monotonic()
+            finished = await self._check_tracked()
+            self._finish(finished, now)
+            estimated = self._estimate_untracked(queued)
+            self._finish(estimated, now)
+            completed = len(finished) + len(estimated)
+            if completed:
+                last_progress = now
+            self._update_rate(completed, now - last_poll)
+            last_poll = now
+
+            failed = len([status for _, status, _ in finished if status == "failed"])
+            status = f"LightRAG pipeline: {queued} queued, {completed - failed} newly indexed ({len(estimated)} estimated), {failed} failed, {len(self.in_flight)} in flight, batch size {self.batch_size}."
+            self.logger.info(status)
+
+            if now - last_progress > self.stall_timeout:
+                status = f"LightRAG pipeline made no progress for {self.stall_timeout:.0f}s; leaving {len(self.in_flight)} documents in flight."
+                self.logger.warning(status)
+                break
+
+        # Documents still in flight stay 'submitted', so the next curation submits them again; LightRAG answers
+        # 'duplicated' for those it has indexed by then
+
+        indexed_times = [e["time_to_indexed"] for e in statuses if "time_to_indexed" in e]
+        if indexed_times:
+            status = f"Time to indexed: mean {sum(indexed_times) / len(indexed_times):.1f}s, max {max(indexed_times):.1f}s over {len(indexed_times)} documents."
+            self.logger.info(status)
+        return statuses
+
+
+async def ingest_documents(urls: list, tools: list, logger, batch_size: int = None, mode: str = None) -> list:
+    """
+    Ingests the stored markdown of the given URLs into LightRAG without an LLM in the loop.
+
+    The markdown is read from the `documents` table in one query and submitted in batches, either
+    concurrently through `documents_insert_text` (mode 'text') or as one `documents_upload_files`
+    call per batch (mode 'files'). When `documents_pipeline_status` is available, submission is
+    paced by the `IngestionScheduler`. Returns one status entry per URL and records it on the document.
+    """
+    batch_size = max(1, int(batch_size or os.environ.get("INGESTION_BATCH_SIZE", DEFAULT_INGESTION_BATCH_SIZE)))
+    mode = mode or os.environ.get("INGESTION_MODE", DEFAULT_INGESTION_MODE)
+    tool_name = "documents_upload_files" if mode == "files" else "documents_insert_text"
+    tool = next((t for t in tools if t.name == tool_name), None)
+    if tool is None:
+        raise ValueError(f"Ingestion tool '{tool_name}' not found for ingestion mode '{mode}'.")
+    status_tool = next((t for t in tools if t.name == "documents_pipeline_status"), None)
+    track_tool = next((t for t in tools if t.name == "documents_track_status"), None)
+
+    documents = get_documents_for_ingestion(urls)
+    statuses = []
+    ready = []
+    for url in dict.fromkeys(urls):
+        document = documents.get(url)
+        if not document:
+            statuses.append({"url": url, "url_id": None, "status": "skipped", "detail": "URL not found in the document store."})
+        elif not document["markdown_content"] or document["markdown_content"].startswith("[MARKDOWN_GENERATION_FAILED"):
+            statuses.append({"url": url, "url_id": document["url_id"], "status": "skipped", "detail": "No valid markdown content available."})
+        else:
+            ready.append(document)
+
+    files_dir = os.environ.get("INGESTION_FILES_DIR", DEFAULT_INGESTION_FILES_DIR)
+    if status_tool is not None:
+        status = f"Ingesting {len(ready)} documents with {tool_name} under pipeline backpressure; {len(statuses)} skipped."
+        logger.info(status)
+        scheduler = IngestionScheduler(tool, status_tool, mode, files_dir, logger, max_batch_size=batch_size, track_tool=track_tool)
+        statuses.extend(await scheduler.run(ready))
+        return statuses
+
+    status = f"Ingesting {len(ready)} documents in batches of {batch_size} with {tool_name}; {len(statuses)} skipped."
+    logger.info(status)
+    for start in range(0, len(ready), batch_size):
+        batch = ready[start:start + batch_size]
+        batch_statuses = await _submit_batch(tool, mode, batch, files_dir)
+        statuses.extend(batch_statuses)
+
+        submitted = len([s for s in batch_statuses if s["status"] != "failed"])
+        status = f"Ingestion batch {start // batch_size + 1}: {submitted} of {len(batch)} documents submitted."
+        logger.info(status)
+
+        # Without the pipeline status nothing confirms indexing, so accepted documents stay 'submitted'
+        set_ingestion_statuses([(s["url_id"], s["status"]) for s in batch_statuses])
+
+    return statuses
@@ -0,0 +1,287 @@
+# job_queue.py
+"""
+Postgres work queue for the researcher's fetch and summarize jobs.
+
+With RESEARCH_JOB_QUEUE=true the researcher does not fetch and summarize documents itself: it
+enqueues a `fetch` job for every new search result URL and a `summarize` job for every document
+of the gap, and waits for them. The jobs are executed by workers (`python run.py --worker`), any
+number of them on any number of hosts sharing the database:
+
+- A worker claims a job with FOR UPDATE SKIP LOCKED and holds a lease on it (JOB_LEASE_SECONDS)
+  that it renews while the job runs. If the worker dies, the lease expires and another worker
+  picks the job up.
+- A failed job is retried with exponential backoff (JOB_RETRY_BACKOFF) until it has used
+  JOB_MAX_ATTEMPTS attempts, and is then dead-lettered: it stays in the table with status 'dead'
+  and its last error.
+- Every worker records a heartbeat in `job_workers` every WORKER_HEARTBEAT_SECONDS. The researcher
+  only waits for its jobs while a worker for their kind is alive, so a run without workers does not
+  sit out JOB_WAIT_TIMEOUT for every gap.
+
+Run `python job_queue.py` to print the queue and the latest dead jobs, and with --retry-dead to
+queue the dead jobs again.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import time
+from tracing import span, start_trace, stop_trace
+
+logger = logging.getLogger('KnowledgeAgent')
+
+JOB_KINDS = ("fetch", "summarize")
+FINISHED_STATUSES = ("done", "dead")
+
+DEFAULT_LEASE_SECONDS = 300.0
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_BACKOFF = 30.0
+DEFAULT_POLL_INTERVAL = 1.0
+DEFAULT_WAIT_TIMEOUT = 3600.0
+DEFAULT_WORKER_CONCURRENCY = 4
+
+WORKER_HEARTBEAT_SECONDS = 10.0
+# A worker that missed this many heartbeats is taken to be gone
+WORKER_MISSED_HEARTBEATS = 3
+
+# Fetch errors worth another attempt; anything else (e.g. a 404 or an unsupported content type) is final
+RETRYABLE_FETCH_ERRORS = {"ConnectionError", "ConnectTimeout", "ReadTimeout", "Timeout", "ChunkedEncodingError", "TimeoutError"}
+
+
+def job_queue_enabled() -> bool:
+    """Returns True if the researcher should hand its fetch and summarize work to the job queue."""
+    return os.environ.get("RESEARCH_JOB_QUEUE", "false").strip().lower() in ("1", "true", "yes")
+
+
+def max_attempts() -> int:
+    return int(os.environ.get("JOB_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS))
+
+
+async def wait_for_jobs(job_ids: list, logger, timeout: float = None, kind: str = None) -> dict:
+    """
+    Waits until every job is done or dead-lettered, until `timeout` (JOB_WAIT_TIMEOUT) passes, or,
+    for jobs of `kind`, until no live worker runs that kind; returns the number of jobs in each status.
+    """
+    from db_utils import get_job_statuses, count_live_workers
+
+    timeout = timeout if timeout is not None else float(os.environ.get("JOB_WAIT_TIMEOUT", DEFAULT_WAIT_TIMEOUT))
+    poll_interval = float(os.environ.get("JOB_POLL_INTERVAL", DEFAULT_POLL_INTERVAL))
+    deadline = time.monotonic() + timeout
+    next_worker_check = time.monotonic()
+    counts = {}
+    while job_ids:
+        statuses = get_job_statuses(job_ids)
+        counts = {}
+        for status in statuses.values():
+            counts[status] = counts.get(status, 0) + 1
+        if all(status in FINISHED_STATUSES for status in statuses.values()):
+            break
+        if time.monotonic() >= deadline:
+            logger.warning(f"Stopped waiting for {len(job_ids)} jobs after {timeout:g}s: {counts}. Are workers running (python run.py --worker)?")
+            break
+        if kind and time.monotonic() >= next_worker_check:
+            if not count_live_workers(kind, WORKER_HEARTBEAT_SECONDS * WORKER_MISSED_HEARTBEATS):
+                logger.warning(f"No live worker runs {kind} jobs; not waiting for {len(job_ids)} jobs: {counts}. Start workers with python run.py --worker.")
+                break
+            next_worker_check = time.monotonic() + WORKER_HEARTBEAT_SECONDS
+        await asyncio.sleep(poll_interval)
+    return counts
+
+
+async def enqueue_and_wait(kind: str, payloads: list, logger, run_id: str = None) -> dict:
+    """Enqueues one job per payload and waits for them; returns the number of jobs in each status."""
+    from db_utils import enqueue_jobs
+
+    if not payloads:
+        return {}
+    with span(f"jobs:{kind}", kind="job", jobs=len(payloads)) as active:
+        job_ids = enqueue_jobs(kind, payloads, run_id=run_id, max_attempts=max_attempts())
+        logger.info(f"Enqueued {len(job_ids)} {kind} jobs; waiting for workers.")
+        counts = await wait_for_jobs(job_ids, logger, kind=kind)
+        if active:
+            active.set_attribute("statuses", counts)
+    logger.info(f"{kind} jobs finished: {counts}")
+    return counts
+
+
+class Worker:
+    """Claims and runs jobs from the queue, `concurrency` at a time."""
+
+    def __init__(self, model, kinds=JOB_KINDS, concurrency: int = None, worker_id: str = None):
+        self.model = model
+        self.kinds = list(kinds)
+        self.concurrency = concurrency or int(os.environ.get("WORKER_CONCURRENCY", DEFAULT_WORKER_CONCURRENCY))
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.lease_seconds = float(os.environ.get("JOB_LEASE_SECONDS", DEFAULT_LEASE_SECONDS))
+        self.backoff = float(os.environ.get("JOB_RETRY_BACKOFF", DEFAULT_RETRY_BACKOFF))
+        self.poll_interval = float(os.environ.get("JOB_POLL_INTERVAL", DEFAULT_POLL_INTERVAL))
+        self.handlers = {"fetch": self.run_fetch_job, "summarize": self.run_summarize_job}
+        self._summarizer = None
+        self.completed = 0
+        self.failed = 0
+
+    async def run_fetch_job(self, job: dict) -> dict:
+        from tools import fetch_document
+
+        payload = job["payload"]
+        telemetry = await fetch_document(payload["url_id"], payload["url"], logger, run_id=job["run_id"])
+        error_class = telemetry.get("error_class")
+        if error_class in RETRYABLE_FETCH_ERRORS or (telemetry.get("status_code") or 0) >= 500 or telemetry.get("status_code") == 429:
+            raise RuntimeError(f"Fetching {payload['url']} failed with {error_class} (status {telemetry.get('status_code')})")
+        return {"error_class": error_class, "bytes": telemetry.get("bytes"), "output_chars": telemetry.get("output_chars")}
+
+    async def run_summarize_job(self, job: dict) -> dict:
+        from agent_registry import get_registry
+        from sub_agents.researcher import summarize_document
+        from usage import UsageCollector, usage_tags
+
+        if self._summarizer is None:
+            self._summarizer = get_registry().get_executor("summarizer", self.model)
+        payload = job["payload"]
+        collector = UsageCollector()
+        with usage_tags(node="researcher", gap_id=payload.get("gap_id"), search_id=payload.get("search_id"), url_id=payload["url_id"]):
+            outcome = await summarize_document(payload["url_id"], self._summarizer, logger, config={"callbacks": [collector]})
+        if job["run_id"]:
+            collector.flush(job["run_id"])
+        return {"outcome": outcome}
+
+    async def _keep_lease(self, job_id: int):
+        from db_utils import extend_job_lease
+
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            if not extend_job_lease(job_id, self.worker_id, self.lease_seconds):
+                logger.warning(f"Lost the lease on job {job_id}; another worker may run it again.")
+                return
+
+    async def execute(self, job: dict):
+        """
+        Runs one claimed job, renewing its lease meanwhile, and records its result or failure.
+        The job's spans are appended to the trace of the run that enqueued it (useful when TRACE_DIR is shared).
+        """
+        from db_utils import complete_job, fail_job
+
+        if job["run_id"]:
+            start_trace(job["run_id"])
+        heartbeat = asyncio.create_task(self._keep_lease(job["id"]))
+        try:
+            with span(f"job:{job['kind']}", kind="job", job_id=job["id"], attempt=job["attempts"]):
+                result = await self.handlers[job["kind"]](job)
+        except Exception as e:
+            retry_delay = self.backoff * 2 ** (job["attempts"] - 1)
+            status = fail_job(job["id"], self.worker_id, f"{type(e).__name__}: {e}", retry_delay)
+            self.failed += 1
+            if status == "dead":
+                logger.error(f"Job {job['id']} ({job['kind']}) failed on its last attempt and was dead-lettered: {e}")
+            else:
+                logger.warning(f"Job {job['id']} ({job['kind']}) failed on attempt {job['attempts']} of {job['max_attempts']}, retrying in {retry_delay:g}s: {e}")
+        else:
+            complete_job(job["id"], self.worker_id, result)
+            self.completed += 1
+        finally:
+            heartbeat.cancel()
+            stop_trace()
+
+    async def _slot(self, stop: asyncio.Event):
+        from db_utils import claim_job
+
+        while not stop.is_set():
+            try:
+                job = claim_job(self.worker_id, self.kinds, self.lease_seconds)
+            except Exception as e:
+                logger.error(f"Worker {self.worker_id} could not claim a job: {e}")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(stop.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self.execute(job)
+
+    async def _heartbeat(self, stop: asyncio.Event):
+        """Records the worker's heartbeat every WORKER_HEARTBEAT_SECONDS until `stop` is set."""
+        from db_utils import record_worker_heartbeat
+
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), WORKER_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            if stop.is_set():
+                return
+            try:
+                record_worker_heartbeat(self.worker_id, self.kinds)
+            except Exception as e:
+                logger.error(f"Worker {self.worker_id} could not record its heartbeat: {e}")
+
+    async def run(self, stop: asyncio.Event):
+        """Runs until `stop` is set; jobs in progress are finished first."""
+        from db_utils import record_worker_heartbeat, remove_worker
+
+        record_worker_heartbeat(self.worker_id, self.kinds)
+        status = f"Worker {self.worker_id} running {self.kinds} jobs, {self.concurrency} at a time."
+        logger.info(status)
+        try:
+            await asyncio.gather(self._heartbeat(stop), *(self._slot(stop) for _ in range(self.concurrency)))
+        finally:
+            remove_worker(self.worker_id)
+        logger.info(f"Worker {self.worker_id} stopped after {self.completed} completed and {self.failed} failed jobs.")
+
+
+async def run_worker(model, kinds=JOB_KINDS, concurrency: int = None):
+    """Runs a worker until SIGINT or SIGTERM."""
+    import signal
+    from db_utils import migrate_database, open_db_pool, close_db_pool
+
+    migrate_database()
+    worker = Worker(model, kinds, concurrency)
+    open_db_pool(worker.concurrency + 2)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signal_number, stop.set)
+    try:
+        await worker.run(stop)
+    finally:
+        close_db_pool()
+
+
+def print_queue(dead: int = 10):
+    from db_utils import get_job_queue_stats, get_dead_jobs
+
+    stats = get_job_queue_stats()
+    if not stats:
+        print("The job queue is empty")
+        return
+    print(f"{'kind':<12} {'status':<10} {'jobs':>8}  oldest")
+    for kind, status, count, oldest in stats:
+        print(f"{kind:<12} {status:<10} {count:>8}  {oldest:%Y-%m-%d %H:%M:%S}")
+
+    dead_jobs = get_dead_jobs(dead)
+    if dead_jobs:
+        print("\nLatest dead jobs:")
+        for job in dead_jobs:
+            last_error = (job["last_error"] or "").splitlines()[-1:] or [""]
+            print(f"{job['id']:>8} {job['kind']:<10} {job['attempts']} attempts  {str(job['payload'])[:60]:<60}  {last_error[0][:80]}")
+
+
+def main():
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description="Print the job queue, or queue its dead-lettered jobs again.")
+    parser.add_argument("--dead", type=int, default=10, help="Number of dead jobs to list.")
+    parser.add_argument("--retry-dead", action="store_true", help="Queue every dead job again with a fresh set of attempts.")
+    parser.add_argument("--kind", choices=JOB_KINDS, help="Only retry dead jobs of this kind.")
+    args = parser.parse_args()
+
+    load_dotenv()
+    if args.retry_dead:
+        from db_utils import retry_dead_jobs
+        print(f"Queued {retry_dead_jobs(args.kind)} dead jobs again")
+    else:
+        print_queue(args.dead)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,103 +1,184 @@
 # knowledge_agent.py
 
-import json
-from langchain_mcp_adapters.client import MultiServerMCPClient
-from langgraph.graph import StateGraph, END
-from sub_agents.analyst import analyst_agent_node, save_analyst_report_node
-from sub_agents.researcher import researcher_agent_node
-from sub_agents.curator import curator_agent_node
-from sub_agents.auditor import auditor_agent_node, save_auditor_report_node
-from sub_agents.fixer import fixer_agent_node, save_fixer_report_node
-from sub_agents.advisor import advisor_agent_node, save_advisor_report_node
+from langgraph.graph import StateGraph, START, END
+from mcp_client import get_mcp_provider
+from tracing import traced
+from sub_agents.analyst import analyst_agent_node, save_analyst_report_node, ANALYST_TOOLS
+from sub_agents.researcher import researcher_agent_node, RESEARCHER_TOOLS
+from sub_agents.curator import curator_agent_node, CURATOR_TOOLS
+from sub_agents.auditor import auditor_agent_node, save_auditor_report_node, AUDITOR_TOOLS
+from sub_agents.fixer import fixer_agent_node, save_fixer_report_node, FIXER_TOOLS
+from sub_agents.advisor import advisor_agent_node, save_advisor_report_node, ADVISOR_TOOLS
+from sub_agents.refresher import refresher_node, REFRESHER_TOOLS
 
 from state import AgentState
 
-async def get_mcp_tools():
-    """Initializes the MCP client and fetches the available tools."""
-    with open('mcp.json', 'r') as f:
-        mcp_server_config = json.load(f)
-    
-    mcp_client = MultiServerMCPClient(mcp_server_config)
-    tools = await mcp_client.get_tools()
-    print(f"Successfully loaded {len(tools)} tools from MCP server.")
-    return tools
+# MCP tools each workflow may use; only the servers providing them are started
+WORKFLOW_TOOLS = {
+    "maintenance": ANALYST_TOOLS + RESEARCHER_TOOLS + CURATOR_TOOLS + AUDITOR_TOOLS + FIXER_TOOLS + ADVISOR_TOOLS,
+    "analyze": ANALYST_TOOLS,
+    "research": RESEARCHER_TOOLS,
+    "curate": CURATOR_TOOLS,
+    "audit": AUDITOR_TOOLS,
+    "fix": FIXER_TOOLS,
+    "advise": ADVISOR_TOOLS,
+    "refresh": REFRESHER_TOOLS,
+}
+
+def get_workflow_mcp_provider(task: str):
+    """Returns an MCP tool provider that starts only the servers the task's nodes need, on first use."""
+    provider = get_mcp_provider(allowed_tools=WORKFLOW_TOOLS[task])
+    print(f"MCP servers available for '{task}': {provider.servers_for(WORKFLOW_TOOLS[task])}")
+    return provider
+
+def add_traced_node(workflow: StateGraph, name: str, node):
+    """Adds a node to the workflow, recording a span for every time it runs."""
+    workflow.add_node(name, traced(f"node:{name}", kind="node")(node))
+
+def route_researcher(state: AgentState) -> str:
+    """Loops the researcher node until every gap has been researched."""
+    if state.get("researcher_gaps_todo"):
+        return "researcher"
+    return "done"
+
+def join_maintenance_branches_node(state: AgentState):
+    """Fan-in of the maintenance branches: runs once both research/curation and audit/fix have finished."""
+    gaps_failed = state.get("researcher_gaps_failed") or []
+    status = (
+        f"Maintenance branches finished: research report {state.get('researcher_report_id')} "
+        f"({len(state.get('researcher_gaps_complete') or [])} gaps researched, {len(gaps_failed)} failed), "
+        f"curator report {state.get('curator_report_id')}, audit and fix reports saved."
+    )
+    return {"status": status}
+
+# Maintenance nodes in their serial order, with the nodes each one waits for. Research and curation
+# only depend on the analyst and audit/fix only on the knowledge graph, so the two branches run
+# concurrently and meet at the join before the advisor.
+MAINTENANCE_NODES = {
+    "analyst": (analyst_agent_node, ()),
+    "save_analyst_report": (save_analyst_report_node, ("analyst",)),
+    "researcher": (researcher_agent_node, ("save_analyst_report",)),
+    "curator": (curator_agent_node, ("researcher",)),
+    "auditor": (auditor_agent_node, ()),
+    "save_auditor_report": (save_auditor_report_node, ("auditor",)),
+    "fixer": (fixer_agent_node, ("save_auditor_report",)),
+    "save_fixer_report": (save_fixer_report_node, ("fixer",)),
+    "join_branches": (join_maintenance_branches_node, ("curator", "save_fixer_report")),
+    "advisor": (advisor_agent_node, ("join_branches",)),
+    "save_advisor_report": (save_advisor_report_node, ("advisor",)),
+}
+
+# Nodes that route back to themselves until they are done, and their routers
+LOOPING_NODES = {"researcher": route_researcher}
+
+def add_edge_from(workflow: StateGraph, source: str, target: str):
+    """Adds an edge from `source` to `target`, letting a looping source repeat until it routes to 'done'."""
+    if source in LOOPING_NODES:
+        workflow.add_conditional_edges(source, LOOPING_NODES[source], {source: source, "done": target})
+    else:
+        workflow.add_edge(source, target)
+
+def add_dependency_graph(workflow: StateGraph, nodes: dict, serial: bool = False):
+    """
+    Adds nodes declared as {name: (node, dependencies)} to the workflow.
+
+    Nodes without dependencies start the run, a node with several dependencies waits for all of
+    them (fan-in), and nodes that nothing depends on end it. With `serial`, the nodes run one
+    after another in their declared order instead, which is easier to follow when debugging.
+    """
+    for name, (node, dependencies) in nodes.items():
+        unknown = [dependency for dependency in dependencies if dependency not in nodes]
+        if unknown:
+            raise ValueError(f"Node '{name}' depends on unknown nodes {unknown}")
+        add_traced_node(workflow, name, node)
+
+    if serial:
+        order = list(nodes)
+        workflow.add_edge(START, order[0])
+        for source, target in zip(order, order[1:]):
+            add_edge_from(workflow, source, target)
+        add_edge_from(workflow, order[-1], END)
+        return
 
-def create_knowledge_agent_graph(task: str, all_tools: list):
-    """Creates the Knowledge Agent as a LangGraph StateGraph."""
+    dependents = {dependency for _, dependencies in nodes.values() for dependency in dependencies}
+    for name, (_, dependencies) in nodes.items():
+        if not dependencies:
+            workflow.add_edge(START, name)
+        elif len(dependencies) == 1:
+            add_edge_from(workflow, dependencies[0], name)
+        else:
+            looping = [dependency for dependency in dependencies if dependency in LOOPING_NODES]
+            if looping:
+                raise ValueError(f"Node '{name}' cannot wait for looping nodes {looping} together with other nodes")
+            workflow.add_edge(list(dependencies), name)
+        if name not in dependents:
+            add_edge_from(workflow, name, END)
+
+def create_knowledge_agent_graph(task: str, checkpointer=None, serial: bool = False):
+    """
+    Creates the Knowledge Agent as a LangGraph StateGraph, checkpointed with `checkpointer` if given.
+
+    The maintenance workflow runs its independent branches concurrently unless `serial` is set.
+    """
     
     workflow = StateGraph(AgentState)
     
     # Define the workflow based on the task
     
     if task == "maintenance":
-        # Full workflow with loops for each agent
-        workflow.add_node("analyst", analyst_agent_node)
-        workflow.add_node("save_analyst_report", save_analyst_report_node)
-        workflow.add_node("researcher", researcher_agent_node)
-        workflow.add_node("curator", curator_agent_node)
-        workflow.add_node("auditor", auditor_agent_node)
-        workflow.add_node("save_auditor_report", save_auditor_report_node)
-        workflow.add_node("fixer", fixer_agent_node)
-        workflow.add_node("save_fixer_report", save_fixer_report_node)
-        workflow.add_node("advisor", advisor_agent_node)
-        workflow.add_node("save_advisor_report", save_advisor_report_node)
-
-        workflow.set_entry_point("analyst")
-        workflow.add_edge("analyst", "save_analyst_report")
-        workflow.add_edge("save_analyst_report", "researcher")
-        workflow.add_edge("researcher", "curator")
-        workflow.add_edge("curator", "auditor")
-        workflow.add_edge("auditor", "save_auditor_report")
-        workflow.add_edge("save_auditor_report", "fixer")
-        workflow.add_edge("fixer", "save_fixer_report")
-        workflow.add_edge("save_fixer_report", "advisor")
-        workflow.add_edge("advisor", "save_advisor_report")
-        workflow.add_edge("save_advisor_report", END)
+        # Research/curation and audit/fix run as concurrent branches joined before the advisor
+        add_dependency_graph(workflow, MAINTENANCE_NODES, serial=serial)
 
     elif task == "analyze":
-        workflow.add_node("analyst", analyst_agent_node)
-        workflow.add_node("save_analyst_report", save_analyst_report_node)
+        add_traced_node(workflow, "analyst", analyst_agent_node)
+        add_traced_node(workflow, "save_analyst_report", save_analyst_report_node)
 
         workflow.set_entry_point("analyst")
         workflow.add_edge("analyst", "save_analyst_report")
         workflow.add_edge("save_analyst_report", END)
     
     elif task == "research":
-        workflow.add_node("researcher", researcher_agent_node)
+        add_traced_node(workflow, "researcher", researcher_agent_node)
         
         workflow.set_entry_point("researcher")
-        workflow.add_edge("researcher", END)
+        workflow.add_conditional_edges("researcher", route_researcher, {"researcher": "researcher", "done": END})
     
     elif task == "curate":
-        workflow.add_node("curator", curator_agent_node)
+        add_traced_node(workflow, "curator", curator_agent_node)
         
         workflow.set_entry_point("curator")
         workflow.add_edge("curator", END)
 
     elif task == "audit":
-        workflow.add_node("auditor", auditor_agent_node)
-        workflow.add_node("save_auditor_report", save_auditor_report_node)        
+        add_traced_node(workflow, "auditor", auditor_agent_node)
+        add_traced_node(workflow, "save_auditor_report", save_auditor_report_node)        
         
         workflow.set_entry_point("auditor")
         workflow.add_edge("auditor", "save_auditor_report")
         workflow.add_edge("save_auditor_report", END)
     
     elif task == "fix":
-        workflow.add_node("fixer", fixer_agent_node)
-        workflow.add_node("save_fixer_report", save_fixer_report_node)
+        add_traced_node(workflow, "fixer", fixer_agent_node)
+        add_traced_node(workflow, "save_fixer_report", save_fixer_report_node)
                 
         workflow.set_entry_point("fixer")
         workflow.add_edge("fixer", "save_fixer_report")
         workflow.add_edge("save_fixer_report", END)
     
     elif task == "advise":
-        workflow.add_node("advisor", advisor_agent_node)
-        workflow.add_node("save_advisor_report", save_advisor_report_node)
+        add_traced_node(workflow, "advisor", advisor_agent_node)
+        add_traced_node(workflow, "save_advisor_report", save_advisor_report_node)
 
         workflow.set_entry_point("advisor")
         workflow.add_edge("advisor", "save_advisor_report")
         workflow.add_edge("save_advisor_report", END)
 
+    elif task == "refresh":
+        add_traced_node(workflow, "refresher", refresher_node)
+
+        workflow.set_entry_point("refresher")
+        workflow.add_edge("refresher", END)
+
     # Compile the graph
-    app = workflow.compile()
+    app = workflow.compile(checkpointer=checkpointer)
     return app
\ No newline at end of file
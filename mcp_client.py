@@ -0,0 +1,294 @@
+# mcp_client.py
+import asyncio
+import bisect
+import copy
+import json
+import logging
+import os
+import random
+import time
+from langchain_core.tools import StructuredTool, ToolException
+from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_mcp_adapters.tools import load_mcp_tools
+from tracing import span, current_span
+
+logger = logging.getLogger('KnowledgeAgent')
+
+DEFAULT_TOOL_TIMEOUT = 120.0
+DEFAULT_TOOL_RETRIES = 2
+DEFAULT_RETRY_BACKOFF = 1.0
+DEFAULT_SERVER_START_TIMEOUT = 60.0
+
+# Tools retried after a timeout or connection failure: reads only. A timed-out call may still have been
+# applied by the server, so repeating an insert, update or deletion could apply it twice; a server's
+# `retry` list in mcp.json adds tools to this set.
+DEFAULT_RETRY_TOOLS = frozenset({
+    "query", "graphs_get", "graph_labels", "graph_entity_exists", "documents_pipeline_status", "documents_track_status",
+    "google_search", "fetch", "list_allowed_directories", "list_directory", "search_files", "read_text_file",
+})
+
+# Upper bounds (seconds) of the tool latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, float("inf"))
+
+
+class ToolMetrics:
+    """Call counts and a latency histogram for one MCP tool."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.retries = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+
+    def observe(self, seconds: float):
+        self.calls += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def percentile(self, fraction: float) -> float:
+        """Returns the upper bound of the bucket holding the given fraction of calls."""
+        target = fraction * self.calls
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            seen += count
+            if count and seen >= target:
+                return min(bound, self.max_seconds)
+        return self.max_seconds
+
+    def to_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "retries": self.retries,
+            "mean_seconds": round(self.total_seconds / self.calls, 3) if self.calls else 0.0,
+            "p50_seconds": round(self.percentile(0.5), 3),
+            "p95_seconds": round(self.percentile(0.95), 3),
+            "max_seconds": round(self.max_seconds, 3),
+            "histogram": {("inf" if bound == float("inf") else str(bound)): count for bound, count in zip(LATENCY_BUCKETS, self.buckets)},
+        }
+
+
+class MCPServerSession:
+    """
+    One long-lived session with an MCP server.
+
+    The session is held open by a background task, so it can be opened from one graph node and
+    closed from another; `restart()` replaces a broken session with a fresh one.
+    """
+
+    def __init__(self, client: MultiServerMCPClient, server_name: str, start_timeout: float):
+        self.client = client
+        self.server_name = server_name
+        self.start_timeout = start_timeout
+        self.generation = 0
+        self.tools = {}
+        self._task = None
+        self._stop = None
+        self._lock = asyncio.Lock()
+
+    async def _hold(self, ready: asyncio.Future, stop: asyncio.Event):
+        try:
+            async with self.client.session(self.server_name) as session:
+                tools = await load_mcp_tools(session)
+                ready.set_result({tool.name: tool for tool in tools})
+                await stop.wait()
+        except BaseException as e:
+            if not ready.done():
+                ready.set_exception(e)
+            elif not isinstance(e, asyncio.CancelledError):
+                logger.warning(f"MCP session for '{self.server_name}' closed with an error: {e}")
+
+    async def _open(self):
+        ready = asyncio.get_running_loop().create_future()
+        self._stop = asyncio.Event()
+        self._task = asyncio.create_task(self._hold(ready, self._stop))
+        self.tools = await asyncio.wait_for(ready, self.start_timeout)
+        self.generation += 1
+
+    async def _close(self):
+        if self._task is None:
+            return
+        self._stop.set()
+        try:
+            await asyncio.wait_for(self._task, 10)
+        except Exception:
+            self._task.cancel()
+        self._task = None
+
+    async def start(self) -> dict:
+        """Opens the session on first use and returns its tools by name."""
+        async with self._lock:
+            if self._task is None:
+                await self._open()
+        return self.tools
+
+    async def restart(self, generation: int):
+        """Reopens the session, unless another caller already replaced the given generation."""
+        async with self._lock:
+            if self.generation != generation and self._task is not None:
+                return
+            logger.warning(f"Reconnecting to MCP server '{self.server_name}'...")
+            await self._close()
+            await self._open()
+
+    async def close(self):
+        async with self._lock:
+            await self._close()
+
+
+class MCPToolProvider:
+    """
+    Starts MCP servers lazily and hands out their tools by name.
+
+    Each server entry in `mcp.json` may declare the tool names it provides under a `tools` key.
+    A server is only started the first time a node asks for one of its tools, and only if the
+    workflow allows that tool. Servers without a `tools` key are started only when a requested
+    tool is not declared by any server.
+
+    Every server gets one long-lived session that all of its tools share. Tool calls are bounded
+    by a per-tool timeout (MCP_TOOL_TIMEOUT, overridable per tool with a server's `timeouts` map)
+    and their latencies are recorded in `metrics`. Reads (DEFAULT_RETRY_TOOLS and the tools in a
+    server's `retry` list) are retried with exponential backoff on timeouts and connection failures;
+    other tools fail on the first, since the server may have applied the call anyway.
+    """
+
+    def __init__(self, config: dict, allowed_tools=None):
+        connections = copy.deepcopy(config)
+        self.server_tools = {name: set(connection.pop("tools", None) or []) for name, connection in connections.items()}
+        self.tool_timeouts = {}
+        self.retry_tools = set(DEFAULT_RETRY_TOOLS)
+        for connection in connections.values():
+            self.tool_timeouts.update(connection.pop("timeouts", None) or {})
+            self.retry_tools.update(connection.pop("retry", None) or [])
+        self.allowed_tools = set(allowed_tools) if allowed_tools is not None else None
+        self.default_timeout = float(os.environ.get("MCP_TOOL_TIMEOUT", DEFAULT_TOOL_TIMEOUT))
+        self.retries = int(os.environ.get("MCP_TOOL_RETRIES", DEFAULT_TOOL_RETRIES))
+        self.backoff = float(os.environ.get("MCP_RETRY_BACKOFF", DEFAULT_RETRY_BACKOFF))
+        start_timeout = float(os.environ.get("MCP_SERVER_START_TIMEOUT", DEFAULT_SERVER_START_TIMEOUT))
+
+        self.client = MultiServerMCPClient(connections)
+        self.sessions = {name: MCPServerSession(self.client, name, start_timeout) for name in connections}
+        self.metrics = {}
+        self._tools = {}
+
+    def servers_for(self, tool_names) -> list:
+        """Returns the servers that need to run to provide `tool_names`."""
+        tool_names = set(tool_names)
+        servers = [name for name, tools in self.server_tools.items() if tools & tool_names]
+        declared = set().union(*self.server_tools.values()) if self.server_tools else set()
+        if tool_names - declared:
+            servers.extend(name for name, tools in self.server_tools.items() if not tools)
+        return servers
+
+    async def _start_server(self, server_name: str) -> list:
+        """Starts a server on first use and returns managed wrappers around its tools."""
+        session = self.sessions[server_name]
+        if server_name not in self._tools:
+            start = time.perf_counter()
+            with span(f"mcp_server:{server_name}", kind="mcp"):
+                session_tools = await session.start()
+            if server_name not in self._tools:
+                self._tools[server_name] = [self._wrap_tool(server_name, tool) for tool in session_tools.values()]
+                logger.info(f"Started MCP server '{server_name}' with {len(session_tools)} tools in {time.perf_counter() - start:.2f}s.")
+        return self._tools[server_name]
+
+    def _wrap_tool(self, server_name: str, tool: StructuredTool) -> StructuredTool:
+        """Returns a tool with the same schema whose calls go through `_call_tool`."""
+        async def call_tool(**arguments):
+            with span(f"mcp:{tool.name}", kind="mcp", server=server_name):
+                return await self._call_tool(server_name, tool.name, arguments)
+
+        return StructuredTool(
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            coroutine=call_tool,
+            response_format=tool.response_format,
+            metadata=tool.metadata,
+        )
+
+    async def _call_tool(self, server_name: str, tool_name: str, arguments: dict):
+        """Calls a tool on the server's session with a deadline, retrying reads with backoff on timeouts and connection failures."""
+        session = self.sessions[server_name]
+        timeout = float(self.tool_timeouts.get(tool_name, self.default_timeout))
+        metrics = self.metrics.setdefault(tool_name, ToolMetrics())
+        retries = self.retries if tool_name in self.retry_tools else 0
+
+        active_span = current_span()
+        for attempt in range(retries + 1):
+            if active_span is not None:
+                active_span.set_attribute("attempts", attempt + 1)
+            generation = session.generation
+            start = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(session.tools[tool_name].coroutine(**arguments), timeout)
+                metrics.observe(time.perf_counter() - start)
+                return result
+            except ToolException:
+                # The server ran the call and reported an error; retrying would not change that
+                metrics.observe(time.perf_counter() - start)
+                metrics.errors += 1
+                raise
+            except asyncio.TimeoutError:
+                metrics.observe(time.perf_counter() - start)
+                metrics.timeouts += 1
+                error = ToolException(f"Tool '{tool_name}' timed out after {timeout:g}s.")
+            except Exception as e:
+                metrics.observe(time.perf_counter() - start)
+                metrics.errors += 1
+                error = e
+                try:
+                    await session.restart(generation)
+                except Exception as restart_error:
+                    logger.error(f"Could not reconnect to MCP server '{server_name}': {restart_error}")
+
+            if attempt == retries:
+                raise error
+            metrics.retries += 1
+            delay = self.backoff * (2 ** attempt) * (1 + random.random() / 2)
+            logger.warning(f"Tool '{tool_name}' failed ({error!r}); retrying in {delay:.1f}s (attempt {attempt + 2} of {retries + 1}).")
+            await asyncio.sleep(delay)
+
+    async def get_tools(self, tool_names) -> list:
+        """Returns the tools named in `tool_names` that this workflow allows, starting their servers if needed."""
+        tool_names = [name for name in tool_names if self.allowed_tools is None or name in self.allowed_tools]
+        servers = self.servers_for(tool_names)
+        server_tools = await asyncio.gather(*(self._start_server(server) for server in servers))
+
+        tools = {}
+        for tool_list in server_tools:
+            for tool in tool_list:
+                if tool.name in tool_names and tool.name not in tools:
+                    tools[tool.name] = tool
+        return list(tools.values())
+
+    @property
+    def started_servers(self) -> list:
+        """Returns the names of the servers started so far."""
+        return list(self._tools)
+
+    def metrics_summary(self) -> dict:
+        """Returns the call counts and latency histogram of every tool called so far."""
+        return {name: metrics.to_dict() for name, metrics in sorted(self.metrics.items())}
+
+    def log_metrics(self):
+        for name, summary in self.metrics_summary().items():
+            histogram = summary.pop("histogram")
+            logger.info(f"MCP tool '{name}': {summary}, latency histogram: {histogram}")
+
+    async def aclose(self):
+        """Closes every open server session."""
+        await asyncio.gather(*(session.close() for session in self.sessions.values()), return_exceptions=True)
+
+
+def get_mcp_provider(allowed_tools=None, config_path: str = None) -> MCPToolProvider:
+    """Reads the MCP server configuration (MCP_CONFIG_PATH, default mcp.json) and returns a provider limited to `allowed_tools`."""
+    config_path = config_path or os.environ.get("MCP_CONFIG_PATH", "mcp.json")
+    with open(config_path, 'r') as f:
+        mcp_server_config = json.load(f)
+    return MCPToolProvider(mcp_server_config, allowed_tools)
@@ -0,0 +1,35 @@
+# mcp_utils.py
+"""
+Helpers for calling MCP tools directly, without an LLM: mapping argument values onto the names a
+tool declares, and parsing its JSON responses.
+"""
+from db_utils import extract_and_clean_json
+
+
+def build_tool_args(tool, arguments: dict, values: dict) -> dict:
+    """
+    Maps canonical argument values onto the argument names the MCP tool actually declares.
+
+    `arguments` maps each canonical name to its accepted argument names, in order of preference; the
+    first canonical argument is required, so it falls back to its preferred name if none is declared.
+    """
+    declared = set(getattr(tool, "args", {}) or {})
+    tool_args = {}
+    for canonical, aliases in arguments.items():
+        if canonical not in values:
+            continue
+        name = next((alias for alias in aliases if alias in declared), None)
+        if name is None and canonical == next(iter(arguments)):
+            # The primary argument is required, so fall back to its preferred name
+            name = aliases[0]
+        if name is not None:
+            tool_args[name] = values[canonical]
+    return tool_args
+
+
+def parse_json_response(raw_response):
+    """Parses a JSON tool response, returning None if it is not JSON."""
+    try:
+        return extract_and_clean_json(raw_response) if isinstance(raw_response, str) else raw_response
+    except ValueError:
+        return None
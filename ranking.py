@@ -0,0 +1,75 @@
+# ranking.py
+import math
+import re
+from collections import Counter
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below between both
+but by can could did do does doing down during each few for from further had has have having he her here hers
+him his how i if in into is it its itself just me more most my no nor not now of off on once only or other our
+ours out over own same she should so some such than that the their theirs them then there these they this those
+through to too under until up very was we were what when where which while who whom why will with would you your
+""".split())
+
+
+def _stem(token: str) -> str:
+    """Strips a plural 's' so that e.g. 'tariffs' and 'tariff' match."""
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> list:
+    """Lowercases text and splits it into word tokens, dropping stopwords and single characters."""
+    return [_stem(token) for token in TOKEN_PATTERN.findall((text or "").lower()) if len(token) > 1 and token not in STOPWORDS]
+
+
+def research_topic_query(research_topic: dict) -> str:
+    """Builds the lexical query for a research topic from its title, summary and key questions."""
+    parts = [research_topic.get("title", ""), research_topic.get("summary", "")]
+    parts.extend(research_topic.get("key_questions", []) or [])
+    return " ".join(str(part) for part in parts if part)
+
+
+class BM25Index:
+    """
+    Okapi BM25 index over a small set of keyed documents.
+
+    Used to score search results against a research topic locally, so obvious misses can be
+    pruned before the results are sent to an LLM.
+    """
+
+    def __init__(self, documents: dict, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_frequencies = {key: Counter(tokenize(text)) for key, text in documents.items()}
+        self.document_lengths = {key: sum(tf.values()) for key, tf in self.term_frequencies.items()}
+        self.average_length = (sum(self.document_lengths.values()) / len(self.document_lengths)) if self.document_lengths else 0.0
+
+        document_frequencies = Counter()
+        for tf in self.term_frequencies.values():
+            document_frequencies.update(tf.keys())
+        count = len(self.term_frequencies)
+        self.idf = {
+            term: math.log(1 + (count - df + 0.5) / (df + 0.5))
+            for term, df in document_frequencies.items()
+        }
+
+    def scores(self, query: str, keys: list) -> dict:
+        """Returns the BM25 score of each document in `keys` for `query`; unknown documents score 0.0."""
+        query_terms = set(tokenize(query))
+        return {key: self._score(query_terms, key) for key in keys}
+
+    def _score(self, query_terms: set, key) -> float:
+        tf = self.term_frequencies.get(key)
+        if not tf or not self.average_length:
+            return 0.0
+
+        length_norm = self.k1 * (1 - self.b + self.b * self.document_lengths[key] / self.average_length)
+        score = 0.0
+        for term in query_terms:
+            frequency = tf.get(term)
+            if frequency:
+                score += self.idf[term] * frequency * (self.k1 + 1) / (frequency + length_norm)
+        return score
@@ -1,25 +1,19 @@
 # run.py
+import time
+
+# Taken before any other import so that time-to-first-node covers the whole startup
+PROCESS_STARTED_AT = time.perf_counter()
+
 import asyncio
 import logging
 import json
 from datetime import datetime
-from zoneinfo import ZoneInfo
 import os
+import sys
 import argparse
-from langchain_openai.chat_models import ChatOpenAI
-from langchain_core.messages import HumanMessage
-from knowledge_agent import get_mcp_tools, create_knowledge_agent_graph
-from dotenv import load_dotenv
-from db_utils import create_tables
-from terminal_utils import print_colorful_break
-
-# Load environment variables from .env file
-load_dotenv()
-
-# Create the tables if they don't exist
-create_tables()
+from tracing import current_trace_context, span, start_trace, stop_trace
 
-# Create a custom JSON formatter
+# Create a custom JSON formatter; file log records carry the IDs of the span they were logged in
 class JsonFormatter(logging.Formatter):
     def format(self, record):
         log_record = {
@@ -29,31 +23,35 @@ class JsonFormatter(logging.Formatter):
             "message": record.getMessage(),
             "module": record.module,
             "funcName": record.funcName,
-            "lineno": record.lineno
+            "lineno": record.lineno,
+            **current_trace_context()
         }
         return json.dumps(log_record)
 
-# Create a logs directory if it doesn't exist
-if not os.path.exists('logs'):
-    os.makedirs('logs')
-
-# Configure the logger
-log_file = f"logs/knowledge_agent_run_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(log_file, mode="w"),
-        logging.StreamHandler()
-    ]
-)
-
 # Get a specific logger for our application's own messages
 logger = logging.getLogger('KnowledgeAgent')
 
 
-async def main():
-    print_colorful_break("KNOWLEDGE AGENT INITIALIZING")
+def setup_logging():
+    """Configures logging to the console and to a per-run file in the logs directory."""
+    # Create a logs directory if it doesn't exist
+    if not os.path.exists('logs'):
+        os.makedirs('logs')
+
+    log_file = f"logs/knowledge_agent_run_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
+    file_handler = logging.FileHandler(log_file, mode="w")
+    file_handler.setFormatter(JsonFormatter())
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        handlers=[
+            file_handler,
+            logging.StreamHandler()
+        ]
+    )
+
+
+def parse_args(argv=None):
     parser = argparse.ArgumentParser(description="Run the Knowledge Agent with a specific workflow.")
     parser.add_argument("--maintenance", action="store_true", help="Run the full maintenance workflow.")
     parser.add_argument("--analyze", action="store_true", help="Run the analysis workflow.")
@@ -62,9 +60,18 @@ async def main():
     parser.add_argument("--audit", action="store_true", help="Run the audit workflow.")
     parser.add_argument("--fix", action="store_true", help="Run the fix workflow.")
     parser.add_argument("--advise", action="store_true", help="Run the advise workflow.")
+    parser.add_argument("--refresh", action="store_true", help="Run the refresh workflow: re-fetch the stored documents most in need of it.")
+    parser.add_argument("--resume", metavar="RUN_ID", help="Resume a previous run from its last checkpoint.")
+    parser.add_argument("--daemon", action="store_true", help="Keep running with warm resources, running workflows on DAEMON_SCHEDULE or on request over the local API.")
+    parser.add_argument("--worker", action="store_true", help="Run fetch and summarize jobs from the job queue until stopped.")
+    parser.add_argument("--serial", action="store_true", help="Run the maintenance branches one after another instead of concurrently (for debugging).")
+    parser.add_argument("--dry-run", action="store_true", help="Let the fixer report the changes its plan would make without applying them (same as FIX_DRY_RUN=true).")
+
+    return parser.parse_args(argv)
 
-    args = parser.parse_args()
 
+def get_task(args) -> str:
+    """Returns the workflow selected on the command line."""
     task = "maintenance"  # Default task
     if args.analyze:
         task = "analyze"
@@ -78,46 +85,161 @@ async def main():
         task = "fix"
     elif args.advise:
         task = "advise"
+    elif args.refresh:
+        task = "refresh"
+    return task
+
+
+async def run_workflow(task: str, model, resume_run_id: str = None, started_at: float = PROCESS_STARTED_AT, serial: bool = False, mcp_provider=None, interactive: bool = False) -> dict | None:
+    """
+    Runs (or resumes) one workflow with the given chat model and returns its final state.
+    With `serial`, the concurrent branches of the maintenance workflow run one after another.
+    An `mcp_provider` passed in (the daemon's warm one for this workflow) is used as is and left
+    open; otherwise one is created for the run and closed at the end. Only an `interactive` run may
+    prompt at the terminal, e.g. for the Fixer's approval.
+
+    Returns None if the run to resume is unknown or already complete.
+    """
+    from zoneinfo import ZoneInfo
+    from langchain_core.messages import HumanMessage
+    from knowledge_agent import get_workflow_mcp_provider, create_knowledge_agent_graph
+    from agent_registry import get_registry
+    from callbacks import FirstNodeTimer, TracingCallbackHandler
+    from usage import UsageCollector
+    from checkpointing import open_checkpointer, make_run_id, get_run_config, load_run_state
+    from runtime import AgentRuntime
+    from db_utils import migrate_database
+
+    owns_mcp_provider = mcp_provider is None
+    usage_collector = UsageCollector()
+    callbacks = [FirstNodeTimer(started_at), TracingCallbackHandler(), usage_collector]
+    run_id = None
+    try:
+        # Bring the database schema up to date; a single version check when it already is
+        applied_migrations = migrate_database()
+        if applied_migrations:
+            logger.info(f"Applied database migrations: {applied_migrations}")
+
+        # Load and validate every prompt once for this process
+        prompt_versions = get_registry().load_all()
+        logger.info(f"Loaded prompts: {prompt_versions}")
+
+        async with open_checkpointer() as checkpointer:
+            if resume_run_id:
+                run_id = resume_run_id
+                saved_state = await load_run_state(checkpointer, run_id)
+                if not saved_state:
+                    logger.error(f"No checkpoint found for run ID: {run_id}")
+                    return None
+                task = saved_state.get("task", task)
+
+                # 1. MCP servers are started lazily, only for the tools this task uses
+                mcp_provider = mcp_provider or get_workflow_mcp_provider(task)
+                runtime = AgentRuntime(model, mcp_provider, logger, interactive=interactive)
+                config = {**get_run_config(run_id, runtime), "callbacks": callbacks}
+
+                # 2. Rebuild the graph for the original task; the runtime objects are passed in
+                # the config, so the checkpointed state can be continued as is
+                app = create_knowledge_agent_graph(task, checkpointer=checkpointer, serial=serial)
+                snapshot = await app.aget_state(config)
+                if not snapshot.next:
+                    logger.info(f"Run {run_id} already completed with status: {saved_state.get('status')}")
+                    return None
+
+                logger.info(f"--- Resuming run {run_id} for task: {task} at node(s): {list(snapshot.next)} ---")
+                trace_file = start_trace(run_id)
+                with span(f"run:{task}", kind="run", run_id=run_id, resumed=True):
+                    final_state = await app.ainvoke(None, config)
+            else:
+                run_timestamp = datetime.now(ZoneInfo("America/Los_Angeles")).isoformat()
+                run_id = make_run_id(run_timestamp, task)
+
+                # 1. MCP servers are started lazily, only for the tools this task uses
+                mcp_provider = mcp_provider or get_workflow_mcp_provider(task)
+                runtime = AgentRuntime(model, mcp_provider, logger, interactive=interactive)
+                config = {**get_run_config(run_id, runtime), "callbacks": callbacks}
+
+                # 2. Build the graph for the task
+                app = create_knowledge_agent_graph(task, checkpointer=checkpointer, serial=serial)
+
+                # 3. Initialize the state with the messages list and the first message
+                initial_state = {
+                    "messages": [HumanMessage(content="Your task is to identify knowledge gaps in the LightRAG knowledge base. Begin now.")],
+                    "task": task,
+                    "run_id": run_id,
+                    "status": f"Starting '{task}' workflow.",
+                    "timestamp": run_timestamp,
+                }
+
+                logger.info(f"--- Invoking graph for task: {task} (run ID: {run_id}, resume with --resume {run_id}) ---")
+
+                trace_file = start_trace(run_id)
+                with span(f"run:{task}", kind="run", run_id=run_id, resumed=False):
+                    final_state = await app.ainvoke(initial_state, config)
+
+        logger.info("--- Workflow Complete ---")
+        logger.info(f"Final Status: {final_state['status']}")
+        logger.info(f"Trace written to {trace_file}; print its critical path with: python tracing.py {run_id}")
+        return final_state
+
+    finally:
+        if mcp_provider:
+            mcp_provider.log_metrics()
+            if owns_mcp_provider:
+                await mcp_provider.aclose()
+            else:
+                # Keep the sessions warm, but report each run's tool metrics separately
+                mcp_provider.metrics.clear()
+        if run_id:
+            usage_collector.log_summary()
+            try:
+                usage_collector.flush(run_id)
+            except Exception as e:
+                logger.error(f"Failed to record LLM usage for run {run_id}: {e}")
+        stop_trace()
+
+
+async def main():
+    args = parse_args()
+
+    # Heavy imports are deferred until the arguments are known, so e.g. --help returns immediately
+    from dotenv import load_dotenv
+    from langchain_openai.chat_models import ChatOpenAI
+    from terminal_utils import print_colorful_break
 
+    # Load environment variables from .env file
+    load_dotenv()
+    setup_logging()
+    print_colorful_break("KNOWLEDGE AGENT INITIALIZING")
+
+    task = get_task(args)
     logger.info(f"Initializing Knowledge Agent for task: {task}...")
+    if args.dry_run:
+        os.environ["FIX_DRY_RUN"] = "true"
 
     try:
-        # 1. Load tools asynchronously
-        mcp_tools = await get_mcp_tools()
-
         model = ChatOpenAI(
             model=os.environ.get("OPENAI_MODEL_NAME", "chat"),
             base_url=os.environ.get("OPENAI_BASE_URL", "http://localhost:8001/v1"),
             temperature=0.6,
             top_p=0.6,
         )
-        
-        # 2. Pass tools into the graph creation function
-        app = create_knowledge_agent_graph(task, mcp_tools)
-
-        run_timestamp = datetime.now(ZoneInfo("America/Los_Angeles")).isoformat()
-
-        # 3. Initialize the state with the messages list and the first message
-        initial_state = {
-            "messages": [HumanMessage(content="Your task is to identify knowledge gaps in the LightRAG knowledge base. Begin now.")],
-            "task": task,
-            "status": f"Starting '{task}' workflow.",
-            "timestamp": run_timestamp,
-            "mcp_tools": mcp_tools,
-            "model": model,
-            "logger": logger
-        }
-        
-        logger.info(f"--- Invoking graph for task: {task} ---")
-        
-        final_state = await app.ainvoke(initial_state)
 
-        logger.info("--- Workflow Complete ---")
-        logger.info(f"Final Status: {final_state['status']}")
-        print_colorful_break("KNOWLEDGE AGENT RUN COMPLETE")
+        if args.daemon:
+            from daemon import serve
+            await serve(model, serial=args.serial)
+            return
+        if args.worker:
+            from job_queue import run_worker
+            await run_worker(model)
+            return
+
+        final_state = await run_workflow(task, model, resume_run_id=args.resume, serial=args.serial, interactive=sys.stdin.isatty())
+        if final_state is not None:
+            print_colorful_break("KNOWLEDGE AGENT RUN COMPLETE")
 
     finally:
         logging.shutdown()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,33 @@
+# runtime.py
+"""
+Live dependencies of a graph run: the chat model, the MCP tool provider, the logger, and whether
+a person at a terminal can answer prompts.
+
+They are passed to the nodes through the run config (`config["configurable"]["runtime"]`)
+rather than the graph state, so checkpoints only hold small serializable data and a resumed
+run simply gets fresh ones.
+"""
+import logging
+
+RUNTIME_KEY = "runtime"
+
+
+class AgentRuntime:
+    """The runtime objects shared by every node of a run."""
+
+    __slots__ = ("model", "mcp_provider", "logger", "interactive")
+
+    def __init__(self, model, mcp_provider, logger: logging.Logger = None, interactive: bool = False):
+        self.model = model
+        self.mcp_provider = mcp_provider
+        self.logger = logger or logging.getLogger('KnowledgeAgent')
+        # Only a run started from the CLI with stdin on a terminal may prompt, e.g. for approval
+        self.interactive = interactive
+
+
+def get_runtime(config) -> AgentRuntime:
+    """Returns the runtime objects a node was invoked with."""
+    runtime = (config or {}).get("configurable", {}).get(RUNTIME_KEY)
+    if runtime is None:
+        raise KeyError(f"The run config has no '{RUNTIME_KEY}'; invoke the graph with get_run_config(run_id, runtime)")
+    return runtime
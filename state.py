@@ -1,19 +1,40 @@
 # state.py
 from typing import TypedDict, List, Optional, Annotated
 from langchain_core.messages import BaseMessage
-import operator
+
+# Messages kept in the state: the initial task message plus the most recent ones
+MAX_MESSAGES = 20
+
+def append_messages(existing: List[BaseMessage], new: List[BaseMessage]) -> List[BaseMessage]:
+    """
+    Reducer for `messages`: nodes return only their new messages, which are appended. The history
+    is bounded to the first (task) message and the latest MAX_MESSAGES - 1, so it cannot grow
+    with the length of a run.
+    """
+    merged = list(existing or []) + list(new or [])
+    if len(merged) <= MAX_MESSAGES:
+        return merged
+    return merged[:1] + merged[-(MAX_MESSAGES - 1):]
+
+def latest_status(existing: str, new: str) -> str:
+    """
+    Reducer for `status`: the latest update wins. Concurrent branches of the maintenance graph may
+    both report a status in the same step, which a plain field would reject.
+    """
+    return new if new is not None else existing
 
 class AgentState(TypedDict):
     """
     Represents the state of the agent graph.
+
+    Only small, serializable values are kept here, since every step is checkpointed. The model,
+    MCP tools and logger are passed to the nodes through the run config (see runtime.py).
     """
-    messages: Annotated[List[BaseMessage], operator.add]
+    messages: Annotated[List[BaseMessage], append_messages]
     task: str
-    status: str
+    run_id: str
+    status: Annotated[str, latest_status]
     timestamp: str
-    mcp_tools: List[any]
-    model: any
-    logger: any
 
     # Fields for the analyst agent's stateful workflow
     analyst_report_id: Optional[str]
@@ -23,6 +44,7 @@ class AgentState(TypedDict):
     researcher_report_id: Optional[str]
     researcher_gaps_todo: Optional[List[dict]]
     researcher_gaps_complete: Optional[List[str]]
+    researcher_gaps_failed: Optional[List[str]]
     researcher_report: Optional[str]
 
 
@@ -35,6 +57,7 @@ class AgentState(TypedDict):
     # Fields for the auditor agent's stateful workflow
     auditor_report_id: Optional[str]
     auditor_report: Optional[str]
+    auditor_duplicate_candidates: Optional[List[dict]]
 
     # Fields for the fixer agent's stateful workflow
     fixer_report_id: Optional[str]
@@ -1,56 +1,55 @@
 # advisor.py
-from langchain.agents import create_openai_tools_agent, AgentExecutor
-from langchain_core.prompts import ChatPromptTemplate
+from agent_registry import get_registry
 from langchain_core.tools import tool, ToolException
 from langchain_core.messages import AIMessage
 import json
 import os
 import re
+from langchain_core.runnables import RunnableConfig
 from state import AgentState
-from db_utils import load_latest_report, extract_and_clean_json
+from runtime import get_runtime
+from db_utils import extract_and_clean_json, save_advisor_report
+from tools import load_latest_report_tool
 from terminal_utils import print_colorful_break
 
-async def advisor_agent_node(state: AgentState):
+ADVISOR_TOOLS = ["list_allowed_directories", "list_directory", "search_files", "read_text_file"]
+
+async def advisor_agent_node(state: AgentState, config: RunnableConfig):
     print_colorful_break("ADVISOR")
-    logger = state['logger']
+    runtime = get_runtime(config)
+    logger = runtime.logger
     logger.info("--- Running Advisor Agent ---")
-    all_tools = state['mcp_tools']
-    model = state['model']
+    model = runtime.model
     timestamp = state['timestamp']
     
-    advisor_tools = [t for t in all_tools if t.name in ["list_allowed_directories", "list_directory", "search_files", "read_text_file"]] + [load_latest_report]
-    advisor_prompt = '''Your goal is to provide recommendations for systemic improvements.
-1.  **Analyze Reports**: Load and analyze `auditor_report.json` and `fixer_report.json`.
-2.  **Generate Recommendations**: Based on recurring patterns, generate actionable recommendations for ingestion prompts or server configuration.
-3.  **Compile Report**: Save a final report with your top 3-5 suggestions to `advisor_report.json`.'''
-
-    prompt = ChatPromptTemplate.from_template(advisor_prompt)
-    agent_executor = create_openai_tools_agent(model, advisor_tools, prompt)
+    advisor_tools = await runtime.mcp_provider.get_tools(ADVISOR_TOOLS) + [load_latest_report_tool]
+    agent_executor = get_registry().get_executor("advisor", model, advisor_tools)
     
     task_input = "Your task is to provide recommendations based on the latest audit and fix reports. Begin now."
 
     result = await agent_executor.ainvoke({"input": task_input, "timestamp": timestamp})
 
     logger.info(f"Advisor Agent finished with output: {result['output']}")
-    return {"messages": state['messages'] + [AIMessage(content=result['output'])]}
+    return {"advisor_report": result['output'], "status": "Advisor agent completed."}
 
-def save_advisor_report_node(state: AgentState):
-    """Saves the final report from the last AI message."""
-    logger = state['logger']
-    final_message_from_agent = state['messages'][-1]
+def save_advisor_report_node(state: AgentState, config: RunnableConfig):
+    """Saves the report written by the advisor agent."""
+    logger = get_runtime(config).logger
+    raw_report_content = state.get("advisor_report") or ""
 
-    status = f"--- Saving Advisor Report ---\n{final_message_from_agent.content}"
+    status = f"--- Saving Advisor Report ---\n{raw_report_content}"
     logger.info(status)
 
     try:
-        report_json = extract_and_clean_json(final_message_from_agent.content)
+        report_json = extract_and_clean_json(raw_report_content)
         if 'report_id' not in report_json:
-            report_json['report_id'] = state.get('advisor_report_id', 'unknown_id')
-        save_advisor_report({"advisor_report": json.dumps(report_json)})
+            timestamp = state['timestamp']
+            report_json['report_id'] = state.get('advisor_report_id') or f"adv_{timestamp.replace('-', '').replace(':', '').replace('T', '_').split('.')[0]}"
+        save_advisor_report(report_json)
         status = f"Successfully saved advisor report with ID {report_json.get('report_id')}"
         logger.info(status)
     except (ValueError, KeyError) as e:
         status = f"Error processing or saving advisor report: {e}"
         logger.error(status, exc_info=True)
 
-    return {"messages": state['messages'] + [AIMessage(content=status)]}
+    return {"status": status, "messages": [AIMessage(content=status)]}
@@ -1,30 +1,30 @@
 # sub_agents/analyst.py
-from langchain.agents import create_openai_tools_agent, AgentExecutor
-from langchain_core.prompts import ChatPromptTemplate
+from agent_registry import get_registry
+from langchain_core.runnables import RunnableConfig
 from state import AgentState
+from runtime import get_runtime
 from db_utils import save_analyst_report, extract_and_clean_json
+from graph_snapshot import use_graph_snapshot
 from terminal_utils import print_colorful_break
 
-async def analyst_agent_node(state: AgentState):
+ANALYST_TOOLS = ["query", "graphs_get", "graph_labels", "google_search", "fetch"]
+
+async def analyst_agent_node(state: AgentState, config: RunnableConfig):
     """Runs the analyst agent and returns its raw output and the new report ID."""
     print_colorful_break("ANALYST")
-    logger = state['logger']
+    runtime = get_runtime(config)
+    logger = runtime.logger
     timestamp = state['timestamp']
     report_id = f"ana_{timestamp.replace('-', '').replace(':', '').replace('T', '_').split('.')[0]}"
     status = f"Initialized analyst report with ID: {report_id}"
     logger.info(status)
 
-    with open("prompts/analyst_prompt.txt", "r") as f:
-        analyst_prompt_template = f.read()
-        
-    analyst_prompt = ChatPromptTemplate.from_template(analyst_prompt_template)    
-    analyst_tools = [t for t in state['mcp_tools'] if t.name in ["query", "graphs_get", "graph_labels", "google_search", "fetch"]]
+    analyst_tools = await use_graph_snapshot(await runtime.mcp_provider.get_tools(ANALYST_TOOLS), logger)
 
     status = f"Attempting to invoke analyst agent executor with tools: {analyst_tools}"
     logger.info(status)
     try:
-        agent_runnable = create_openai_tools_agent(state['model'], analyst_tools, analyst_prompt)
-        executor = AgentExecutor(agent=agent_runnable, tools=analyst_tools, verbose=True)
+        executor = get_registry().get_executor("analyst", runtime.model, analyst_tools)
     except Exception as e:
         status = f"Failed to create agent executor: {e}"
         logger.error(status, exc_info=True)
@@ -54,9 +54,9 @@ async def analyst_agent_node(state: AgentState):
         "status": status
     }
 
-def save_analyst_report_node(state: AgentState):
+def save_analyst_report_node(state: AgentState, config: RunnableConfig):
     """Saves the final report and updates the main status field."""
-    logger = state['logger']
+    logger = get_runtime(config).logger
     raw_report_content = state.get("analyst_report")
 
     report_id = state.get("analyst_report_id")
@@ -1,56 +1,85 @@
 # auditor.py
-from langchain.agents import create_openai_tools_agent, AgentExecutor
-from langchain_core.prompts import ChatPromptTemplate
+from agent_registry import get_registry
 from langchain_core.tools import tool, ToolException
 from langchain_core.messages import AIMessage
 import json
 import os
 import re
+from langchain_core.runnables import RunnableConfig
 from state import AgentState
-from db_utils import extract_and_clean_json
+from runtime import get_runtime
+from db_utils import extract_and_clean_json, save_auditor_report
+from graph_snapshot import use_graph_snapshot
+from audit_engine import load_entity_names, find_duplicate_candidates, describe_candidates, DEFAULT_MAX_CANDIDATES, DEFAULT_MIN_SIMILARITY, DEFAULT_MAX_BLOCK_SIZE, DEFAULT_DETAIL_CONCURRENCY
 from terminal_utils import print_colorful_break
 
-async def auditor_agent_node(state: AgentState):
+AUDITOR_TOOLS = ["graphs_get", "query", "graph_labels"]
+
+async def _duplicate_candidates(tools: dict, logger) -> list:
+    """Runs the audit engine over every entity in the graph and returns the best duplicate candidates with their details."""
+    if "graph_labels" not in tools:
+        logger.warning("graph_labels tool not found; the auditor will look for duplicates on its own.")
+        return []
+    max_candidates = int(os.environ.get("AUDIT_MAX_CANDIDATES", DEFAULT_MAX_CANDIDATES))
+    min_similarity = float(os.environ.get("AUDIT_MIN_SIMILARITY", DEFAULT_MIN_SIMILARITY))
+    max_block_size = int(os.environ.get("AUDIT_MAX_BLOCK_SIZE", DEFAULT_MAX_BLOCK_SIZE))
+    concurrency = int(os.environ.get("AUDIT_DETAIL_CONCURRENCY", DEFAULT_DETAIL_CONCURRENCY))
+
+    names = await load_entity_names(tools["graph_labels"])
+    candidates, stats = find_duplicate_candidates(names, min_similarity, max_block_size)
+    status = f"Audit engine found {stats['candidates']} duplicate candidates among {stats['entities']} entities ({stats['comparisons']} comparisons in {stats['blocks']} blocks, {stats['skipped_blocks']} oversized blocks skipped)."
+    logger.info(status)
+    candidates = candidates[:max_candidates]
+    if candidates and "graphs_get" in tools:
+        candidates = await describe_candidates(tools["graphs_get"], candidates, logger, concurrency)
+    return candidates
+
+async def auditor_agent_node(state: AgentState, config: RunnableConfig):
     print_colorful_break("AUDITOR")
-    logger = state['logger']
+    runtime = get_runtime(config)
+    logger = runtime.logger
     logger.info("--- Running Auditor Agent ---")
-    all_tools = state['mcp_tools']
-    model = state['model']
+    model = runtime.model
     timestamp = state['timestamp']
     
-    auditor_tools = [t for t in all_tools if t.name in ["graphs_get", "query"]]
-    auditor_prompt = '''Your goal is to review the LightRAG knowledge base for data quality issues.
-1.  **Identify issues**: Scan the graph for duplicates, irregular normalization, etc.
-2.  **Generate Report**: Create a report of your findings.
-3.  **Save Report**: Use `save_report` to save the findings to `auditor_report.json`.'''
+    auditor_tools = await use_graph_snapshot(await runtime.mcp_provider.get_tools(AUDITOR_TOOLS), logger)
+    agent_executor = get_registry().get_executor("auditor", model, [tool for tool in auditor_tools if tool.name != "graph_labels"])
 
-    prompt = ChatPromptTemplate.from_template(auditor_prompt)
-    agent_executor = create_openai_tools_agent(model, auditor_tools, prompt)
+    try:
+        candidates = await _duplicate_candidates({tool.name: tool for tool in auditor_tools}, logger)
+    except Exception as e:
+        logger.error(f"Audit engine failed, the auditor will look for duplicates on its own: {e}", exc_info=True)
+        candidates = []
 
     task_input = "Your task is to audit the knowledge base. Begin now."
+    if candidates:
+        task_input += f"\n\nDuplicate entity candidates found by the audit engine, best first:\n{json.dumps(candidates, indent=2)}"
 
     result = await agent_executor.ainvoke({"input": task_input, "timestamp": timestamp})
     
     logger.info(f"Auditor Agent finished with output: {result['output']}")
-    return {"messages": state['messages'] + [AIMessage(content=result['output'])]}
+    return {"auditor_report": result['output'], "auditor_duplicate_candidates": candidates, "status": "Auditor agent completed."}
 
-def save_auditor_report_node(state: AgentState):
-    """Saves the final report from the last AI message."""
-    logger = state['logger']
-    final_message_from_agent = state['messages'][-1]
+def save_auditor_report_node(state: AgentState, config: RunnableConfig):
+    """Saves the report written by the auditor agent."""
+    logger = get_runtime(config).logger
+    raw_report_content = state.get("auditor_report") or ""
 
-    status = f"--- Saving Auditor Report ---\n{final_message_from_agent.content}"
+    status = f"--- Saving Auditor Report ---\n{raw_report_content}"
     logger.info(status)
 
     try:
-        report_json = extract_and_clean_json(final_message_from_agent.content)
+        report_json = extract_and_clean_json(raw_report_content)
         if 'report_id' not in report_json:
-            report_json['report_id'] = state.get('auditor_report_id', 'unknown_id')
-        save_auditor_report({"auditor_report": json.dumps(report_json)})
+            timestamp = state['timestamp']
+            report_json['report_id'] = state.get('auditor_report_id') or f"aud_{timestamp.replace('-', '').replace(':', '').replace('T', '_').split('.')[0]}"
+        if state.get("auditor_duplicate_candidates"):
+            report_json.setdefault("duplicate_candidates", state["auditor_duplicate_candidates"])
+        save_auditor_report(report_json)
         status = f"Successfully saved auditor report with ID {report_json.get('report_id')}"
         logger.info(status)
     except (ValueError, KeyError) as e:
         status = f"Error processing or saving auditor report: {e}"
         logger.error(status, exc_info=True)
 
-    return {"messages": state['messages'] + [AIMessage(content=status)]}
+    return {"status": status, "messages": [AIMessage(content=status)]}
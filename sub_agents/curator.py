@@ -1,17 +1,143 @@
 # sub_agents/curator.py
-from langchain.agents import create_openai_tools_agent, AgentExecutor
-from langchain_core.prompts import ChatPromptTemplate
+import asyncio
+import os
+from agent_registry import get_registry
+from langchain_core.runnables import RunnableConfig
 from state import AgentState
-from db_utils import initialize_curator, update_curator_report, extract_and_clean_json
+from runtime import get_runtime
+from db_utils import initialize_curator, update_curator_report, record_search_ranking, get_document_summaries, get_ingestion_status, get_submitted_documents, extract_and_clean_json
+from ingestion import ingest_documents
+from ranking import BM25Index, research_topic_query, tokenize
 from terminal_utils import print_colorful_break
+from usage import usage_tags
 
-async def curator_agent_node(state: AgentState):
+SEARCH_RANKER_TOOLS = ["google_search", "fetch"]
+INGESTION_TOOLS = ["documents_insert_text", "documents_upload_files", "documents_pipeline_status", "documents_track_status"]
+CURATOR_TOOLS = SEARCH_RANKER_TOOLS + INGESTION_TOOLS
+
+DEFAULT_RANKING_CONCURRENCY = 4
+DEFAULT_PRERANK_MIN_SCORE = 1.0
+DEFAULT_PRERANK_TOP_K = 6
+
+def _build_prerank_index(searches_todo: list, summaries: dict) -> BM25Index:
+    """Builds a BM25 index over the title, snippet and stored summary of every search result, keyed by URL."""
+    documents = {}
+    for item in searches_todo:
+        for result in item.get("search", {}).get("results", []):
+            if not isinstance(result, dict) or not result.get("url"):
+                continue
+            documents[result["url"]] = " ".join([
+                str(result.get("title", "")),
+                str(result.get("snippet", "")),
+                summaries.get(result.get("url_id")) or ""
+            ])
+    return BM25Index(documents)
+
+def _prerank_results(search_results: list, research_topic: dict, index: BM25Index, min_score: float, top_k: int) -> tuple:
+    """
+    Splits search results into those worth sending to the search ranker and those pruned locally.
+
+    Results scoring below `min_score` against the research topic are dropped, and of the rest only
+    the `top_k` best are kept. Pruned results are returned as denied ranked URLs. A research topic
+    without query terms cannot score anything, so its first `top_k` results are kept as they are.
+    """
+    results = [r for r in search_results if isinstance(r, dict) and r.get("url")]
+    query = research_topic_query(research_topic)
+    if not tokenize(query):
+        if top_k <= 0:
+            return results, []
+        rationale = f"Pruned by lexical pre-ranking: the research topic has no query terms and only the first {top_k} results are kept."
+        return results[:top_k], [{"url": r["url"], "status": "denied", "rationale": rationale} for r in results[top_k:]]
+    scores = index.scores(query, [r["url"] for r in results])
+    ordered = sorted(results, key=lambda r: scores[r["url"]], reverse=True)
+
+    kept_results = []
+    pruned_urls = []
+    for result in ordered:
+        score = scores[result["url"]]
+        if score < min_score:
+            rationale = f"Pruned by lexical pre-ranking: BM25 score {score:.2f} is below the threshold of {min_score:.2f}."
+        elif top_k > 0 and len(kept_results) >= top_k:
+            rationale = f"Pruned by lexical pre-ranking: BM25 score {score:.2f} is outside the top {top_k} results."
+        else:
+            kept_results.append(result)
+            continue
+        pruned_urls.append({"url": result["url"], "status": "denied", "rationale": rationale})
+
+    # Keep the remaining results in their original search order for the ranker
+    kept_urls = {r["url"] for r in kept_results}
+    kept_results = [r for r in results if r["url"] in kept_urls]
+    return kept_results, pruned_urls
+
+async def _rank_search(executor, item: dict, semaphore: asyncio.Semaphore, logger, prerank_index: BM25Index, min_score: float, top_k: int) -> list | None:
+    """Ranks the results of one search with the search ranker agent, returning its ranked URLs or None on failure."""
+    current_search = item.get("search", {})
+    research_topic = item.get("research_topic", {})
+
+    search_id = current_search.get("search_id", "unknown_search")
+    search_rationale = current_search.get('rationale', '')
+    search_results, pruned_urls = _prerank_results(current_search.get('results', []), research_topic, prerank_index, min_score, top_k)
+    if pruned_urls:
+        status = f"Lexical pre-ranking pruned {len(pruned_urls)} results from search {search_id}; {len(search_results)} left for the search ranker."
+        logger.info(status)
+    if not search_results:
+        return pruned_urls
+
+    async with semaphore:
+        status = f"Processing search: {search_id}"
+        logger.info(status)
+        try:
+            with usage_tags(gap_id=item.get("gap_id"), search_id=search_id):
+                search_ranker_result = await executor.ainvoke({
+                    "input": {
+                        "research_topic": research_topic,
+                        "search_results": search_results,
+                        "search_rationale": search_rationale
+                    }
+                })
+            raw_search_ranker_result = search_ranker_result.get('output', '')
+            status = f"Curator agent for search {search_id} completed. Raw output: {raw_search_ranker_result}"
+            logger.info(status)
+        except Exception as e:
+            status = f"Curator agent search ranking for search {search_id} failed: {e}"
+            logger.error(status, exc_info=True)
+            return None
+
+    try:
+        json_output = extract_and_clean_json(raw_search_ranker_result)
+        ranked_urls = json_output.get("ranked_urls", [])
+        approved_count = len([url for url in ranked_urls if isinstance(url, dict) and url.get('status') == 'approved'])
+        status = f"Successfully parsed ranked URLs for search {search_id}: {approved_count} approved."
+        logger.info(status)
+        return ranked_urls + pruned_urls
+    except Exception as e:
+        status = f"Failed to parse ranked URLs for search {search_id}: {e}"
+        logger.error(status, exc_info=True)
+        return None
+
+def _select_urls_for_ingestion(approved_urls: list, url_ids: dict, queued_urls: list, logger) -> list:
+    """Returns the approved URLs that are not already queued for ingestion or ingested into LightRAG."""
+    ingestion_status = get_ingestion_status([url_ids[url] for url in approved_urls if url_ids.get(url) is not None])
+    selected_urls = []
+    for url in approved_urls:
+        if url in queued_urls or url in selected_urls:
+            continue
+        if ingestion_status.get(url_ids.get(url)) == "ingested":
+            logger.info(f"Skipping URL {url} (url_id: {url_ids.get(url)}), already ingested.")
+            continue
+        selected_urls.append(url)
+    return selected_urls
+
+async def curator_agent_node(state: AgentState, config: RunnableConfig):
     """Orchestrates the curation process."""
     print_colorful_break("CURATOR")
-    logger = state['logger']
+    runtime = get_runtime(config)
+    logger = runtime.logger
 
     report_id = state.get("curator_report_id")
+    researcher_report_id = None
     searches_todo = []
+    curator_url_ids = {}
     curator_urls_for_ingestion = []
     curator_url_ingestion_status = []
     final_status = None
@@ -21,153 +147,124 @@ async def curator_agent_node(state: AgentState):
         try:
             init_result = initialize_curator(state['timestamp'])
             report_id = init_result.get("curator_report_id")
+            researcher_report_id = init_result.get("researcher_report_id")
             searches_todo = init_result.get("curator_searches_todo")
             status = f"--- Initialized curator state: {init_result} ---"
             logger.info(status)
+            status = f"Ranking {len(searches_todo)} new searches; {init_result.get('curator_searches_skipped')} searches were ranked by earlier curator runs."
+            logger.info(status)
+
+            # URLs approved by earlier runs are still queued unless they have been ingested since
+            previously_approved = init_result.get("curator_previously_approved", [])
+            curator_url_ids.update({item["url"]: item["url_id"] for item in previously_approved})
+            curator_urls_for_ingestion.extend(_select_urls_for_ingestion(
+                [item["url"] for item in previously_approved], curator_url_ids, curator_urls_for_ingestion, logger
+            ))
+
+            # Documents an earlier run submitted but never saw indexed are submitted again
+            submitted = get_submitted_documents()
+            if submitted:
+                status = f"Re-submitting {len(submitted)} documents that earlier runs submitted but did not see indexed."
+                logger.info(status)
+                curator_url_ids.update({item["url"]: item["url_id"] for item in submitted})
+                curator_urls_for_ingestion.extend(_select_urls_for_ingestion(
+                    [item["url"] for item in submitted], curator_url_ids, curator_urls_for_ingestion, logger
+                ))
         except Exception as e:
             status = f"Failed to initialize curator: {e}"
             logger.error(status, exc_info=True)
             return {"status": status}
 
     # Create the specialized agent for search ranking
-    search_ranker_prompt = ChatPromptTemplate.from_template(open("prompts/search_ranker_prompt.txt", "r").read())
-    search_ranker_tools = [t for t in state['mcp_tools'] if t.name in ["google_search", "fetch"]]
+    search_ranker_tools = await runtime.mcp_provider.get_tools(SEARCH_RANKER_TOOLS)
     status = f"Attempting to invoke search ranker agent executor with tools: {search_ranker_tools}"
     logger.info(status)
     try:
-        agent_runnable = create_openai_tools_agent(state['model'], search_ranker_tools, search_ranker_prompt)
-        executor = AgentExecutor(agent=agent_runnable, tools=search_ranker_tools, verbose=True)
+        executor = get_registry().get_executor("search_ranker", runtime.model, search_ranker_tools)
     except Exception as e:
         status = f"Failed to create search ranker agent executor: {e}"
         logger.error(status, exc_info=True)
         return {"status": status}
 
-    # Main control loop for search ranking
+    # Main control loop for search ranking: the searches are independent, so they are ranked
+    # concurrently and their approvals merged back in the original search order
     if isinstance(searches_todo, list) and searches_todo:
         for item in searches_todo:
-            current_search = item.get("search", {})
-            research_topic = item.get("research_topic", {})
-            
-            search_id = current_search.get("search_id", "unknown_search")
-            search_rationale = current_search.get('rationale', '')
-            search_results = current_search.get('results', [])
-
-            status = f"Processing search: {search_id}"
-            logger.info(status)
-            try:
-                search_ranker_result = await executor.ainvoke({
-                    "input": {
-                        "research_topic": research_topic,
-                        "search_results": search_results,
-                        "search_rationale": search_rationale
-                    }
-                })
-                raw_search_ranker_result = search_ranker_result.get('output', '')
-                status = f"Curator agent for search {search_id} completed. Raw output: {raw_search_ranker_result}"
-                logger.info(status)
-                
-                try:
-                    json_output = extract_and_clean_json(raw_search_ranker_result)
-                    ranked_urls = json_output.get("ranked_urls", [])
-                    approved_urls = [url['url'] for url in ranked_urls if url.get('status') == 'approved']
-                    curator_urls_for_ingestion.extend(approved_urls)
-                    status = f"Successfully parsed ranked URLs for search {search_id}: {len(approved_urls)} approved."
-                    logger.info(status)
-                except Exception as e:
-                    status = f"Failed to parse ranked URLs for search {search_id}: {e}"
-                    logger.error(status, exc_info=True)
-                    continue
-
-                status = f"Preparing to update report for search {search_id} with {len(approved_urls)} URLs."
-                logger.info(status)
-                try:
-                    tool_input = {
-                        "curator_report_id": report_id,
-                        "job": "urls_for_ingestion",
-                        "results": approved_urls
-                    }
-                    update_curator_report(tool_input)
-                    status = f"Updated report for search {search_id} with {len(approved_urls)} URLs."
-                    logger.info(status)
-                except Exception as e:
-                    status = f"Failed to update report for search {search_id}: {e}"
-                    logger.error(status, exc_info=True)
-                    continue
-
-                status = f"Successfully updated report for search {search_id} with {len(approved_urls)} URLs."
-                logger.info(status)
+            search_results = item.get("search", {}).get('results', [])
+            curator_url_ids.update({r.get('url'): r.get('url_id') for r in search_results if isinstance(r, dict) and r.get('url')})
+
+        # Score every result against its research topic so obvious misses never reach the LLM
+        min_score = float(os.environ.get("CURATOR_PRERANK_MIN_SCORE", DEFAULT_PRERANK_MIN_SCORE))
+        top_k = int(os.environ.get("CURATOR_PRERANK_TOP_K", DEFAULT_PRERANK_TOP_K))
+        try:
+            summaries = get_document_summaries([url_id for url_id in curator_url_ids.values() if url_id is not None])
+        except Exception as e:
+            status = f"Failed to load document summaries for pre-ranking, scoring titles and snippets only: {e}"
+            logger.error(status, exc_info=True)
+            summaries = {}
+        prerank_index = _build_prerank_index(searches_todo, summaries)
 
+        concurrency = int(os.environ.get("CURATOR_RANKING_CONCURRENCY", DEFAULT_RANKING_CONCURRENCY))
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        status = f"Ranking {len(searches_todo)} searches with concurrency {concurrency}."
+        logger.info(status)
+        ranking_results = await asyncio.gather(*(
+            _rank_search(executor, item, semaphore, logger, prerank_index, min_score, top_k) for item in searches_todo
+        ))
+
+        for item, ranked_urls in zip(searches_todo, ranking_results):
+            if ranked_urls is None:
+                continue
+            gap_id = item.get("gap_id", "unknown_gap")
+            search_id = item.get("search", {}).get("search_id", "unknown_search")
+            try:
+                record_search_ranking(researcher_report_id, gap_id, search_id, report_id, ranked_urls)
             except Exception as e:
-                status = f"Curator agent search ranking for search {search_id} failed: {e}"
+                status = f"Failed to record ranking for search {search_id}: {e}"
                 logger.error(status, exc_info=True)
-                continue
+            approved_urls = [url['url'] for url in ranked_urls if isinstance(url, dict) and url.get('status') == 'approved' and url.get('url')]
+            approved_urls = _select_urls_for_ingestion(approved_urls, curator_url_ids, curator_urls_for_ingestion, logger)
+            curator_urls_for_ingestion.extend(approved_urls)
 
-    status = f"Successfully completed ranking of all searches for report: {report_id}"
-    logger.info(status)
-
-    # Create the specialized agent for url ingestion
-    ingester_prompt = ChatPromptTemplate.from_template(open("prompts/ingester_prompt.txt", "r").read())
-    ingester_tools = [t for t in state['mcp_tools'] if t.name in ["fetch", "documents_upload_file", "documents_upload_files", "documents_insert_text", "documents_pipeline_status"]]
-    status = f"Attempting to invoke url ingestion agent executor with tools: {ingester_tools}"
+    status = f"Preparing to update report {report_id} with {len(curator_urls_for_ingestion)} URLs for ingestion."
     logger.info(status)
     try:
-        agent_runnable = create_openai_tools_agent(state['model'], ingester_tools, ingester_prompt)
-        executor = AgentExecutor(agent=agent_runnable, tools=ingester_tools, verbose=True)
+        update_curator_report(report_id, "urls_for_ingestion", curator_urls_for_ingestion)
+        status = f"Updated report {report_id} with {len(curator_urls_for_ingestion)} URLs for ingestion."
+        logger.info(status)
     except Exception as e:
-        status = f"Failed to create url ingestion agent executor: {e}"
+        status = f"Failed to update report {report_id} with URLs for ingestion: {e}"
         logger.error(status, exc_info=True)
-        return {"status": status}
 
-   # Main control for url ingestion
-    task = "Ingest the URLs in `{urls_for_ingestion}` and return the ingestion status for each URL."
-    status = f"Attempting to run agent executor for url ingestion"
+    status = f"Successfully completed ranking of all searches for report: {report_id}"
+    logger.info(status)
+
+    # Ingest the approved URLs from their stored markdown, without an LLM in the loop
+    status = f"Attempting to ingest {len(curator_urls_for_ingestion)} URLs for report {report_id}"
     logger.info(status)
     try:
-        # The executor handles the entire loop of tool calls and reasoning.
-        ingestion_result = await executor.ainvoke({
-            "input": task,
-            "urls_for_ingestion": curator_urls_for_ingestion
-        })
-        raw_ingestion_result = ingestion_result.get('output', '')
-        status = f"Curator agent ingestion for report {report_id} completed.\nRaw output: {raw_ingestion_result}"
+        ingestion_tools = await runtime.mcp_provider.get_tools(INGESTION_TOOLS)
+        curator_url_ingestion_status = await ingest_documents(curator_urls_for_ingestion, ingestion_tools, logger)
+        ingested_count = len([item for item in curator_url_ingestion_status if item["status"] == "ingested"])
+        status = f"Curator ingestion for report {report_id} completed: {ingested_count} of {len(curator_url_ingestion_status)} URLs ingested."
         logger.info(status)
-        
-        try:
-            json_output = extract_and_clean_json(raw_ingestion_result)
-            curator_url_ingestion_status = json_output.get("url_ingestion_status", [])
-            status = f"Successfully parsed URL ingestion status: {curator_url_ingestion_status}."
-            logger.info(status)
-        except Exception as e:
-            status = f"Failed to parse URL ingestion status: {e}"
-            logger.error(status, exc_info=True)
-            return {"status": status}
 
-        status = f"Preparing to update report: {report_id} with ingestion status for {len(curator_url_ingestion_status)} URLs."
-        logger.info(status)
         try:
-            tool_input = {
-                "curator_report_id": report_id,
-                "job": "url_ingestion_status",
-                "results": curator_url_ingestion_status
-            }
-            update_curator_report(tool_input)
-            status = f"Updated report {report_id} with ingestions status for {len(curator_url_ingestion_status)} URLs."
+            update_curator_report(report_id, "url_ingestion_status", curator_url_ingestion_status)
+            status = f"Updated report {report_id} with ingestion status for {len(curator_url_ingestion_status)} URLs."
             logger.info(status)
         except Exception as e:
             status = f"Failed to update report {report_id}: {e}"
             logger.error(status, exc_info=True)
             return {"status": status}
 
-        status = f"Successfully updated report {report_id} with {len(curator_url_ingestion_status)} URLs."
-        logger.info(status)
-
     except Exception as e:
-        final_status = f"Curator agent failed to run ingestion of ranked URLs: {e}"
+        final_status = f"Curator failed to run ingestion of ranked URLs: {e}"
         logger.error(final_status, exc_info=True)
     
     if not final_status:
-        final_status = f"Curator successfully ranked and ingested URLs, generating curator report summary written to file `state/curator_report.json`"
-        logger.info(status)
+        final_status = f"Curator successfully ranked and ingested URLs and wrote curator report {report_id} to DB."
+        logger.info(final_status)
 
     return {
         "status": final_status,
@@ -1,60 +1,130 @@
 # sub_agents.py
-from langchain.agents import create_openai_tools_agent, AgentExecutor
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.tools import tool, ToolException
+from agent_registry import get_registry
 from langchain_core.messages import AIMessage
+import asyncio
 import json
 import os
-import re
+from langchain_core.runnables import RunnableConfig
 from state import AgentState
+from runtime import get_runtime
 from tools import human_approval
-from db_utils import load_latest_report, extract_and_clean_json
+from db_utils import extract_and_clean_json, save_fixer_report, load_latest_report, mark_snapshot_entities_dirty
+from fix_plan import validate_plan, execute_plan, summarize_results, fix_dry_run, operation_entities, DESTRUCTIVE_ACTIONS, DEFAULT_BATCH_SIZE
 from terminal_utils import print_colorful_break
 
+FIXER_TOOLS = ["graph_update_entity", "documents_delete_entity", "graph_update_relation", "documents_delete_relation", "graph_entity_exists", "graphs_get"]
 
-async def fixer_agent_node(state: AgentState):
+
+def _plan_text(operations: list, results: list) -> str:
+    """Describes the valid destructive operations of a plan, one per line, for human approval."""
+    lines = []
+    for operation, result in zip(operations, results):
+        if result["status"] != "valid" or operation["action"] not in DESTRUCTIVE_ACTIONS:
+            continue
+        if operation["action"] == "merge":
+            lines.append(f"{operation['op_id']}: merge {', '.join(operation['source_entities'])} into {operation['target_entity']}")
+        elif operation["action"] == "delete_entity":
+            lines.append(f"{operation['op_id']}: delete entity {operation['entity_name']}")
+        else:
+            lines.append(f"{operation['op_id']}: delete relation {operation['source_entity']} -> {operation['target_entity']}")
+    return "\n".join(lines)
+
+
+async def fixer_agent_node(state: AgentState, config: RunnableConfig):
+    """
+    Fixes the issues of the latest auditor report. The plan is the report's `operations` list, or
+    is written by the fixer LLM from the report if it has none; it is then validated and applied
+    by `fix_plan` without further LLM calls. Destructive operations need human approval unless
+    FIX_REQUIRE_APPROVAL is false, and with FIX_DRY_RUN nothing is changed. Approval is only asked
+    for in an interactive run; otherwise a plan that needs it is treated as a dry run.
+    """
     print_colorful_break("FIXER")
-    logger = state['logger']
+    runtime = get_runtime(config)
+    logger = runtime.logger
     logger.info("--- Running Fixer Agent ---")
-    all_tools = state['mcp_tools']
-    model = state['model']
     timestamp = state['timestamp']
-    
-    fixer_tools = [t for t in all_tools if t.name in ["graph_update_entity", "documents_delete_entity", "graph_update_relation", "documents_delete_relation", "graph_entity_exists"]] + [load_latest_report, human_approval]
-    fixer_prompt = '''Your goal is to correct data quality issues.
-1.  **Load Auditor's Report**: Load `auditor_report.json`.
-2.  **Create a Plan**: Create a step-by-step plan to correct the issues.
-3.  **Get Human Approval**: Use `human_approval` to get your plan approved by calling the tool with the plan.
-4.  **Execute**: Execute the approved plan.
-5.  **Save Report**: Save a report of your actions to `fixer_report.json`.'''
+    dry_run = fix_dry_run()
+    batch_size = int(os.environ.get("FIX_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+    require_approval = os.environ.get("FIX_REQUIRE_APPROVAL", "true").strip().lower() in ("1", "true", "yes")
+
+    try:
+        auditor_report = json.loads(load_latest_report("auditor"))
+    except Exception as e:
+        status = f"Failed to load the latest auditor report: {e}"
+        logger.error(status)
+        return {"status": status}
 
-    prompt = ChatPromptTemplate.from_template(fixer_prompt)
-    agent_executor = create_openai_tools_agent(model, fixer_tools, prompt)
+    operations = auditor_report.get("operations")
+    if not isinstance(operations, list):
+        status = f"Auditor report {auditor_report.get('report_id')} has no operations; asking the fixer to plan them."
+        logger.info(status)
+        agent_executor = get_registry().get_executor("fixer", runtime.model)
+        result = await agent_executor.ainvoke({"input": json.dumps(auditor_report), "timestamp": timestamp})
+        try:
+            plan = extract_and_clean_json(result.get("output", ""))
+        except ValueError as e:
+            status = f"The fixer did not return a valid plan: {e}"
+            logger.error(status)
+            return {"status": status}
+        operations = plan.get("operations", []) if isinstance(plan, dict) else []
 
-    task_input = "Your task is to fix issues from the auditor's report. Begin now."
+    tools = {tool.name: tool for tool in await runtime.mcp_provider.get_tools(FIXER_TOOLS)}
+    results = await validate_plan(operations, tools, logger, batch_size)
+    status = f"Validated {len(operations)} fix operations: {summarize_results(results)}"
+    logger.info(status)
 
-    result = await agent_executor.ainvoke({"input": task_input, "timestamp": timestamp})
+    approved = None
+    plan_text = _plan_text(operations, results)
+    if plan_text and require_approval and not dry_run and not runtime.interactive:
+        # Nobody can answer a prompt (the daemon, or stdin is not a terminal), so record the plan only
+        status = "Destructive fix operations need approval, but the run is not interactive; treating it as a dry run."
+        logger.warning(status)
+        dry_run = True
+    if plan_text and require_approval and not dry_run:
+        approved = await asyncio.to_thread(human_approval.func, plan_text) == "Approved."
+        if not approved:
+            for operation, result in zip(operations, results):
+                if result["status"] == "valid" and operation["action"] in DESTRUCTIVE_ACTIONS:
+                    result.update({"status": "skipped", "detail": "Not approved"})
 
-    logger.info(f"Fixer Agent finished with output: {result['output']}")
-    return {"messages": state['messages'] + [AIMessage(content=result['output'])]}
+    await execute_plan(operations, results, tools, logger, dry_run=dry_run, batch_size=batch_size)
+    if not dry_run:
+        # The graph snapshot re-fetches these entities on its next refresh
+        changed = {name for operation, result in zip(operations, results) if result["status"] in ("applied", "failed") for name in operation_entities(operation)}
+        try:
+            mark_snapshot_entities_dirty(sorted(changed))
+        except Exception as e:
+            logger.warning(f"Failed to mark the changed entities in the graph snapshot: {e}")
+    summary = summarize_results(results)
+    report = {
+        "auditor_report_id": auditor_report.get("report_id"),
+        "dry_run": dry_run,
+        "approved": approved,
+        "summary": summary,
+        "operations": [{**result, "operation": operation} for operation, result in zip(operations, results)],
+    }
+    status = f"Fixer {'dry run' if dry_run else 'run'} finished: {summary}"
+    logger.info(status)
+    return {"fixer_report": json.dumps(report), "status": status}
 
-def save_fixer_report_node(state: AgentState):
-    """Saves the final report from the last AI message."""
-    logger = state['logger']
-    final_message_from_agent = state['messages'][-1]
+def save_fixer_report_node(state: AgentState, config: RunnableConfig):
+    """Saves the report written by the fixer agent."""
+    logger = get_runtime(config).logger
+    raw_report_content = state.get("fixer_report") or ""
 
-    status = f"--- Saving Fixer Report ---\n{final_message_from_agent.content}"
+    status = f"--- Saving Fixer Report ---\n{raw_report_content}"
     logger.info(status)
 
     try:
-        report_json = extract_and_clean_json(final_message_from_agent.content)
+        report_json = extract_and_clean_json(raw_report_content)
         if 'report_id' not in report_json:
-            report_json['report_id'] = state.get('fixer_report_id', 'unknown_id')
-        save_fixer_report({"fixer_report": json.dumps(report_json)})
+            timestamp = state['timestamp']
+            report_json['report_id'] = state.get('fixer_report_id') or f"fix_{timestamp.replace('-', '').replace(':', '').replace('T', '_').split('.')[0]}"
+        save_fixer_report(report_json)
         status = f"Successfully saved fixer report with ID {report_json.get('report_id')}"
         logger.info(status)
     except (ValueError, KeyError) as e:
         status = f"Error processing or saving fixer report: {e}"
         logger.error(status, exc_info=True)
 
-    return {"messages": state['messages'] + [AIMessage(content=status)]}
+    return {"status": status, "messages": [AIMessage(content=status)]}
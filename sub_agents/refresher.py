@@ -0,0 +1,102 @@
+# sub_agents/refresher.py
+import os
+from agent_registry import get_registry
+from langchain_core.runnables import RunnableConfig
+from state import AgentState
+from runtime import get_runtime
+from db_utils import get_refresh_candidates, get_stale_summary_ids, update_document_content, mark_document_checked, record_fetch_telemetry
+from tools import fetch_and_generate_markdown
+from sub_agents.researcher import summarize_document
+from terminal_utils import print_colorful_break
+from usage import usage_tags
+from utils import format_bytes
+
+# The refresher only fetches pages and runs the summarizer; it needs no MCP servers
+REFRESHER_TOOLS = []
+
+DEFAULT_MAX_DOCUMENTS = 50
+DEFAULT_MIN_AGE_DAYS = 7.0
+DEFAULT_BANDWIDTH_MB = 200.0
+DEFAULT_MAX_SUMMARIES = 20
+
+async def refresher_node(state: AgentState, config: RunnableConfig):
+    """
+    Re-fetches the stored documents most in need of a refresh and re-summarizes the ones that changed.
+
+    Documents are taken in priority order (see `get_refresh_candidates`) until REFRESH_MAX_DOCUMENTS
+    have been fetched or REFRESH_BANDWIDTH_MB have been downloaded. Summaries made from content
+    that has changed since are then regenerated, at most REFRESH_MAX_SUMMARIES per run.
+    """
+    print_colorful_break("REFRESHER")
+    runtime = get_runtime(config)
+    logger = runtime.logger
+    max_documents = int(os.environ.get("REFRESH_MAX_DOCUMENTS", DEFAULT_MAX_DOCUMENTS))
+    min_age_days = float(os.environ.get("REFRESH_MIN_AGE_DAYS", DEFAULT_MIN_AGE_DAYS))
+    bandwidth_budget = float(os.environ.get("REFRESH_BANDWIDTH_MB", DEFAULT_BANDWIDTH_MB)) * 1024 * 1024
+    max_summaries = int(os.environ.get("REFRESH_MAX_SUMMARIES", DEFAULT_MAX_SUMMARIES))
+
+    try:
+        candidates = get_refresh_candidates(max_documents, min_age_days)
+    except Exception as e:
+        status = f"Failed to select documents to refresh: {e}"
+        logger.error(status, exc_info=True)
+        return {"status": status}
+    status = f"Selected {len(candidates)} documents older than {min_age_days:g} days to refresh."
+    logger.info(status)
+
+    # 1. Re-fetch in priority order within the bandwidth budget
+    downloaded = 0
+    fetched = changed = failed = 0
+    for candidate in candidates:
+        if downloaded >= bandwidth_budget:
+            status = f"Bandwidth budget of {format_bytes(int(bandwidth_budget))} used up after {fetched} documents; {len(candidates) - fetched} left for the next run."
+            logger.info(status)
+            break
+        url_id, url = candidate["url_id"], candidate["url"]
+        logger.info(f"Refreshing url_id {url_id} (score {candidate['score']:.2f}, {candidate['age_days']:.0f} days old, "
+                    f"{candidate['change_count']} changes in {candidate['fetch_count']} fetches, {candidate['approvals']} approvals): {url}")
+
+        telemetry = {"url_id": url_id, "run_id": state.get("run_id")}
+        raw_document, markdown_content = await fetch_and_generate_markdown(url, logger, telemetry)
+        try:
+            record_fetch_telemetry(telemetry)
+        except Exception as e:
+            logger.warning(f"Failed to record fetch telemetry for url_id {url_id}: {e}")
+        downloaded += telemetry.get("bytes", 0) + telemetry.get("wasted_bytes", 0)
+        fetched += 1
+
+        try:
+            if telemetry.get("error_class"):
+                # Keep the content we have; try again once the document is due again
+                failed += 1
+                mark_document_checked(url_id)
+                logger.warning(f"Refresh of url_id {url_id} failed ({telemetry['error_class']}); keeping the stored content.")
+            elif update_document_content(url_id, raw_document, markdown_content):
+                changed += 1
+                logger.info(f"Content of url_id {url_id} changed.")
+        except Exception as e:
+            failed += 1
+            logger.error(f"Failed to store the refreshed content of url_id {url_id}: {e}", exc_info=True)
+
+    # 2. Regenerate summaries of changed content within the LLM budget
+    summarized = 0
+    stale_summaries = []
+    if max_summaries > 0:
+        try:
+            stale_summaries = get_stale_summary_ids(max_summaries)
+        except Exception as e:
+            logger.error(f"Failed to find outdated summaries: {e}", exc_info=True)
+    if stale_summaries:
+        summarizer_executor = get_registry().get_executor("summarizer", runtime.model)
+        for url_id in stale_summaries:
+            try:
+                with usage_tags(url_id=url_id):
+                    if await summarize_document(url_id, summarizer_executor, logger, force=True) == "summarized":
+                        summarized += 1
+            except Exception as e:
+                logger.error(f"Error re-summarizing url_id {url_id}: {e}", exc_info=True)
+
+    status = (f"Refreshed {fetched} documents ({format_bytes(downloaded)} downloaded): {changed} changed, {failed} failed; "
+              f"re-summarized {summarized} of {len(stale_summaries)} outdated summaries (budget {max_summaries}).")
+    logger.info(status)
+    return {"status": status}
@@ -1,19 +1,124 @@
 # sub_agents/researcher.py
-from langchain.agents import create_openai_tools_agent, AgentExecutor
-from langchain_core.prompts import ChatPromptTemplate
+from agent_registry import get_registry
+from langchain_core.runnables import RunnableConfig
 from state import AgentState
-from db_utils import initialize_researcher, update_researcher_report, extract_and_clean_json, get_document_object, update_document_object
+from runtime import get_runtime
+import os
+from db_utils import initialize_researcher, update_researcher_report, update_researcher_coverage, extract_and_clean_json, get_document_object, update_document_object, add_url_or_get_id, search_local_documents
 from tools import process_url
+from job_queue import job_queue_enabled, enqueue_and_wait
+from topic_coverage import triage_gaps, shrink_research_topic
 from utils import filter_content_for_summarization
 from terminal_utils import print_colorful_break
+from usage import usage_tags
 
-async def researcher_agent_node(state: AgentState):
+RESEARCHER_TOOLS = ["google_search"]
+
+DEFAULT_LOCAL_SEARCH_RESULTS = 10
+DEFAULT_LOCAL_SEARCH_MIN_HITS = 3
+DEFAULT_LOCAL_SEARCH_MIN_MATCH = 0.6
+
+async def register_url(url: str, logger, fetch_jobs: list = None):
+    """Adds a search result URL to the document store and fetches it, or, with `fetch_jobs`, only queues its fetch there."""
+    if fetch_jobs is None:
+        return await process_url(url, logger)
+    url_id, url_status = add_url_or_get_id(url)
+    if url_status == "new":
+        fetch_jobs.append({"url_id": url_id, "url": url})
+    return url_id, url_status
+
+async def run_search(google_search_tool, parameters: dict, logger) -> tuple:
+    """
+    Runs a planned search against the stored documents first and calls google_search only if fewer than
+    LOCAL_SEARCH_MIN_HITS of them contain at least LOCAL_SEARCH_MIN_MATCH of the query's terms.
+    Searches restricted to recent results (dateRestrict) always go to google_search, since the stored
+    documents' publication dates are unknown. Returns (results, source), source being 'local' or 'google_search'.
+    """
+    if os.environ.get("LOCAL_SEARCH", "true").strip().lower() in ("1", "true", "yes") and not parameters.get("dateRestrict"):
+        min_hits = int(os.environ.get("LOCAL_SEARCH_MIN_HITS", DEFAULT_LOCAL_SEARCH_MIN_HITS))
+        min_match = float(os.environ.get("LOCAL_SEARCH_MIN_MATCH", DEFAULT_LOCAL_SEARCH_MIN_MATCH))
+        try:
+            hits = search_local_documents(parameters["query"], int(parameters.get("num") or DEFAULT_LOCAL_SEARCH_RESULTS))
+        except Exception as e:
+            logger.warning(f"Local search for '{parameters['query']}' failed, searching the web: {e}")
+            hits = []
+        hits = [hit for hit in hits if hit["match"] >= min_match]
+        if len(hits) >= min_hits:
+            status = f"Answered search '{parameters['query']}' with {len(hits)} stored documents, skipping google_search."
+            logger.info(status)
+            return hits, "local"
+    return extract_and_clean_json(await google_search_tool.arun(parameters)), "google_search"
+
+async def summarize_document(url_id: int, summarizer_executor, logger, config=None, force: bool = False) -> str:
+    """
+    Summarizes a stored document unless it already has a summary (and `force` is not set) or no usable content.
+    Returns 'summarized', 'exists' or 'no_content'; raises if summarization fails.
+    """
+    if not force and get_document_object(url_id, type="summary"):
+        return "exists"
+    markdown_content = get_document_object(url_id, type="markdown_content")
+    if not markdown_content or markdown_content.startswith("[MARKDOWN_GENERATION_FAILED"):
+        return "no_content"
+
+    logger.info(f"Attempting summary for url_id: {url_id}")
+    filtered_content = filter_content_for_summarization(markdown_content)
+    summarizer_result = await summarizer_executor.ainvoke({"input": filtered_content}, config)
+    summary_output = extract_and_clean_json(summarizer_result.get("output", ""))
+
+    if isinstance(summary_output, dict):
+        summary = summary_output.get('summary')
+    else:
+        summary = str(summary_output)
+
+    update_document_object(url_id, type="summary", object=summary)
+    return "summarized"
+
+def triage_gaps_todo(report_id: str, gaps_todo: list, logger) -> tuple:
+    """
+    Scores the gaps against the documents already stored and records the scores in the report.
+    Returns (gaps to research, IDs of skipped gaps): well-covered gaps are skipped and partly covered
+    ones keep only their uncovered key questions.
+    """
+    coverage = triage_gaps(gaps_todo, logger)
+    update_researcher_coverage(report_id, coverage)
+    remaining, skipped = [], []
+    for gap in gaps_todo:
+        gap_coverage = coverage[gap["gap_id"]]
+        questions = gap_coverage["questions"]
+        covered = sum(question["covered"] for question in questions)
+        if gap_coverage["action"] == "skip":
+            skipped.append(gap["gap_id"])
+            status = f"Skipping gap {gap['gap_id']}: {covered} of {len(questions)} key questions are covered by stored documents."
+        elif gap_coverage["action"] == "shrink":
+            gap = {**gap, "research_topic": shrink_research_topic(gap["research_topic"], gap_coverage)}
+            remaining.append(gap)
+            status = f"Researching gap {gap['gap_id']} without its {covered} key questions already covered by stored documents."
+        else:
+            remaining.append(gap)
+            status = f"Researching gap {gap['gap_id']}: none of its key questions are covered by stored documents."
+        logger.info(status)
+    return remaining, skipped
+
+def abandon_gaps(status: str, report_id: str, gaps_todo: list, gaps_complete: list, gaps_failed: list) -> dict:
+    """Marks every remaining gap as failed, so that the graph stops routing back to the researcher when it cannot run at all."""
+    failed = gaps_failed + [gap.get("gap_id") if isinstance(gap, dict) else None for gap in gaps_todo or []]
+    return {
+        "status": status,
+        "researcher_report_id": report_id,
+        "researcher_gaps_todo": [],
+        "researcher_gaps_complete": gaps_complete,
+        "researcher_gaps_failed": failed
+    }
+
+async def researcher_agent_node(state: AgentState, config: RunnableConfig):
     """The main node for the researcher workflow."""
     print_colorful_break("RESEARCHER")
-    logger = state['logger']
+    runtime = get_runtime(config)
+    logger = runtime.logger
     report_id = state.get("researcher_report_id")
     gaps_todo = state.get("researcher_gaps_todo", [])
-    gaps_complete = state.get("researcher_gaps_complete", [])
+    gaps_complete = state.get("researcher_gaps_complete") or []
+    gaps_failed = state.get("researcher_gaps_failed") or []
     final_status = None
 
     if not report_id:
@@ -22,6 +127,7 @@ async def researcher_agent_node(state: AgentState):
             report_id = init_result.get("researcher_report_id")
             gaps_todo = init_result.get("researcher_gaps_todo")
             gaps_complete = []
+            gaps_failed = []
             status = f"--- Initialized researcher state: {init_result} ---"
             logger.info(status)
         except Exception as e:
@@ -29,97 +135,160 @@ async def researcher_agent_node(state: AgentState):
             logger.error(status)
             return {"status": status}
 
-    # Define Planner Agent
-    with open("prompts/planner_prompt.txt", "r") as f:
-        planner_prompt_template = f.read()
-    planner_prompt = ChatPromptTemplate.from_template(planner_prompt_template)
-    try:
-        planner_agent_runnable = create_openai_tools_agent(state['model'], [], planner_prompt)
-        planner_executor = AgentExecutor(agent=planner_agent_runnable, tools=[], verbose=True)
-    except Exception as e:
-        status = f"Failed to create planner agent executor: {e}"
-        logger.error(status)
-        return {"status": status}
-
-    # Define Refiner Agent
-    with open("prompts/refiner_prompt.txt", "r") as f:
-        refiner_prompt_template = f.read()
-    refiner_prompt = ChatPromptTemplate.from_template(refiner_prompt_template)
-    try:
-        refiner_agent_runnable = create_openai_tools_agent(state['model'], [], refiner_prompt)
-        refiner_executor = AgentExecutor(agent=refiner_agent_runnable, tools=[], verbose=True)
-    except Exception as e:
-        status = f"Failed to create refiner agent executor: {e}"
-        logger.error(status)
-        return {"status": status}
+        if gaps_todo and os.environ.get("COVERAGE_TRIAGE", "true").strip().lower() in ("1", "true", "yes"):
+            try:
+                gaps_todo, gaps_skipped = triage_gaps_todo(report_id, gaps_todo, logger)
+                gaps_complete.extend(gaps_skipped)
+            except Exception as e:
+                status = f"Coverage triage failed, researching every gap: {e}"
+                logger.error(status, exc_info=True)
 
-    # Define Summarizer Agent
-    with open("prompts/summarizer_prompt.txt", "r") as f:
-        summarizer_prompt_template = f.read()
-    summarizer_prompt = ChatPromptTemplate.from_template(summarizer_prompt_template)
+    # Get the planner, refiner and summarizer agents from the registry
+    registry = get_registry()
     try:
-        summarizer_agent_runnable = create_openai_tools_agent(state['model'], [], summarizer_prompt)
-        summarizer_executor = AgentExecutor(agent=summarizer_agent_runnable, tools=[], verbose=True)
+        planner_executor = registry.get_executor("planner", runtime.model)
+        refiner_executor = registry.get_executor("refiner", runtime.model)
+        summarizer_executor = registry.get_executor("summarizer", runtime.model)
     except Exception as e:
-        status = f"Failed to create summarizer agent executor: {e}"
+        status = f"Failed to create researcher agent executors: {e}"
         logger.error(status)
-        return {"status": status}
+        return abandon_gaps(status, report_id, gaps_todo, gaps_complete, gaps_failed)
 
     # Get the tools
-    google_search_tool = next((tool for tool in state['mcp_tools'] if tool.name == 'google_search'), None)
+    researcher_tools = await runtime.mcp_provider.get_tools(RESEARCHER_TOOLS)
+    google_search_tool = next((tool for tool in researcher_tools if tool.name == 'google_search'), None)
     if not google_search_tool:
         status = "google_search tool not found."
         logger.error(status)
-        return {"status": status}
+        return abandon_gaps(status, report_id, gaps_todo, gaps_complete, gaps_failed)
     
 
-    # Main control loop
+    # Research one gap per invocation; the graph routes back to this node until no gaps remain,
+    # so progress is checkpointed after every gap.
+    current_gap = None
     try:
         if isinstance(gaps_todo, list) and gaps_todo:
-            for current_gap in list(gaps_todo):
-                gap_id = current_gap['gap_id']
-                research_topic = current_gap['research_topic']
-                all_searches_for_gap = []
+            current_gap = gaps_todo[0]
+            gap_id = current_gap['gap_id']
+            research_topic = current_gap['research_topic']
+            all_searches_for_gap = []
 
-                research_topic_title = research_topic.get('title', 'No Title')
-                status = f"Starting research for gap: {gap_id}, research topic: {research_topic_title}"
-                logger.info(status)
+            # With the job queue, fetches and summaries are left to the workers
+            fetch_jobs = [] if job_queue_enabled() else None
 
-                try:
-                    # 1. Planning Step
-                    status = f"Invoking planner for gap {gap_id}."
-                    logger.info(status)
+            research_topic_title = research_topic.get('title', 'No Title')
+            status = f"Starting research for gap: {gap_id}, research topic: {research_topic_title}"
+            logger.info(status)
+
+            try:
+                # 1. Planning Step
+                status = f"Invoking planner for gap {gap_id}."
+                logger.info(status)
+                with usage_tags(gap_id=gap_id):
                     planner_result = await planner_executor.ainvoke({"input": research_topic})
-                    planner_output = extract_and_clean_json(planner_result.get("output", ""))
-                    planned_searches = planner_output.get("searches", [])
-                    status = f"Planner for gap {gap_id} returned {len(planned_searches)} searches."
+                planner_output = extract_and_clean_json(planner_result.get("output", ""))
+                planned_searches = planner_output.get("searches", [])
+                status = f"Planner for gap {gap_id} returned {len(planned_searches)} searches."
+                logger.info(status)
+
+                # 2. Initial Execution Step
+                for planned_search in planned_searches:
+                    query = planned_search.get("query")
+                    rationale = planned_search.get("rationale")
+                    parameters = planned_search.get("parameters", {})
+                    search_id = planned_search.get("search_id")
+                    if not query:
+                        continue
+                    
+                    if 'query' not in parameters:
+                        parameters['query'] = query
+
+                    try:
+                        status = f"Executing search for gap {gap_id}, with parameters: {parameters}"
+                        logger.info(status)
+                        
+                        search_results, source = await run_search(google_search_tool, parameters, logger)
+
+                        for i, result in enumerate(search_results):
+                            url = result.get('url')
+                            if url and 'url_id' not in result:
+                                logger.info(f"Attempting document store initialzation for URL: {url}")
+                                try:
+                                    url_id, url_status = await register_url(url, logger, fetch_jobs)                                        
+                                except Exception as e:
+                                    status = f"Error processing URL {url}: {e}"
+                                    logger.error(status, exc_info=True)
+                                    continue                                    
+                                search_results[i]['url_id'] = url_id
+                                if url_status == "new":
+                                    status=f"New URL {url} added to the database with ID: {url_id}."
+                                else:
+                                    status = f"URL {url} already exists in the database with ID: {url_id}."
+                                logger.info(status)
+                                
+                        search_object = {
+                            "search_id": search_id,
+                            "rationale": rationale,
+                            "parameters": parameters,
+                            "source": source,
+                            "results": search_results
+                        }
+                        all_searches_for_gap.append(search_object)
+                        
+                        status = f"Search for gap {gap_id} finished for query: '{query}'"
+                        logger.info(status)
+                        
+                    except Exception as e:
+                        status = f"Search for gap {gap_id}, query '{query}' failed: {e}"
+                        logger.error(status)
+                        continue
+
+                # 3. Refinement Step
+                status = f"Invoking refiner for gap {gap_id}."
+                logger.info(status)
+                refiner_input = {"research_topic": research_topic, "search_results": all_searches_for_gap}
+                with usage_tags(gap_id=gap_id):
+                    refiner_result = await refiner_executor.ainvoke({"input": refiner_input})
+                refiner_output = extract_and_clean_json(refiner_result.get("output", ""))
+                
+                status_check = ""
+                if isinstance(refiner_output, dict):
+                    status_check = refiner_output.get("status", "").lower()
+                elif isinstance(refiner_output, str):
+                    if "insufficient" in refiner_output.lower():
+                        status_check = "insufficient"
+
+                if status_check == "insufficient":
+                    refined_searches = []
+                    if isinstance(refiner_output, dict):
+                        refined_searches = refiner_output.get("searches", [])
+                    status = f"Refiner for gap {gap_id} returned {len(refined_searches)} new searches."
                     logger.info(status)
 
-                    # 2. Initial Execution Step
-                    for planned_search in planned_searches:
-                        query = planned_search.get("query")
-                        rationale = planned_search.get("rationale")
-                        parameters = planned_search.get("parameters", {})
-                        search_id = planned_search.get("search_id")
+                    # 4. Refined Execution Step
+                    for refined_search in refined_searches:
+                        query = refined_search.get("query")
+                        rationale = refined_search.get("rationale")
+                        parameters = refined_search.get("parameters", {})
+                        search_id = refined_search.get("search_id")
                         if not query:
                             continue
-                        
+
                         if 'query' not in parameters:
                             parameters['query'] = query
-
+                        
                         try:
-                            status = f"Executing search for gap {gap_id}, with parameters: {parameters}"
+                            status = f"Executing refined search for gap {gap_id}, with parameters: {parameters}"
                             logger.info(status)
-                            
-                            raw_search_results = await google_search_tool.arun(parameters)
-                            search_results = extract_and_clean_json(raw_search_results)
+
+                            search_results, source = await run_search(google_search_tool, parameters, logger)
 
                             for i, result in enumerate(search_results):
                                 url = result.get('url')
-                                if url:
+                                if url and 'url_id' not in result:
                                     logger.info(f"Attempting document store initialzation for URL: {url}")
                                     try:
-                                        url_id, url_status = await process_url(url, logger)                                        
+                                        url_id, url_status = await register_url(url, logger, fetch_jobs)                                        
                                     except Exception as e:
                                         status = f"Error processing URL {url}: {e}"
                                         logger.error(status, exc_info=True)
@@ -130,167 +299,101 @@ async def researcher_agent_node(state: AgentState):
                                     else:
                                         status = f"URL {url} already exists in the database with ID: {url_id}."
                                     logger.info(status)
-                                    
+
                             search_object = {
                                 "search_id": search_id,
                                 "rationale": rationale,
                                 "parameters": parameters,
+                                "source": source,
                                 "results": search_results
                             }
                             all_searches_for_gap.append(search_object)
-                            
-                            status = f"Search for gap {gap_id} finished for query: '{query}'"
+
+                            status = f"Refined search for gap {gap_id} finished for query: '{query}'"
                             logger.info(status)
-                            
                         except Exception as e:
-                            status = f"Search for gap {gap_id}, query '{query}' failed: {e}"
+                            status = f"Refined search for gap {gap_id}, query '{query}' failed: {e}"
                             logger.error(status)
                             continue
-
-                    # 3. Refinement Step
-                    status = f"Invoking refiner for gap {gap_id}."
+                else:
+                    status = f"Refiner for gap {gap_id} deemed results sufficient."
                     logger.info(status)
-                    refiner_input = {"research_topic": research_topic, "search_results": all_searches_for_gap}
-                    refiner_result = await refiner_executor.ainvoke({"input": refiner_input})
-                    refiner_output = extract_and_clean_json(refiner_result.get("output", ""))
-                    
-                    status_check = ""
-                    if isinstance(refiner_output, dict):
-                        status_check = refiner_output.get("status", "").lower()
-                    elif isinstance(refiner_output, str):
-                        if "insufficient" in refiner_output.lower():
-                            status_check = "insufficient"
-
-                    if status_check == "insufficient":
-                        refined_searches = []
-                        if isinstance(refiner_output, dict):
-                            refined_searches = refiner_output.get("searches", [])
-                        status = f"Refiner for gap {gap_id} returned {len(refined_searches)} new searches."
-                        logger.info(status)
-
-                        # 4. Refined Execution Step
-                        for refined_search in refined_searches:
-                            query = refined_search.get("query")
-                            rationale = refined_search.get("rationale")
-                            parameters = refined_search.get("parameters", {})
-                            search_id = refined_search.get("search_id")
-                            if not query:
-                                continue
-
-                            if 'query' not in parameters:
-                                parameters['query'] = query
-                            
-                            try:
-                                status = f"Executing refined search for gap {gap_id}, with parameters: {parameters}"
-                                logger.info(status)
 
-                                raw_search_results = await google_search_tool.arun(parameters)
-                                search_results = extract_and_clean_json(raw_search_results)
-
-                                for i, result in enumerate(search_results):
-                                    url = result.get('url')
-                                    if url:
-                                        logger.info(f"Attempting document store initialzation for URL: {url}")
-                                        try:
-                                            url_id, url_status = await process_url(url, logger)                                        
-                                        except Exception as e:
-                                            status = f"Error processing URL {url}: {e}"
-                                            logger.error(status, exc_info=True)
-                                            continue                                    
-                                        search_results[i]['url_id'] = url_id
-                                        if url_status == "new":
-                                            status=f"New URL {url} added to the database with ID: {url_id}."
-                                        else:
-                                            status = f"URL {url} already exists in the database with ID: {url_id}."
-                                        logger.info(status)
-
-                                search_object = {
-                                    "search_id": search_id,
-                                    "rationale": rationale,
-                                    "parameters": parameters,
-                                    "results": search_results
-                                }
-                                all_searches_for_gap.append(search_object)
-
-                                status = f"Refined search for gap {gap_id} finished for query: '{query}'"
-                                logger.info(status)
-                            except Exception as e:
-                                status = f"Refined search for gap {gap_id}, query '{query}' failed: {e}"
-                                logger.error(status)
-                                continue
-                    else:
-                        status = f"Refiner for gap {gap_id} deemed results sufficient."
-                        logger.info(status)
+                if fetch_jobs is not None:
+                    await enqueue_and_wait("fetch", fetch_jobs, logger, run_id=state.get("run_id"))
 
-                    # 5. Summarization Step
-                    status = f"Starting summarization for gap {gap_id}."
-                    logger.info(status)
-                    for search in all_searches_for_gap:
-                        for i, result in enumerate(search.get('results', [])):
-                            url = result.get('url')
-                            url_id = result.get('url_id')
-                            url_summary = get_document_object(url_id, type="summary")
-                            if url_summary:
-                                logger.info(f"Skipping summarization for url_id: {url_id}, summary already exists.")
-                                continue
+                # 5. Summarization Step
+                status = f"Starting summarization for gap {gap_id}."
+                logger.info(status)
+                summarize_jobs = {}
+                for search in all_searches_for_gap:
+                    for result in search.get('results', []):
+                        url_id = result.get('url_id')
+                        if url_id is None:
+                            continue
+                        if fetch_jobs is not None:
+                            summarize_jobs.setdefault(url_id, {"url_id": url_id, "gap_id": gap_id, "search_id": search.get("search_id")})
+                            continue
+                        try:
+                            with usage_tags(gap_id=gap_id, search_id=search.get("search_id"), url_id=url_id):
+                                outcome = await summarize_document(url_id, summarizer_executor, logger)
+                            if outcome == "exists":
+                                status = f"Skipping summarization for url_id: {url_id}, summary already exists."
+                            elif outcome == "no_content":
+                                status = f"Skipping summarization for url_id: {url_id}, no valid markdown content available."
                             else:
-                                markdown_content = get_document_object(url_id, type="markdown_content")
-                                if not markdown_content or markdown_content.startswith("[MARKDOWN_GENERATION_FAILED"):
-                                    logger.info(f"Skipping summarization for url_id: {url_id}, no valid markdown content available.")
-                                    continue
-
-                                logger.info(f"Attempting summary for url_id: {url_id}")                               
-                                try:
-                                    filtered_content = filter_content_for_summarization(markdown_content)
-                                    summarizer_result = await summarizer_executor.ainvoke({"input": filtered_content})
-                                    summary_output = extract_and_clean_json(summarizer_result.get("output", ""))
-                                    
-                                    if isinstance(summary_output, dict):
-                                        summary = summary_output.get('summary')
-                                    else:
-                                        summary = str(summary_output)
-
-                                    update_document_object(url_id, type="summary", object=summary)
-                                    status = f"Successfully summarized and updated document for url_id: {url_id}"
-                                    logger.info(status)
-                                except Exception as e:
-                                    status = f"Error summarizing url_id {url_id}: {e}"
-                                    logger.error(status, exc_info=True)
-                                    continue
+                                status = f"Successfully summarized and updated document for url_id: {url_id}"
+                            logger.info(status)
+                        except Exception as e:
+                            status = f"Error summarizing url_id {url_id}: {e}"
+                            logger.error(status, exc_info=True)
+                            continue
+                if summarize_jobs:
+                    await enqueue_and_wait("summarize", list(summarize_jobs.values()), logger, run_id=state.get("run_id"))
 
-                    # 6. Update Step
-                    status = f"Preparing to update report for gap {gap_id} with {len(all_searches_for_gap)} searches."
+                # 6. Update Step
+                status = f"Preparing to update report for gap {gap_id} with {len(all_searches_for_gap)} searches."
+                logger.info(status)
+                try:
+                    update_researcher_report(report_id, gap_id, all_searches_for_gap)
+                    gaps_complete.append(gap_id)
+                    status = f"Updated researcher report for gap: {gap_id}"
                     logger.info(status)
-                    try:
-                        update_researcher_report(report_id, gap_id, all_searches_for_gap)
-                        gaps_complete.append(gap_id)
-                        gaps_todo = [g for g in gaps_todo if g.get("gap_id") != gap_id]
-                        status = f"Updated researcher report for gap: {gap_id}"
-                        logger.info(status)
-                    except Exception as e:
-                        status = f"Error updating report for gap {gap_id}: {e}"
-                        logger.error(status, exc_info=True)
-                        continue
 
                     status = f"--- Successfully completed research and report writing for gap: {gap_id} ---"
                     logger.info(status)
-
                 except Exception as e:
-                    status = f"An unexpected error occurred while processing gap {gap_id}: {e}"
+                    status = f"Error updating report for gap {gap_id}: {e}"
                     logger.error(status, exc_info=True)
-                    continue
-    
+                    gaps_failed.append(gap_id)
+
+            except Exception as e:
+                status = f"An unexpected error occurred while processing gap {gap_id}: {e}"
+                logger.error(status, exc_info=True)
+                gaps_failed.append(gap_id)
+
+            # The gap is done either way; it is not retried within this run
+            gaps_todo = [g for g in gaps_todo if g.get("gap_id") != gap_id]
+
     except Exception as e:
         final_status = f"Main loop failed: {e}"
         logger.error(final_status, exc_info=True)
+        # Drop the gap that failed (e.g. one without a gap_id or research_topic) so that the graph does not route it back here
+        if isinstance(gaps_todo, list) and gaps_todo and gaps_todo[0] is current_gap:
+            gaps_failed.append(current_gap.get("gap_id") if isinstance(current_gap, dict) else None)
+            gaps_todo = gaps_todo[1:]
 
     if not final_status:
-        final_status = f"Successfully and incrementally completed researcher report with ID {report_id} and wrote report to DB."
+        if gaps_todo:
+            final_status = f"Researcher report {report_id} updated; {len(gaps_todo)} gaps remaining."
+        else:
+            final_status = f"Successfully and incrementally completed researcher report with ID {report_id} and wrote report to DB."
         logger.info(final_status)
 
     return {
         "status": final_status,
         "researcher_report_id": report_id,
         "researcher_gaps_todo": gaps_todo,
-        "researcher_gaps_complete": gaps_complete
+        "researcher_gaps_complete": gaps_complete,
+        "researcher_gaps_failed": gaps_failed
     }
@@ -0,0 +1,72 @@
+# tests/test_audit_engine.py
+"""Tests of the deterministic duplicate-entity matching (audit_engine.py)."""
+import pytest
+from audit_engine import EntityName, _singular, find_duplicate_candidates, name_similarity, name_tokens
+
+
+@pytest.mark.parametrize("word, singular", [
+    ("tariffs", "tariff"),
+    ("policies", "policy"),
+    ("taxes", "tax"),
+    ("sanctions", "sanction"),
+    ("churches", "church"),
+    ("classes", "class"),
+    ("status", "status"),
+    ("analysis", "analysis"),
+    ("gas", "gas"),
+    ("301s", "301s"),
+])
+def test_singular(word, singular):
+    assert _singular(word) == singular
+
+
+def test_name_tokens_fold_case_accents_punctuation_and_plurals():
+    assert name_tokens("U.S. Tariffs") == ["us", "tariff"]
+    assert name_tokens("Société Générale") == ["societe", "generale"]
+    assert name_tokens("Member's Rights") == ["member", "right"]
+    assert name_tokens("Research & Development") == ["research", "and", "development"]
+
+
+def similarity(a: str, b: str) -> tuple:
+    return name_similarity(EntityName(a), EntityName(b))
+
+
+def test_names_with_different_numbers_never_match():
+    assert similarity("Section 301", "Section 232") == (0.0, "different numbers")
+    assert similarity("Section 301 Tariffs", "Section 301 tariff")[1] == "same normalized name"
+
+
+def test_rule_based_matches():
+    assert similarity("U.S. Tariffs", "US tariff") == (1.0, "same normalized name")
+    assert similarity("Trade Policy", "Policy, Trade") == (0.95, "same words in a different order")
+    assert similarity("Bureau of Industry and Security", "BIS") == (0.9, "acronym")
+    assert similarity("WTO", "World Trade Organization") == (0.9, "acronym")
+
+
+def test_unrelated_names_score_low():
+    score, reason = similarity("Steel", "Semiconductors")
+    assert reason == "similar spelling"
+    assert score < 0.5
+
+
+def test_find_duplicate_candidates():
+    names = ["World Trade Organization", "WTO", "Section 301", "Section 232", "U.S. Tariffs", "US tariff", "Steel", "", "WTO"]
+    candidates, stats = find_duplicate_candidates(names)
+    assert [(candidate["entities"], candidate["reason"]) for candidate in candidates] == [
+        (["U.S. Tariffs", "US tariff"], "same normalized name"),
+        (["WTO", "World Trade Organization"], "acronym"),
+    ]
+    assert stats["entities"] == 7
+    assert stats["candidates"] == 2
+
+
+def test_oversized_blocks_are_skipped():
+    names = ["Steel Board", "Steel Boardx", "Steel Bank"]
+    candidates, _ = find_duplicate_candidates(names)
+    assert [candidate["entities"] for candidate in candidates] == [["Steel Board", "Steel Boardx"]]
+
+    # The pair only shares the 'steel' word, prefix and acronym blocks, which now have too many names
+    candidates, stats = find_duplicate_candidates(names, max_block_size=2)
+    assert candidates == []
+    assert stats["skipped_blocks"] == 3
+    assert stats["comparisons"] == 0
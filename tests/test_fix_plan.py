@@ -0,0 +1,146 @@
+# tests/test_fix_plan.py
+"""Tests of the Fixer's plan validation, batching and tool response handling (fix_plan.py)."""
+import asyncio
+import json
+import logging
+import fix_plan
+from fix_plan import operation_entities, schedule_batches, validate_plan
+
+logger = logging.getLogger("test_fix_plan")
+
+
+class FakeTool:
+    """An MCP tool stand-in that records its calls and answers with `respond(args)`."""
+
+    def __init__(self, name: str, args: dict, respond):
+        self.name = name
+        self.args = args
+        self.respond = respond
+        self.calls = []
+
+    async def ainvoke(self, args: dict):
+        self.calls.append(args)
+        return self.respond(args)
+
+
+def make_tools(existing: set) -> dict:
+    exists = FakeTool("graph_entity_exists", {"name": {}}, lambda args: json.dumps({"exists": args["name"] in existing}))
+    tools = {name: FakeTool(name, {}, lambda args: json.dumps({"status": "success"})) for name in set(fix_plan.ACTION_TOOLS.values())}
+    return {**tools, "graph_entity_exists": exists}
+
+
+def validate(operations: list, tools: dict) -> list:
+    return asyncio.run(validate_plan(operations, tools, logger))
+
+
+def test_operation_entities():
+    assert operation_entities({"action": "merge", "source_entities": ["WTO", "W.T.O."], "target_entity": "World Trade Organization"}) == ["WTO", "W.T.O.", "World Trade Organization"]
+    assert operation_entities({"action": "update_relation", "source_entity": "A", "target_entity": "B"}) == ["A", "B"]
+    assert operation_entities({"action": "delete_relation", "source_entity": "A", "target_entity": "B"}) == ["A", "B"]
+    assert operation_entities({"action": "delete_entity", "entity_name": "A"}) == ["A"]
+    assert operation_entities({"action": "update_entity", "entity_name": "A"}) == ["A"]
+
+
+def test_schedule_batches_keeps_plan_order_for_shared_entities():
+    operations = [
+        {"op_id": "F1", "action": "update_entity", "entity_name": "A"},
+        {"op_id": "F2", "action": "update_entity", "entity_name": "B"},
+        {"op_id": "F3", "action": "update_relation", "source_entity": "A", "target_entity": "C"},
+        {"op_id": "F4", "action": "delete_entity", "entity_name": "D"},
+        {"op_id": "F5", "action": "delete_relation", "source_entity": "C", "target_entity": "B"},
+    ]
+    batches = [[operation["op_id"] for operation in batch] for batch in schedule_batches(operations, batch_size=10)]
+    assert batches == [["F1", "F2", "F4"], ["F3"], ["F5"]]
+
+
+def test_schedule_batches_caps_batch_size():
+    operations = [{"op_id": f"F{i}", "action": "delete_entity", "entity_name": f"E{i}"} for i in range(5)]
+    batches = [[operation["op_id"] for operation in batch] for batch in schedule_batches(operations, batch_size=2)]
+    assert batches == [["F0", "F1"], ["F2", "F3"], ["F4"]]
+
+
+def test_validate_plan_assigns_missing_and_repeated_ids():
+    operations = [
+        {"action": "delete_entity", "entity_name": "A"},
+        {"op_id": "X", "action": "delete_entity", "entity_name": "B"},
+        {"op_id": "X", "action": "delete_entity", "entity_name": "C"},
+        "not an operation",
+    ]
+    results = validate(operations, make_tools({"A", "B", "C"}))
+    assert [result["op_id"] for result in results] == ["F1", "X", "F3", "F4"]
+    assert [result["status"] for result in results] == ["valid", "valid", "valid", "invalid"]
+
+
+def test_validate_plan_rejects_malformed_operations():
+    operations = [
+        {"action": "rename", "entity_name": "A"},
+        {"action": "update_entity", "entity_name": "A"},
+        {"action": "merge", "source_entities": ["A", "B"], "target_entity": "A"},
+        {"action": "merge", "source_entities": "A", "target_entity": "B"},
+        {"action": "update_entity", "entity_name": "A", "updated_data": "new description"},
+    ]
+    results = validate(operations, make_tools({"A", "B"}))
+    assert all(result["status"] == "invalid" for result in results)
+    assert results[0]["detail"].startswith("Unknown action 'rename'")
+    assert results[1]["detail"] == "Missing updated_data"
+    assert results[2]["detail"] == "An entity cannot be merged into itself"
+    assert results[3]["detail"] == "source_entities must be a list"
+    assert results[4]["detail"] == "updated_data must be an object"
+
+
+def test_validate_plan_requires_the_action_tool():
+    tools = make_tools({"A"})
+    del tools["documents_delete_entity"]
+    results = validate([{"action": "delete_entity", "entity_name": "A"}], tools)
+    assert results[0]["status"] == "invalid"
+    assert "documents_delete_entity" in results[0]["detail"]
+
+
+def test_validate_plan_checks_entities_exist_once():
+    tools = make_tools({"A", "B"})
+    operations = [
+        {"action": "update_relation", "source_entity": "A", "target_entity": "B", "updated_data": {"weight": 1.0}},
+        {"action": "update_entity", "entity_name": "A", "updated_data": {"description": "..."}},
+        {"action": "delete_entity", "entity_name": "Missing"},
+    ]
+    results = validate(operations, tools)
+    assert [result["status"] for result in results] == ["valid", "valid", "invalid"]
+    assert results[2]["detail"] == "Entities not in the graph: ['Missing']"
+    assert sorted(call["name"] for call in tools["graph_entity_exists"].calls) == ["A", "B", "Missing"]
+
+
+def test_validate_plan_rejects_entities_removed_by_earlier_operations():
+    operations = [
+        {"op_id": "F1", "action": "merge", "source_entities": ["WTO"], "target_entity": "World Trade Organization"},
+        {"op_id": "F2", "action": "update_entity", "entity_name": "WTO", "updated_data": {"description": "..."}},
+        {"op_id": "F3", "action": "delete_entity", "entity_name": "Tariff"},
+        {"op_id": "F4", "action": "delete_relation", "source_entity": "Tariff", "target_entity": "World Trade Organization"},
+        {"op_id": "F5", "action": "update_entity", "entity_name": "World Trade Organization", "updated_data": {"description": "..."}},
+    ]
+    results = validate(operations, make_tools({"WTO", "World Trade Organization", "Tariff"}))
+    assert [result["status"] for result in results] == ["valid", "invalid", "valid", "invalid", "valid"]
+    assert results[1]["detail"] == "Entities removed by an earlier operation: WTO (F1)"
+    assert results[3]["detail"] == "Entities removed by an earlier operation: Tariff (F3)"
+
+
+def test_validate_plan_treats_failed_existence_checks_as_missing():
+    tools = make_tools({"A"})
+
+    def respond(args):
+        raise RuntimeError("connection lost")
+
+    tools["graph_entity_exists"].respond = respond
+    results = validate([{"action": "delete_entity", "entity_name": "A"}], tools)
+    assert results[0]["status"] == "invalid"
+
+
+def test_tool_status():
+    assert fix_plan._tool_status(json.dumps({"status": "success", "message": "Entity updated"})) == ("applied", "Entity updated")
+    assert fix_plan._tool_status(json.dumps({"status": "error", "message": "Entity not found"})) == ("failed", "Entity not found")
+    assert fix_plan._tool_status({"status": "success"}) == ("applied", "success")
+
+
+def test_tool_status_fails_on_responses_that_are_not_json():
+    status, detail = fix_plan._tool_status("Internal Server Error")
+    assert status == "failed"
+    assert "Internal Server Error" in detail
@@ -0,0 +1,44 @@
+# tests/test_ingestion.py
+"""Tests of the parsing of LightRAG's ingestion tool responses (ingestion.py)."""
+import json
+import pytest
+from ingestion import _parse_pipeline_status, _parse_tool_response, _parse_track_status
+
+
+def test_accepted_documents_are_submitted_with_their_track_id():
+    response = json.dumps({"status": "success", "message": "File accepted", "track_id": "insert_1"})
+    assert _parse_tool_response(response) == ("submitted", "File accepted", "insert_1")
+    assert _parse_tool_response({"status": "partial_success"}) == ("submitted", "partial_success", None)
+
+
+def test_duplicated_documents_are_ingested():
+    assert _parse_tool_response(json.dumps({"status": "duplicated", "message": "Already indexed"})) == ("ingested", "Already indexed", None)
+
+
+def test_rejected_documents_fail():
+    assert _parse_tool_response(json.dumps({"status": "failure", "message": "Empty content"})) == ("failed", "Empty content", None)
+
+
+def test_responses_that_are_not_json_fail():
+    status, detail, track_id = _parse_tool_response("502 Bad Gateway")
+    assert status == "failed"
+    assert "502 Bad Gateway" in detail
+    assert track_id is None
+
+
+def test_track_status_lists_each_document():
+    response = json.dumps({"documents": [
+        {"file_path": "https://example.com/a", "status": "PROCESSED"},
+        {"file_path": "https://example.com/b", "status": "failed", "error_msg": "Timeout"},
+        "not a document",
+    ]})
+    assert _parse_track_status(response) == [("https://example.com/a", "processed", None), ("https://example.com/b", "failed", "Timeout")]
+
+
+def test_pipeline_status_estimates_queued_documents():
+    assert _parse_pipeline_status(json.dumps({"busy": False, "docs": 10})) == (False, 0)
+    # Batch 2 of 4 is in progress, so 3 of the 4 batches are still queued
+    assert _parse_pipeline_status(json.dumps({"busy": True, "docs": 8, "batchs": 4, "cur_batch": 2})) == (True, 6)
+    assert _parse_pipeline_status(json.dumps({"request_pending": True})) == (True, 1)
+    with pytest.raises(ValueError):
+        _parse_pipeline_status("not json")
@@ -0,0 +1,80 @@
+# tests/test_startup.py
+"""
+Startup regression tests: `run.py --help` must not import the heavy modules, and the startup times
+measured by benchmarks/bench_startup.py must stay within benchmarks/startup_baseline.json.
+
+Each measurement runs in fresh interpreter processes, so the modules this test process has already
+imported do not count. Wall-clock times depend on the machine and its load, so the timing tests are
+marked `benchmark` and only run with RUN_BENCHMARKS=1; STARTUP_TOLERANCE scales the baseline
+thresholds (default 1.25) for slower machines.
+"""
+import json
+import os
+import subprocess
+import sys
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "benchmarks"))
+
+import bench_startup
+
+# Heavy modules that only the nodes needing them may import
+HEAVY_MODULES = ("playwright", "pdfplumber", "trafilatura", "tiktoken", "langchain")
+
+HELP_MODULES_SCRIPT = """
+import json, sys
+import run
+try:
+    run.parse_args(["--help"])
+except SystemExit:
+    pass
+print(json.dumps(sorted(sys.modules)))
+"""
+
+DEFAULT_TOLERANCE = 1.25
+RUNS = 3
+RUN_BENCHMARKS = os.environ.get("RUN_BENCHMARKS", "").strip().lower() in ("1", "true", "yes")
+
+
+def _is_heavy(module: str) -> bool:
+    # Any langchain distribution (langchain, langchain_core, langchain_openai, ...) counts as langchain
+    top_level = module.split(".")[0]
+    return top_level in HEAVY_MODULES or top_level.startswith("langchain_")
+
+
+@pytest.fixture(scope="module")
+def baseline() -> dict:
+    with open(bench_startup.BASELINE_PATH) as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope="module")
+def measurements() -> tuple:
+    return bench_startup.measure(RUNS, "maintenance")
+
+
+def test_help_does_not_import_heavy_modules():
+    modules = json.loads(bench_startup.run_python(["-c", HELP_MODULES_SCRIPT]))
+    assert sorted({module.split(".")[0] for module in modules if _is_heavy(module)}) == []
+
+
+def test_first_node_does_not_import_forbidden_modules(baseline, measurements):
+    _, modules = measurements
+    assert sorted(name for name in baseline["forbidden_modules"] if name in modules) == []
+
+
+@pytest.mark.benchmark
+@pytest.mark.skipif(not RUN_BENCHMARKS, reason="timing thresholds only run with RUN_BENCHMARKS=1")
+@pytest.mark.parametrize("name", ["help", "import_run", "time_to_first_node"])
+def test_startup_time_within_baseline(name, baseline, measurements):
+    tolerance = float(os.environ.get("STARTUP_TOLERANCE", DEFAULT_TOLERANCE))
+    results, _ = measurements
+    threshold = baseline["thresholds_seconds"][name] * tolerance
+    assert results[name] <= threshold, f"{name} took {results[name]:.3f}s, above {threshold:.3f}s"
+
+
+def test_help_exits_cleanly():
+    result = subprocess.run([sys.executable, "run.py", "--help"], cwd=REPO_ROOT, capture_output=True, text=True)
+    assert result.returncode == 0
+    assert "--maintenance" in result.stdout
@@ -1,14 +1,16 @@
 # tools.py
 from langchain_core.tools import tool, ToolException
-from db_utils import add_url_or_get_id, update_document_content
+from db_utils import add_url_or_get_id, update_document_content, load_latest_report, record_fetch_telemetry
 from utils import format_bytes
+from tracing import current_trace_context, span, traced
+from urllib.parse import urlsplit
+import contextlib
 import requests
 import io
-import pdfplumber
-from playwright.async_api import async_playwright
-import trafilatura
-from trafilatura.settings import use_config
+import time
 
+# Tool wrapper so agents can read the latest report of any agent
+load_latest_report_tool = tool(load_latest_report)
 
 @tool
 def human_approval(plan: str) -> str:
@@ -40,77 +42,214 @@ def human_approval(plan: str) -> str:
         logger.error(status)
         raise ToolException(status)
 
-async def fetch_and_generate_markdown(url: str, logger):
-    """Fetches raw content from a URL and generates markdown using a hybrid approach."""
+# Minimum character length for Trafilatura's output to be considered valid content;
+# anything shorter falls back to rendering the page with Playwright
+MIN_CONTENT_LENGTH = 200
+
+# Text of the page's main content, or of the whole body if there is no main element
+MAIN_TEXT_SCRIPT = '''() => {
+    const main = document.querySelector('main, #main, #content, [role="main"]');
+    return main ? main.innerText : document.body.innerText;
+}'''
+
+_trafilatura_config = None
+
+def extract_html(html: str) -> str:
+    """Extracts the main content of an HTML page with Trafilatura. Returns an empty string if nothing was found."""
+    # Imported here so that agents which never fetch pages don't pay for them at startup
+    import trafilatura
+    from trafilatura.settings import use_config
+
+    global _trafilatura_config
+    if _trafilatura_config is None:
+        _trafilatura_config = use_config()
+        _trafilatura_config.set("DEFAULT", "EXTRACTION_TIMEOUT", "0")
+    return trafilatura.extract(html, config=_trafilatura_config, include_comments=False, include_tables=True) or ""
+
+def needs_browser_fallback(content: str) -> bool:
+    """Returns True if extracted content is too short to be the page's real content."""
+    return not content or len(content) < MIN_CONTENT_LENGTH
+
+# Headless browser kept open by a long-running process (the daemon); without one every render launches its own
+_playwright = None
+_browser = None
+
+async def open_browser():
+    """Launches a headless Chromium that render_with_browser() reuses until close_browser() is called."""
+    global _playwright, _browser
+    if _browser is not None:
+        return
+    from playwright.async_api import async_playwright
+    _playwright = await async_playwright().start()
+    try:
+        _browser = await _playwright.chromium.launch()
+    except Exception:
+        await _playwright.stop()
+        _playwright = None
+        raise
+
+async def close_browser():
+    global _playwright, _browser
+    if _browser is not None:
+        await _browser.close()
+        _browser = None
+    if _playwright is not None:
+        await _playwright.stop()
+        _playwright = None
+
+async def _render(browser, url: str = None, html: str = None) -> tuple:
+    # A fresh context per page, so renders sharing a browser don't share cookies or storage
+    context = await browser.new_context()
+    try:
+        page = await context.new_page()
+        if url:
+            await page.goto(url, wait_until="networkidle", timeout=15000)
+        else:
+            await page.set_content(html, wait_until="networkidle", timeout=15000)
+        return (await page.content()).encode('utf-8'), await page.evaluate(MAIN_TEXT_SCRIPT)
+    finally:
+        await context.close()
+
+async def render_with_browser(url: str = None, html: str = None) -> tuple:
+    """Renders a page in headless Chromium, from `url` or from saved `html`, and returns (rendered_html, main_text)."""
+    if _browser is not None and _browser.is_connected():
+        return await _render(_browser, url, html)
+    from playwright.async_api import async_playwright
+    async with async_playwright() as p:
+        browser = await p.chromium.launch()
+        try:
+            return await _render(browser, url, html)
+        finally:
+            await browser.close()
+
+def extract_pdf(raw_document: bytes) -> str:
+    """Extracts the text layer of a PDF, page by page. Scanned pages without a text layer yield nothing."""
+    import pdfplumber
+    pages = []
+    with pdfplumber.open(io.BytesIO(raw_document)) as pdf:
+        for page in pdf.pages:
+            text = page.extract_text()
+            if text:
+                pages.append(text)
+            # Release the page's parsed layout; otherwise memory grows with every page of a long PDF
+            page.close()
+    return "\n".join(pages)
+
+# Shared by all fetches, so requests to the same host reuse their connections
+_http_session = requests.Session()
+
+# Column of fetch_telemetry each timed fetch phase is recorded in
+PHASE_COLUMNS = {
+    "head": "head_ms",
+    "trafilatura_download": "download_ms",
+    "pdf_download": "download_ms",
+    "trafilatura_extract": "extract_ms",
+    "pdf_extract": "extract_ms",
+    "playwright": "browser_ms",
+}
+
+@contextlib.contextmanager
+def _fetch_phase(telemetry: dict, phase: str, url: str):
+    """Times one phase of a fetch, as a span and in the fetch's telemetry row."""
+    started = time.perf_counter()
+    try:
+        with span(f"fetch:{phase}", kind="fetch", url=url) as active:
+            yield active
+    finally:
+        telemetry[PHASE_COLUMNS[phase]] = round((time.perf_counter() - started) * 1000, 1)
+
+@traced(kind="fetch")
+async def fetch_and_generate_markdown(url: str, logger, telemetry: dict = None):
+    """
+    Fetches raw content from a URL and generates markdown using a hybrid approach.
+
+    If a `telemetry` dict is given, it is filled with the fetch_telemetry fields of this attempt
+    (status, content type, bytes, extractor, phase durations, error class).
+    """
     raw_document = b''
     markdown_content = ""
-    MIN_CONTENT_LENGTH = 200 # Minimum character length to be considered valid content
+    telemetry = telemetry if telemetry is not None else {}
+    telemetry.update({"url": url, "host": (urlsplit(url).hostname or "").lower(), "wasted_bytes": 0, "browser_fallback": False})
+    started = time.perf_counter()
 
     try:
         # Use a HEAD request to check the content type first
-        head_response = requests.head(url, timeout=10, headers={'User-Agent': 'Mozilla/5.0'})
-        head_response.raise_for_status()
-        content_type = head_response.headers.get("Content-Type", "")
+        with _fetch_phase(telemetry, "head", url) as head_span:
+            head_response = _http_session.head(url, timeout=10, headers={'User-Agent': 'Mozilla/5.0'})
+            telemetry["status_code"] = head_response.status_code
+            head_response.raise_for_status()
+            content_type = head_response.headers.get("Content-Type", "")
+            telemetry["content_type"] = content_type[:255]
+            if head_span:
+                head_span.set_attribute("content_type", content_type)
 
         if "text/html" in content_type:
+            import trafilatura
+
             # 1. Try Trafilatura first
             logger.info(f"Attempting to extract content with Trafilatura from: {url}")
-            config = use_config()
-            config.set("DEFAULT", "EXTRACTION_TIMEOUT", "0")
-            downloaded_html = trafilatura.fetch_url(url)
+            telemetry["extractor"] = "trafilatura"
+            with _fetch_phase(telemetry, "trafilatura_download", url):
+                downloaded_html = trafilatura.fetch_url(url)
             if downloaded_html:
                 raw_document = downloaded_html.encode('utf-8')
-                markdown_content = trafilatura.extract(
-                    downloaded_html,
-                    config=config,
-                    include_comments=False,
-                    include_tables=True,
-                )
+                with _fetch_phase(telemetry, "trafilatura_extract", url):
+                    markdown_content = extract_html(downloaded_html)
             
             # 2. Validate output and fallback to Playwright if necessary
-            if not markdown_content or len(markdown_content) < MIN_CONTENT_LENGTH:
+            if needs_browser_fallback(markdown_content):
                 logger.warning(f"Trafilatura extraction failed or content too short. Falling back to Playwright for: {url}")
-                async with async_playwright() as p:
-                    browser = await p.chromium.launch()
-                    page = await browser.new_page()
-                    await page.goto(url, wait_until="networkidle", timeout=15000)
-                    raw_document = (await page.content()).encode('utf-8')
-                    # Use a robust JS evaluation to get main content text
-                    markdown_content = await page.evaluate('''() => {
-                        const main = document.querySelector('main, #main, #content, [role="main"]');
-                        return main ? main.innerText : document.body.innerText;
-                    }''')
-                    await browser.close()
+                telemetry.update({"extractor": "playwright", "browser_fallback": True, "wasted_bytes": len(raw_document)})
+                with _fetch_phase(telemetry, "playwright", url):
+                    raw_document, markdown_content = await render_with_browser(url=url)
                 logger.info(f"Successfully fetched content with Playwright for url: {url}")
             else:
                 logger.info(f"Successfully extracted content with Trafilatura for url: {url}")
 
         elif "application/pdf" in content_type:
             logger.info(f"Downloading PDF content from: {url}")
-            response = requests.get(url, timeout=10, headers={'User-Agent': 'Mozilla/5.0'})
-            response.raise_for_status()
-            raw_document = response.content
-            with pdfplumber.open(io.BytesIO(raw_document)) as pdf:
-                markdown_content = "\n".join(page.extract_text() for page in pdf.pages if page.extract_text())
+            telemetry["extractor"] = "pdfplumber"
+            with _fetch_phase(telemetry, "pdf_download", url):
+                response = _http_session.get(url, timeout=10, headers={'User-Agent': 'Mozilla/5.0'})
+                telemetry["status_code"] = response.status_code
+                response.raise_for_status()
+                raw_document = response.content
+            with _fetch_phase(telemetry, "pdf_extract", url):
+                markdown_content = extract_pdf(raw_document)
             logger.info(f"Successfully processed PDF for url: {url}")
 
         else:
             markdown_content = f"[MARKDOWN_GENERATION_FAILED: Unsupported content type '{content_type}']"
+            telemetry["error_class"] = "UnsupportedContentType"
+
+        if not markdown_content and "error_class" not in telemetry:
+            telemetry["error_class"] = "EmptyContent"
 
     except Exception as e:
         logger.error(f"An unexpected error occurred while processing {url}: {e}", exc_info=True)
         markdown_content = f"[MARKDOWN_GENERATION_FAILED: {e}]"
+        telemetry["error_class"] = type(e).__name__
+
+    if telemetry.get("error_class"):
+        # Whatever was downloaded for a failed fetch yielded no content
+        telemetry["wasted_bytes"] += len(raw_document)
 
+    telemetry.update({
+        "bytes": len(raw_document),
+        "output_chars": 0 if telemetry.get("error_class") else len(markdown_content),
+        "total_ms": round((time.perf_counter() - started) * 1000, 1),
+    })
     return raw_document, markdown_content
 
-async def process_url(url: str, logger):
-    """Downloads, processes, and stores content from a URL."""
-    url_id, url_status = add_url_or_get_id(url)
-    if url_status == "existing":
-        # Optionally, we could check here if the content is missing and re-process if needed
-        return url_id, url_status
-    
-    raw_document, markdown_content = await fetch_and_generate_markdown(url, logger)
+@traced(kind="fetch")
+async def fetch_document(url_id: int, url: str, logger, run_id: str = None) -> dict:
+    """Fetches a URL already in the documents table, stores its content and fetch telemetry, and returns the telemetry."""
+    telemetry = {"url_id": url_id, "run_id": run_id or current_trace_context().get("trace_id")}
+    raw_document, markdown_content = await fetch_and_generate_markdown(url, logger, telemetry)
+    try:
+        record_fetch_telemetry(telemetry)
+    except Exception as e:
+        logger.warning(f"Failed to record fetch telemetry for url_id {url_id}: {e}")
 
     if raw_document or markdown_content:
         logger.info(f"Updating document content for url_id: {url_id}")
@@ -120,4 +259,15 @@ async def process_url(url: str, logger):
         except Exception as e:
             logger.error(f"Failed to update document content for url_id {url_id}: {e}", exc_info=True)
 
-    return url_id, url_status
\ No newline at end of file
+    return telemetry
+
+@traced(kind="fetch")
+async def process_url(url: str, logger):
+    """Downloads, processes, and stores content from a URL."""
+    url_id, url_status = add_url_or_get_id(url)
+    if url_status == "existing":
+        # Optionally, we could check here if the content is missing and re-process if needed
+        return url_id, url_status
+
+    await fetch_document(url_id, url, logger)
+    return url_id, url_status
@@ -0,0 +1,203 @@
+# topic_coverage.py
+"""
+Scores how well the stored documents already cover each gap's research topic, before any search.
+
+`CoverageIndex` is a sparse TF-IDF matrix over the summary and markdown of every stored document.
+It is built incrementally: each document's content signature is kept, and an update re-tokenizes
+only the documents that are new or changed since, replacing their rows. The index is kept in memory
+for the process (the daemon reuses it across runs) and saved under COVERAGE_INDEX_DIR for the next
+process.
+
+All key questions of all gaps are scored with one sparse matrix product against the index; a
+question's coverage is its best cosine similarity to any document. Gaps whose share of covered
+questions (at least COVERAGE_QUESTION_THRESHOLD) reaches COVERAGE_SKIP_RATIO are skipped, and the
+covered questions of the other gaps are dropped before planning.
+"""
+import json
+import os
+import numpy as np
+import scipy.sparse as sp
+from db_utils import get_document_signatures, get_coverage_texts
+from ranking import tokenize
+
+DEFAULT_INDEX_DIR = "coverage_index"
+DEFAULT_QUESTION_THRESHOLD = 0.3
+DEFAULT_SKIP_RATIO = 0.8
+DEFAULT_MAX_CHARS = 20000
+TOP_DOCUMENTS = 3
+INDEX_VERSION = 1
+
+_index = None
+
+
+class CoverageIndex:
+    """Term counts of the stored documents (one row per document) with their vocabulary and signatures."""
+
+    def __init__(self):
+        self.vocabulary = {}
+        self.url_ids = []
+        self.signatures = {}
+        self.counts = sp.csr_matrix((0, 0), dtype=np.float32)
+
+    def _count_rows(self, texts: list, grow: bool = True) -> sp.csr_matrix:
+        """Builds term count rows for texts, adding unseen terms to the vocabulary or, without `grow`, ignoring them."""
+        indptr, indices, data = [0], [], []
+        for text in texts:
+            row = {}
+            for term in tokenize(text):
+                column = self.vocabulary.setdefault(term, len(self.vocabulary)) if grow else self.vocabulary.get(term)
+                if column is None:
+                    continue
+                row[column] = row.get(column, 0) + 1
+            indices.extend(row.keys())
+            data.extend(row.values())
+            indptr.append(len(indices))
+        return sp.csr_matrix((np.array(data, dtype=np.float32), np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)),
+                             shape=(len(texts), len(self.vocabulary)))
+
+    def update(self, max_chars: int = DEFAULT_MAX_CHARS) -> dict:
+        """Brings the index up to date with the documents table; returns how many documents were added, changed and removed."""
+        signatures = dict(get_document_signatures())
+        changed = [url_id for url_id, signature in signatures.items() if self.signatures.get(url_id) != signature]
+        removed = [url_id for url_id in self.signatures if url_id not in signatures]
+        if not changed and not removed:
+            return {"added": 0, "changed": 0, "removed": 0}
+
+        stale = set(changed) | set(removed)
+        keep = [row for row, url_id in enumerate(self.url_ids) if url_id not in stale]
+        texts = get_coverage_texts(changed, max_chars)
+        new_ids = [url_id for url_id in changed if url_id in texts]
+        new_rows = self._count_rows([texts[url_id] for url_id in new_ids])
+
+        old_rows = self.counts[keep]
+        old_rows.resize((len(keep), len(self.vocabulary)))
+        self.counts = sp.vstack([old_rows, new_rows], format="csr")
+        stats = {"added": sum(1 for url_id in new_ids if url_id not in self.signatures), "removed": len(removed)}
+        stats["changed"] = len(new_ids) - stats["added"]
+        self.url_ids = [self.url_ids[row] for row in keep] + new_ids
+        self.signatures = {url_id: signatures[url_id] for url_id in self.url_ids}
+        return stats
+
+    def _idf(self) -> np.ndarray:
+        document_frequencies = np.bincount(self.counts.indices, minlength=len(self.vocabulary))
+        return (np.log((1 + len(self.url_ids)) / (1 + document_frequencies)) + 1).astype(np.float32)
+
+    @staticmethod
+    def _tfidf(counts: sp.csr_matrix, idf: np.ndarray) -> sp.csr_matrix:
+        """Sublinear TF-IDF rows, L2-normalized so that row products are cosine similarities."""
+        weights = counts.copy()
+        weights.data = 1 + np.log(weights.data)
+        weights = weights @ sp.diags(idf)
+        norms = np.sqrt(np.asarray(weights.multiply(weights).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        return sp.diags(1 / norms) @ weights
+
+    def score(self, questions: list) -> tuple:
+        """
+        Returns (best, top) for a list of questions: each question's best cosine similarity to any
+        document, and the url_ids of its TOP_DOCUMENTS best documents, from one matrix product.
+        """
+        if not questions or not self.url_ids:
+            return np.zeros(len(questions), dtype=np.float32), [[] for _ in questions]
+        idf = self._idf()
+        # Terms no document contains cannot match, so they are left out
+        query_counts = self._count_rows(questions, grow=False)
+        similarities = (self._tfidf(query_counts, idf) @ self._tfidf(self.counts, idf).T).tocsr()
+        best = np.zeros(len(questions), dtype=np.float32)
+        top = []
+        for i in range(len(questions)):
+            row = similarities.data[similarities.indptr[i]:similarities.indptr[i + 1]]
+            columns = similarities.indices[similarities.indptr[i]:similarities.indptr[i + 1]]
+            order = np.argsort(-row)[:TOP_DOCUMENTS]
+            best[i] = row[order[0]] if len(order) else 0.0
+            top.append([self.url_ids[columns[j]] for j in order if row[j] > 0])
+        return best, top
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        sp.save_npz(os.path.join(directory, "counts.npz"), self.counts)
+        with open(os.path.join(directory, "index.json"), "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "vocabulary": self.vocabulary, "url_ids": self.url_ids,
+                       "signatures": {str(url_id): signature for url_id, signature in self.signatures.items()}}, f)
+
+    @classmethod
+    def load(cls, directory: str):
+        """Loads a saved index, or returns None if there is none or it is unreadable."""
+        try:
+            with open(os.path.join(directory, "index.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") != INDEX_VERSION:
+                return None
+            index = cls()
+            index.counts = sp.load_npz(os.path.join(directory, "counts.npz")).tocsr()
+            index.vocabulary = meta["vocabulary"]
+            index.url_ids = meta["url_ids"]
+            index.signatures = {int(url_id): signature for url_id, signature in meta["signatures"].items()}
+            return index
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+def get_coverage_index(logger) -> CoverageIndex:
+    """Returns the process's coverage index, loading it from disk on first use and updating it from the database."""
+    global _index
+    directory = os.environ.get("COVERAGE_INDEX_DIR", DEFAULT_INDEX_DIR)
+    if _index is None:
+        _index = CoverageIndex.load(directory) or CoverageIndex()
+    stats = _index.update(int(os.environ.get("COVERAGE_MAX_CHARS", DEFAULT_MAX_CHARS)))
+    if any(stats.values()):
+        try:
+            _index.save(directory)
+        except OSError as e:
+            logger.warning(f"Failed to save the coverage index to {directory}: {e}")
+    status = f"Coverage index covers {len(_index.url_ids)} documents and {len(_index.vocabulary)} terms ({stats})."
+    logger.info(status)
+    return _index
+
+
+def topic_questions(research_topic: dict) -> list:
+    """Returns the key questions of a research topic, or its title and summary if it has none."""
+    questions = [str(question) for question in research_topic.get("key_questions") or [] if question]
+    if questions:
+        return questions
+    fallback = " ".join(str(research_topic.get(field, "")) for field in ("title", "summary")).strip()
+    return [fallback] if fallback else []
+
+
+def triage_gaps(gaps: list, logger) -> dict:
+    """
+    Scores every gap's key questions against the stored documents in one matrix product and decides
+    what to do with each gap. Returns {gap_id: coverage}, where coverage holds the per-question
+    scores and best documents, the covered share, and the action: 'research', 'shrink' or 'skip'.
+    """
+    threshold = float(os.environ.get("COVERAGE_QUESTION_THRESHOLD", DEFAULT_QUESTION_THRESHOLD))
+    skip_ratio = float(os.environ.get("COVERAGE_SKIP_RATIO", DEFAULT_SKIP_RATIO))
+    index = get_coverage_index(logger)
+
+    questions_by_gap = [(gap["gap_id"], topic_questions(gap.get("research_topic") or {})) for gap in gaps]
+    all_questions = [question for _, questions in questions_by_gap for question in questions]
+    best, top = index.score(all_questions)
+
+    coverage = {}
+    position = 0
+    for gap_id, questions in questions_by_gap:
+        scored = [
+            {"question": question, "score": round(float(best[position + i]), 3), "covered": bool(best[position + i] >= threshold), "top_url_ids": top[position + i]}
+            for i, question in enumerate(questions)
+        ]
+        position += len(questions)
+        covered = sum(question["covered"] for question in scored) / len(scored) if scored else 0.0
+        if scored and covered >= skip_ratio:
+            action = "skip"
+        elif covered > 0:
+            action = "shrink"
+        else:
+            action = "research"
+        coverage[gap_id] = {"questions": scored, "covered_ratio": round(covered, 3), "action": action, "threshold": threshold}
+    return coverage
+
+
+def shrink_research_topic(research_topic: dict, coverage: dict) -> dict:
+    """Returns the research topic with its already covered key questions removed."""
+    covered = {question["question"] for question in coverage["questions"] if question["covered"]}
+    return {**research_topic, "key_questions": [question for question in research_topic.get("key_questions") or [] if str(question) not in covered]}
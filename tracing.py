@@ -0,0 +1,270 @@
+# tracing.py
+"""
+Lightweight span tracing for a Knowledge Agent run.
+
+Spans are opened with `span(...)` or the `traced(...)` decorator. Parent-child links follow
+contextvars, so a span opened inside a graph node, or inside a task spawned from it, is a child
+of the node's span. Finished spans are appended to `<TRACE_DIR>/<run_id>.jsonl`, one JSON object
+per line, with OTLP-style fields (trace_id, span_id, parent_span_id, start/end in unix nanoseconds,
+attributes, status). Until `start_trace()` is called, spans are no-ops. The active trace is also
+held in a contextvar, so concurrent runs in one process (the daemon) each write their own file.
+
+Run `python tracing.py RUN_ID` (or a path to a trace file) to print the critical path of a run.
+"""
+import argparse
+import contextlib
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_tracer = contextvars.ContextVar("tracer", default=None)
+
+DEFAULT_TRACE_DIR = "traces"
+
+
+class Span:
+    """One timed operation in a trace."""
+
+    __slots__ = ("trace_id", "span_id", "parent_span_id", "name", "kind", "attributes", "start_ns", "end_ns", "status", "error")
+
+    def __init__(self, trace_id: str, parent_span_id, name: str, kind: str, attributes: dict):
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_span_id = parent_span_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = "ok"
+        self.error = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "status": self.status,
+            "error": self.error,
+        }
+
+
+class Tracer:
+    """Writes finished spans of one run to a JSONL file."""
+
+    def __init__(self, trace_id: str, path: str):
+        self.trace_id = trace_id
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def trace_path(run_id: str, trace_dir: str = None) -> str:
+    return os.path.join(trace_dir or os.environ.get("TRACE_DIR", DEFAULT_TRACE_DIR), f"{run_id}.jsonl")
+
+
+def start_trace(run_id: str, trace_dir: str = None) -> str:
+    """Starts writing spans for `run_id` and returns the trace file path. Resumed runs append to the same file."""
+    path = trace_path(run_id, trace_dir)
+    _tracer.set(Tracer(run_id, path))
+    return path
+
+
+def stop_trace():
+    tracer = _tracer.get()
+    if tracer is not None:
+        tracer.close()
+        _tracer.set(None)
+
+
+def current_span():
+    """Returns the innermost open span in this context, or None."""
+    return _current_span.get()
+
+
+def current_trace_context() -> dict:
+    """Returns the trace and span IDs of the current span, for correlating log records with spans."""
+    active = _current_span.get()
+    if active is None:
+        return {}
+    return {"trace_id": active.trace_id, "span_id": active.span_id}
+
+
+def start_span(name: str, kind: str = "internal", parent: Span = None, **attributes):
+    """
+    Starts a span without making it current, for operations whose start and end are reported
+    separately (e.g. callbacks). The parent defaults to the current span. Returns None when tracing is off.
+    """
+    tracer = _tracer.get()
+    if tracer is None:
+        return None
+    parent = parent or _current_span.get()
+    return Span(tracer.trace_id, parent.span_id if parent else None, name, kind, attributes)
+
+
+def end_span(active: Span, error: BaseException = None):
+    """Finishes a span from `start_span` and writes it to the trace."""
+    tracer = _tracer.get()
+    if active is None or tracer is None:
+        return
+    if error is not None:
+        active.status = "error"
+        active.error = f"{type(error).__name__}: {error}"
+    active.end_ns = time.time_ns()
+    tracer.export(active)
+
+
+@contextlib.contextmanager
+def span(name: str, kind: str = "internal", **attributes):
+    """Times the enclosed block as a child of the current span. Yields the span (None when tracing is off)."""
+    active = start_span(name, kind, **attributes)
+    if active is None:
+        yield None
+        return
+
+    token = _current_span.set(active)
+    error = None
+    try:
+        yield active
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _current_span.reset(token)
+        end_span(active, error)
+
+
+def traced(name: str = None, kind: str = "internal"):
+    """Decorator that wraps every call of a sync or async function in a span, named `<kind>:<function>` by default."""
+    def decorator(func):
+        span_name = name or f"{kind}:{func.__name__}"
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name, kind):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name, kind):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# --- Trace summary ---
+
+def load_spans(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def critical_path(spans: list) -> list:
+    """
+    Returns the critical path of a trace as (depth, span) pairs.
+
+    Starting from each root, walks backwards from the span's end and repeatedly takes the child
+    that finished last before the cursor; those children are what the parent was waiting on.
+    """
+    children = defaultdict(list)
+    span_ids = {s["span_id"] for s in spans}
+    roots = []
+    for s in spans:
+        if s["parent_span_id"] in span_ids:
+            children[s["parent_span_id"]].append(s)
+        else:
+            roots.append(s)
+
+    path = []
+
+    def walk(s, depth):
+        path.append((depth, s))
+        cursor = s["end_time_unix_nano"]
+        on_path = []
+        for child in sorted(children[s["span_id"]], key=lambda c: c["end_time_unix_nano"], reverse=True):
+            if child["end_time_unix_nano"] <= cursor:
+                on_path.append(child)
+                cursor = child["start_time_unix_nano"]
+        for child in reversed(on_path):
+            walk(child, depth + 1)
+
+    for root in sorted(roots, key=lambda r: r["start_time_unix_nano"]):
+        walk(root, 0)
+    return path
+
+
+def summarize(spans: list) -> dict:
+    """Returns count, total and self time (excluding child spans) in ms for every span name."""
+    child_time = defaultdict(float)
+    for s in spans:
+        if s["parent_span_id"]:
+            child_time[s["parent_span_id"]] += s["duration_ms"]
+
+    summary = defaultdict(lambda: {"count": 0, "total_ms": 0.0, "self_ms": 0.0})
+    for s in spans:
+        entry = summary[s["name"]]
+        entry["count"] += 1
+        entry["total_ms"] += s["duration_ms"]
+        entry["self_ms"] += max(s["duration_ms"] - child_time[s["span_id"]], 0.0)
+    return dict(summary)
+
+
+def print_report(path: str, top: int = 15):
+    spans = load_spans(path)
+    if not spans:
+        print(f"No spans in {path}")
+        return
+
+    print(f"Critical path ({path}):")
+    for depth, s in critical_path(spans):
+        marker = " [error]" if s["status"] == "error" else ""
+        print(f"{'  ' * depth}{s['name']:<{60 - 2 * depth}} {s['duration_ms'] / 1000:10.2f}s{marker}")
+
+    print(f"\nTop {top} spans by self time:")
+    print(f"{'name':<48} {'count':>7} {'total':>11} {'self':>11}")
+    ranked = sorted(summarize(spans).items(), key=lambda item: item[1]["self_ms"], reverse=True)
+    for name, entry in ranked[:top]:
+        print(f"{name:<48} {entry['count']:>7} {entry['total_ms'] / 1000:10.2f}s {entry['self_ms'] / 1000:10.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the critical path and the slowest spans of a traced run.")
+    parser.add_argument("run", help="Run ID (looked up in TRACE_DIR) or path to a trace file.")
+    parser.add_argument("--top", type=int, default=15, help="Number of span names to list by self time.")
+    args = parser.parse_args()
+
+    path = args.run if os.path.exists(args.run) else trace_path(args.run)
+    print_report(path, args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# usage.py
+import argparse
+import contextlib
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger('KnowledgeAgent')
+
+_usage_tags = contextvars.ContextVar("usage_tags", default={})
+
+# Tags that every usage row is keyed by; anything not tagged is recorded as empty
+USAGE_KEYS = ("node", "agent", "gap_id", "search_id", "url_id")
+
+
+@contextlib.contextmanager
+def usage_tags(**tags):
+    """Tags every LLM call made inside the block (e.g. with gap_id, search_id or url_id) for usage accounting."""
+    token = _usage_tags.set({**_usage_tags.get(), **{k: v for k, v in tags.items() if v is not None}})
+    try:
+        yield
+    finally:
+        _usage_tags.reset(token)
+
+
+def current_usage_tags() -> dict:
+    """Returns the usage tags (agent, gap_id, search_id, url_id) of the LLM calls made in this context."""
+    return dict(_usage_tags.get())
+
+
+def _token_usage(response) -> tuple:
+    """Returns (prompt_tokens, completion_tokens) reported for an LLM response."""
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    if usage:
+        return usage.get("prompt_tokens", 0) or 0, usage.get("completion_tokens", 0) or 0
+
+    prompt_tokens = completion_tokens = 0
+    for generations in response.generations:
+        for generation in generations:
+            metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            prompt_tokens += metadata.get("input_tokens", 0)
+            completion_tokens += metadata.get("output_tokens", 0)
+    return prompt_tokens, completion_tokens
+
+
+class UsageCollector(BaseCallbackHandler):
+    """
+    Accumulates prompt and completion tokens and LLM time per node, agent, gap, search and URL.
+
+    The node comes from LangGraph's callback metadata, the agent from the executor that made the
+    call, and gap_id/search_id/url_id from `usage_tags`. Totals are written to the `run_usage`
+    table by `flush()`.
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self.totals = defaultdict(lambda: {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "llm_seconds": 0.0})
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        call_tags = {**_usage_tags.get()}
+        call_tags.setdefault("node", (metadata or {}).get("langgraph_node"))
+        self._pending[run_id] = (tuple(call_tags.get(key) for key in USAGE_KEYS), time.perf_counter())
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        pending = self._pending.pop(run_id, None)
+        if pending is None:
+            return
+        key, started = pending
+        prompt_tokens, completion_tokens = _token_usage(response)
+        with self._lock:
+            entry = self.totals[key]
+            entry["calls"] += 1
+            entry["prompt_tokens"] += prompt_tokens
+            entry["completion_tokens"] += completion_tokens
+            entry["llm_seconds"] += time.perf_counter() - started
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._pending.pop(run_id, None)
+
+    def rows(self) -> list:
+        with self._lock:
+            return [{**dict(zip(USAGE_KEYS, key)), **entry} for key, entry in self.totals.items()]
+
+    def flush(self, run_id: str) -> int:
+        """Adds the collected totals to the run's rows in `run_usage`, then clears them. Returns the number of rows written."""
+        from db_utils import record_run_usage
+
+        rows = self.rows()
+        if rows:
+            record_run_usage(run_id, rows, *usage_costs())
+            with self._lock:
+                self.totals.clear()
+        return len(rows)
+
+    def log_summary(self):
+        by_agent = defaultdict(lambda: [0, 0, 0])
+        for row in self.rows():
+            entry = by_agent[(row["node"], row["agent"])]
+            entry[0] += row["calls"]
+            entry[1] += row["prompt_tokens"]
+            entry[2] += row["completion_tokens"]
+        for (node, agent), (calls, prompt_tokens, completion_tokens) in sorted(by_agent.items(), key=lambda item: -(item[1][1] + item[1][2])):
+            logger.info(f"LLM usage for node '{node}', agent '{agent}': {calls} calls, {prompt_tokens} prompt + {completion_tokens} completion tokens")
+
+
+def usage_costs() -> tuple:
+    """Returns the configured cost per 1K prompt and completion tokens (0 for a self-hosted model unless set)."""
+    return (
+        float(os.environ.get("LLM_COST_PER_1K_PROMPT_TOKENS", 0)),
+        float(os.environ.get("LLM_COST_PER_1K_COMPLETION_TOKENS", 0)),
+    )
+
+
+def print_report(run_id: str, group_by: list):
+    from db_utils import get_run_usage
+
+    rows = get_run_usage(run_id, group_by)
+    if not rows:
+        print(f"No usage recorded for run {run_id}")
+        return
+
+    grand_total = sum(row["total_tokens"] for row in rows) or 1
+    header = " ".join(f"{key:<16}" for key in group_by)
+    print(f"{header} {'calls':>7} {'prompt':>10} {'completion':>11} {'share':>7} {'llm time':>10} {'cost':>9}")
+    for row in rows:
+        labels = " ".join(f"{str(row[key] or '-')[:16]:<16}" for key in group_by)
+        share = 100 * row["total_tokens"] / grand_total
+        print(f"{labels} {row['calls']:>7} {row['prompt_tokens']:>10} {row['completion_tokens']:>11} {share:6.1f}% {row['llm_seconds']:9.1f}s {row['estimated_cost']:9.4f}")
+
+
+def main():
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description="Print the LLM token usage of a run.")
+    parser.add_argument("run_id", help="Run ID, e.g. run_20250827_000158_maintenance.")
+    parser.add_argument("--by", default="node,agent", help=f"Comma-separated columns to group by, from: {', '.join(USAGE_KEYS)}.")
+    args = parser.parse_args()
+
+    load_dotenv()
+    group_by = [key.strip() for key in args.by.split(",") if key.strip()]
+    unknown = set(group_by) - set(USAGE_KEYS)
+    if unknown:
+        parser.error(f"Unknown grouping columns: {sorted(unknown)}")
+    print_report(args.run_id, group_by)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,4 @@
 # utils.py
-import tiktoken
 
 def format_bytes(byte_count):
     """
@@ -30,6 +29,7 @@ def filter_content_for_summarization(content: str) -> str:
     """Truncates content to a safe number of tokens for the summarization model."""
     MAX_TOKENS = 16384  # Cap content for summarization at 16k tokens for efficiency
     try:
+        import tiktoken
         encoding = tiktoken.get_encoding("cl100k_base")
         tokens = encoding.encode(content)
         if len(tokens) > MAX_TOKENS: